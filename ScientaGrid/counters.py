@@ -0,0 +1,207 @@
+"""
+Buffered counters for hot usage and download statistics.
+
+Increments are accumulated in process memory and written periodically as
+one ``UPDATE ... SET field = field + CASE ... END`` per model and field, so
+concurrent workers never overwrite each other's counts and a popular
+object costs one write per flush instead of one per hit. Optional
+timestamp fields (e.g. ``last_used_at``) are set in the same statement.
+
+Buffered increments are flushed once ``COUNTER_FLUSH_INTERVAL`` seconds
+(default 10) have passed or ``COUNTER_FLUSH_THRESHOLD`` (default 500)
+increments are pending, and at interpreter exit. A background thread
+flushes an idle worker's buffer after the interval, so at most about one
+interval of increments is lost if the process is killed; that is the
+price of not writing on every hit. ``COUNTER_FLUSHER = False`` turns the
+thread off (it is off under ``manage.py test``).
+
+Usage:
+    from ScientaGrid import counters
+
+    counters.increment(Tag, tag.pk, 'usage_count')
+    counters.increment(Document, doc.pk, 'download_count', touch='last_downloaded_at')
+    counters.flush()
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+# (model, field, touch) -> {pk: [amount, last timestamp]}
+_pending = defaultdict(dict)
+_pending_count = 0
+_last_flush = time.monotonic()
+# Background flusher of this process; restarted after a fork
+_flusher = None
+_flusher_pid = None
+# Set when the buffer stops being empty, waking the idle flusher
+_wakeup = threading.Event()
+
+
+def increment(model, pk, field, amount=1, touch=None):
+    """Buffer an increment of ``field`` on one row, optionally touching a timestamp field."""
+    global _pending_count
+    now = timezone.now()
+    with _lock:
+        entry = _pending[(model, field, touch)].setdefault(pk, [0, now])
+        entry[0] += amount
+        entry[1] = now
+        _pending_count += 1
+        if _pending_count == 1:
+            _wakeup.set()
+    _ensure_flusher()
+    _maybe_flush()
+
+
+def pending():
+    """Return the number of buffered increments not yet written."""
+    return _pending_count
+
+
+def discard():
+    """Drop buffered increments without writing them (e.g. between tests)."""
+    global _pending, _pending_count
+    with _lock:
+        _pending = defaultdict(dict)
+        _pending_count = 0
+
+
+def _maybe_flush():
+    interval = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+    threshold = getattr(settings, 'COUNTER_FLUSH_THRESHOLD', 500)
+    due = _pending_count >= threshold or time.monotonic() - _last_flush >= interval
+    # Writing inside someone else's transaction would tie unrelated
+    # increments to its rollback; wait for the next call outside one
+    if due and not connection.in_atomic_block:
+        flush()
+
+
+def _flusher_enabled():
+    return getattr(settings, 'COUNTER_FLUSHER', True)
+
+
+def _ensure_flusher():
+    global _flusher, _flusher_pid
+    if not _flusher_enabled():
+        return
+    if _flusher_pid == os.getpid() and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid() and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_run_flusher, name='counter-flusher', daemon=True)
+        _flusher_pid = os.getpid()
+        _flusher.start()
+
+
+def _run_flusher():
+    """Flush increments left pending for a whole interval, even if no further increment arrives."""
+    while True:
+        _wakeup.clear()
+        if not _flusher_enabled():
+            return
+        if not _pending_count:
+            _wakeup.wait()
+            continue
+        interval = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+        wait = interval - (time.monotonic() - _last_flush)
+        if wait > 0:
+            _wakeup.wait(wait)
+            continue
+        try:
+            flush()
+        except Exception:
+            logger.exception('Flushing buffered counters failed')
+        finally:
+            # The flusher's own connection; don't hold it open while idle
+            connection.close()
+
+
+def flush():
+    """Write all buffered increments; returns the number of rows updated."""
+    global _pending, _pending_count, _last_flush
+    with _lock:
+        batch, _pending = _pending, defaultdict(dict)
+        _pending_count = 0
+        _last_flush = time.monotonic()
+
+    updated = 0
+    failure = None
+    keys = list(batch)
+    # Next chunk to write; if the loop is interrupted, it and everything
+    # after it go back into the buffer
+    index = start = 0
+    try:
+        while index < len(keys):
+            key = keys[index]
+            items = list(batch[key].items())
+            while start < len(items):
+                try:
+                    updated += _write(*key, items[start:start + FLUSH_BATCH_SIZE])
+                except Exception as error:
+                    # The rest of this key goes back; the other keys are still written
+                    _restore(*key, items[start:])
+                    failure = failure or error
+                    break
+                start += FLUSH_BATCH_SIZE
+            index, start = index + 1, 0
+    except BaseException:
+        if index < len(keys):
+            _restore(*keys[index], list(batch[keys[index]].items())[start:])
+            for key in keys[index + 1:]:
+                _restore(*key, list(batch[key].items()))
+        raise
+    if failure is not None:
+        raise failure
+    return updated
+
+
+def _write(model, field, touch, chunk):
+    values = {
+        field: F(field) + Case(
+            *[When(pk=pk, then=Value(amount)) for pk, (amount, _) in chunk],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    }
+    if touch:
+        values[touch] = Case(
+            *[When(pk=pk, then=Value(timestamp)) for pk, (_, timestamp) in chunk],
+            default=F(touch),
+            output_field=DateTimeField()
+        )
+    return model._base_manager.filter(pk__in=[pk for pk, _ in chunk]).update(**values)
+
+
+def _restore(model, field, touch, items):
+    """Put increments that failed to write back into the buffer."""
+    global _pending_count
+    with _lock:
+        rows = _pending[(model, field, touch)]
+        for pk, (amount, timestamp) in items:
+            entry = rows.get(pk)
+            if entry is None:
+                rows[pk] = [amount, timestamp]
+                # Counted once, like the increment that first buffered it
+                _pending_count += 1
+            else:
+                entry[0] += amount
+                entry[1] = max(entry[1], timestamp)
+    # The flusher may be idle, waiting for an empty buffer to fill
+    _wakeup.set()
+
+
+atexit.register(lambda: _pending_count and flush())
@@ -0,0 +1,23 @@
+"""
+Database helpers shared across apps.
+
+Usage:
+    from ScientaGrid.db import bulk_upsert
+
+    bulk_upsert(TagUsage, rows, unique_fields=['tag'], update_fields=['total_count'])
+"""
+from django.db import connection
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields):
+    """
+    Insert objects, updating the given fields of rows that already exist.
+
+    MySQL resolves conflicts on any unique key and does not accept unique_fields,
+    other backends need them to build the conflict target.
+    """
+    kwargs = {}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = unique_fields
+
+    model.objects.bulk_create(objs, update_conflicts=True, update_fields=update_fields, **kwargs)
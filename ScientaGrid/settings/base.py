@@ -15,6 +15,7 @@ from pathlib import Path
 from decouple import config
 
 import os
+import sys
 
 # These will be overridden in local.py and production.py
 SECRET_KEY = config("SECRET_KEY", default="fallback-key-for-development")
@@ -113,6 +114,30 @@ DATABASES = {
 }
 
 
+# Cache
+# Version counters (taxonomy trees, prices, eligibility rules) and parler's
+# translation cache must be shared by all worker processes. The local-memory
+# default suits a single development process only; set CACHE_BACKEND to
+# django.core.cache.backends.redis.RedisCache (or db.DatabaseCache) and
+# CACHE_LOCATION accordingly in production. `check --deploy` reports a
+# process-local cache as an error.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+
+# Buffered counters
+# A background thread writes the buffered usage and download counts of idle
+# workers (see ScientaGrid/counters.py). It is off under `manage.py test`,
+# where it would write through its own connection while tests hold theirs.
+TESTING = sys.argv[1:2] == ['test']
+COUNTER_FLUSHER = config('COUNTER_FLUSHER', default=not TESTING, cast=bool)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
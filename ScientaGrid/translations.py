@@ -0,0 +1,78 @@
+"""
+Translation prefetching for parler models.
+
+Accessing a translated field on a parler object without prefetched
+translations costs one query per object and model. ``with_translations``
+prefetches the rows of all configured languages, for the queryset's model
+and any related parler models, in one query each. Parler treats prefetched
+rows as complete, so every language is loaded: ``__str__`` methods using
+``safe_translation_getter(any_language=True)`` must still find a name that
+exists only in another language.
+
+Usage:
+    from ScientaGrid.translations import with_translations
+
+    queryset = with_translations(
+        Infrastructure.objects.select_related('city', 'institution'),
+        related=['city', 'institution']
+    )
+"""
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import translation
+from parler import appsettings
+
+
+def translation_languages(language_code=None, fallbacks=None):
+    """Return the active language followed by its fallbacks, without duplicates."""
+    language_code = language_code or translation.get_language() or appsettings.PARLER_DEFAULT_LANGUAGE_CODE
+    if fallbacks is None:
+        fallbacks = appsettings.PARLER_LANGUAGES.get_fallback_languages(language_code)
+    return list(dict.fromkeys([language_code] + list(fallbacks)))
+
+
+def _related_model(model, path):
+    for name in path.split('__'):
+        model = model._meta.get_field(name).related_model
+    return model
+
+
+def with_translations(queryset, languages=None, related=()):
+    """
+    Prefetch translations of a queryset and of related parler models.
+
+    Args:
+        queryset: Queryset of any model; non-parler models are skipped
+        languages: Languages to prefetch (default: all of ``settings.LANGUAGES``).
+            Objects then only see these languages, including in any_language lookups.
+        related: Relation paths to parler models, e.g. ['city', 'city__region']
+    """
+    if languages is None:
+        languages = [code for code, _ in settings.LANGUAGES]
+    lookups = []
+    for path in [None] + list(related):
+        model = queryset.model if path is None else _related_model(queryset.model, path)
+        parler_meta = getattr(model, '_parler_meta', None)
+        if parler_meta is None:
+            continue
+        for meta in parler_meta:
+            lookup = f'{path}__{meta.rel_name}' if path else meta.rel_name
+            lookups.append(Prefetch(
+                lookup,
+                queryset=meta.model.objects.filter(language_code__in=languages)
+            ))
+    return queryset.prefetch_related(*lookups)
+
+
+class TranslationPrefetchMixin:
+    """
+    Admin mixin prefetching translations for the changelist.
+
+    ``translation_related`` lists relation paths to parler models shown in
+    the list, e.g. ``['city', 'institution']``.
+    """
+
+    translation_related = []
+
+    def get_queryset(self, request):
+        return with_translations(super().get_queryset(request), related=self.translation_related)
@@ -0,0 +1,70 @@
+"""
+Version counters kept in the shared cache.
+
+Process-local caches store the version they were built from and compare it
+with ``get_version()`` on each read; ``bump_version()`` makes every worker
+rebuild lazily on its next access. This only works when the default cache
+is shared between processes (Redis, database); ``check --deploy`` reports
+a process-local one.
+
+Usage:
+    from ScientaGrid.versioning import get_version, bump_version
+
+    if cached_version != get_version('taxonomy:technologydomain'):
+        rebuild()
+    bump_version('taxonomy:technologydomain')
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Error, Tags, register
+
+# Backends whose contents are not seen by other processes
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def _key(namespace):
+    return f'version:{namespace}'
+
+
+def _initial_version():
+    # Start from the clock rather than 1, so a cleared or evicted counter
+    # never repeats a version a worker may still hold
+    return time.time_ns()
+
+
+def get_version(namespace):
+    """Return the current version of a namespace, creating it if needed."""
+    version = cache.get(_key(namespace))
+    if version is None:
+        cache.add(_key(namespace), _initial_version(), None)
+        version = cache.get(_key(namespace))
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate everything built from a namespace and return the new version."""
+    try:
+        return cache.incr(_key(namespace))
+    except ValueError:
+        version = _initial_version()
+        cache.set(_key(namespace), version, None)
+        return version
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """A bump must reach every worker, so deployments need a cache shared between processes."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PROCESS_LOCAL_BACKENDS:
+        return [Error(
+            f'The default cache ({backend}) is local to each process, so version bumps '
+            'never reach other workers and their caches stay stale.',
+            hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis.',
+            id='scientagrid.E001'
+        )]
+    return []
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccessConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.access'
+
+    def ready(self):
+        # Import signal handlers
+        import apps.access.signals
@@ -0,0 +1,258 @@
+"""
+Access eligibility from precompiled rule sets.
+
+All active access conditions are compiled once into parallel numpy arrays
+per target kind: a bitmask of requirements (training, safety
+certification, NDA, insurance, approval, collaboration), a bitmask of the
+user types admitted, and the booking window in days. Conditions of an
+infrastructure also apply to its equipment, and every condition on a
+target must be met. A question such as "which of these 5,000 equipment
+can an academic user without safety certification book within 7 days"
+is then a few vectorised mask operations.
+
+The compiled rules are kept for the life of the worker and rebuilt lazily
+when an access condition or equipment is saved or deleted, through a
+version counter in the shared cache.
+
+Usage:
+    from apps.access.eligibility import Applicant, evaluator
+
+    applicant = Applicant('academic', training=True)
+    evaluator.eligible('equipment', equipment_ids, applicant, within_days=7)
+    evaluator.eligible('equipment', equipment_ids, applicant, service_id=service.pk)
+"""
+from collections import namedtuple
+import threading
+
+import numpy as np
+
+from ScientaGrid.versioning import get_version, bump_version
+from apps.equipment.models import Equipment
+from .models import AccessCondition
+
+NAMESPACE = 'access:eligibility'
+
+# Requirement bits
+TRAINING = 1
+SAFETY_CERTIFICATION = 2
+NDA = 4
+INSURANCE = 8
+APPROVAL = 16
+COLLABORATION = 32
+ALL_REQUIREMENTS = TRAINING | SAFETY_CERTIFICATION | NDA | INSURANCE | APPROVAL | COLLABORATION
+
+# User type bits
+USER_TYPE_BITS = {'academic': 1, 'commercial': 2, 'internal': 4}
+ALL_USER_TYPES = 1 | 2 | 4
+
+# What each access type asks for, and whom it admits. Internal users of the
+# institution count as academic.
+ACCESS_TYPE_RULES = {
+    'open': (0, ALL_USER_TYPES),
+    'restricted': (APPROVAL, ALL_USER_TYPES),
+    'by_approval': (APPROVAL, ALL_USER_TYPES),
+    'commercial': (0, USER_TYPE_BITS['commercial']),
+    'academic': (0, USER_TYPE_BITS['academic'] | USER_TYPE_BITS['internal']),
+    'collaborative': (COLLABORATION, ALL_USER_TYPES),
+}
+
+NO_LIMIT = np.iinfo(np.int32).max
+
+KINDS = ('infrastructure', 'equipment', 'service')
+
+Applicant = namedtuple(
+    'Applicant',
+    ['user_type', 'training', 'safety_certification', 'nda', 'insurance', 'approved', 'collaboration'],
+    defaults=[False, False, False, False, False, False]
+)
+
+
+def held_mask(applicant):
+    """Requirement bits an applicant satisfies."""
+    held = 0
+    for bit, present in (
+        (TRAINING, applicant.training),
+        (SAFETY_CERTIFICATION, applicant.safety_certification),
+        (NDA, applicant.nda),
+        (INSURANCE, applicant.insurance),
+        (APPROVAL, applicant.approved),
+        (COLLABORATION, applicant.collaboration),
+    ):
+        if present:
+            held |= bit
+    return held
+
+
+def condition_rule(condition):
+    """(requirements, admitted user types, min days, max days) of one condition row."""
+    requirements, allowed = ACCESS_TYPE_RULES.get(condition['access_type'], (APPROVAL, ALL_USER_TYPES))
+    if condition['requires_training']:
+        requirements |= TRAINING
+    if condition['requires_safety_certification']:
+        requirements |= SAFETY_CERTIFICATION
+    if condition['requires_nda']:
+        requirements |= NDA
+    if condition['requires_insurance']:
+        requirements |= INSURANCE
+    min_days, max_days = 0, NO_LIMIT
+    if condition['requires_booking']:
+        min_days = condition['min_booking_days'] or 0
+        if condition['max_booking_days'] is not None:
+            max_days = condition['max_booking_days']
+    return requirements, allowed, min_days, max_days
+
+
+def combine(first, second):
+    """Rules for meeting both of two rules: requirements add up and windows narrow."""
+    return (
+        first[0] | second[0],
+        first[1] & second[1],
+        max(first[2], second[2]),
+        min(first[3], second[3])
+    )
+
+
+UNRESTRICTED = (0, ALL_USER_TYPES, 0, NO_LIMIT)
+
+
+class RuleSet:
+    """Compiled rules of one target kind, as parallel arrays sorted by target ID."""
+
+    def __init__(self, ids, requirements, allowed, min_days, max_days):
+        order = np.argsort(ids, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.requirements = np.asarray(requirements, dtype=np.uint8)[order]
+        self.allowed = np.asarray(allowed, dtype=np.uint8)[order]
+        self.min_days = np.asarray(min_days, dtype=np.int32)[order]
+        self.max_days = np.asarray(max_days, dtype=np.int32)[order]
+
+    @classmethod
+    def from_rules(cls, rules):
+        """Build from a dict of target ID to (requirements, allowed, min days, max days)."""
+        ids = list(rules)
+        columns = list(zip(*(rules[pk] for pk in ids))) or [(), (), (), ()]
+        return cls(ids, *columns)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, ids):
+        """Rule arrays for the given target IDs; targets without conditions are unrestricted."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            return (
+                np.zeros(len(ids), dtype=np.uint8),
+                np.full(len(ids), ALL_USER_TYPES, dtype=np.uint8),
+                np.zeros(len(ids), dtype=np.int32),
+                np.full(len(ids), NO_LIMIT, dtype=np.int32),
+            )
+        positions = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        found = self.ids[positions] == ids
+        return (
+            np.where(found, self.requirements[positions], 0),
+            np.where(found, self.allowed[positions], ALL_USER_TYPES),
+            np.where(found, self.min_days[positions], 0),
+            np.where(found, self.max_days[positions], NO_LIMIT),
+        )
+
+
+class CompiledRules:
+    """Rule sets of every target kind, built from two queries."""
+
+    def __init__(self, version, rule_sets):
+        self.version = version
+        self.rule_sets = rule_sets
+
+    @classmethod
+    def load(cls, version):
+        rules = {kind: {} for kind in KINDS}
+        conditions = AccessCondition.objects.filter(is_active=True).values(
+            'infrastructure_id', 'equipment_id', 'service_id', 'access_type', 'requires_booking',
+            'min_booking_days', 'max_booking_days', 'requires_training', 'requires_safety_certification',
+            'requires_nda', 'requires_insurance'
+        )
+        for condition in conditions:
+            rule = condition_rule(condition)
+            # A condition naming several targets applies to each of them
+            for kind in KINDS:
+                pk = condition[f'{kind}_id']
+                if pk is not None:
+                    rules[kind][pk] = combine(rules[kind].get(pk, UNRESTRICTED), rule)
+
+        rule_sets = {kind: RuleSet.from_rules(rules[kind]) for kind in KINDS}
+
+        # Fold infrastructure conditions into every piece of its equipment
+        equipment = []
+        if len(rule_sets['infrastructure']):
+            equipment = list(Equipment.objects.values_list('pk', 'infrastructure_id'))
+        if equipment:
+            equipment_ids = np.array([pk for pk, _ in equipment], dtype=np.int64)
+            infrastructure_ids = np.array([pk or 0 for _, pk in equipment], dtype=np.int64)
+            own = rule_sets['equipment'].lookup(equipment_ids)
+            inherited = rule_sets['infrastructure'].lookup(infrastructure_ids)
+            rule_sets['equipment'] = RuleSet(
+                equipment_ids,
+                own[0] | inherited[0],
+                own[1] & inherited[1],
+                np.maximum(own[2], inherited[2]),
+                np.minimum(own[3], inherited[3])
+            )
+        return cls(version, rule_sets)
+
+    def mask(self, kind, ids, applicant, within_days=None, service_id=None):
+        """Boolean array telling which of the target IDs the applicant may access."""
+        if applicant.user_type not in USER_TYPE_BITS:
+            raise ValueError(f'Unknown user type: {applicant.user_type}')
+        requirements, allowed, min_days, max_days = self.rule_sets[kind].lookup(ids)
+        if service_id is not None:
+            # The service's own conditions apply on top of the target's
+            service = self.rule_sets['service'].lookup([service_id])
+            requirements = requirements | service[0][0]
+            allowed = allowed & service[1][0]
+            min_days = np.maximum(min_days, service[2][0])
+            max_days = np.minimum(max_days, service[3][0])
+
+        missing = ALL_REQUIREMENTS ^ held_mask(applicant)
+        eligible = (requirements & missing) == 0
+        eligible &= (allowed & USER_TYPE_BITS[applicant.user_type]) != 0
+        # Some day in the booking window must fall within the horizon
+        latest = max_days if within_days is None else np.minimum(max_days, within_days)
+        eligible &= min_days <= latest
+        return eligible
+
+
+class EligibilityEvaluator:
+    """Process-wide access to the current compiled rules."""
+
+    def __init__(self):
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def rules(self):
+        """Return the current compiled rules, rebuilding them if stale."""
+        version = get_version(NAMESPACE)
+        compiled = self._compiled
+        if compiled is None or compiled.version != version:
+            with self._lock:
+                compiled = self._compiled
+                if compiled is None or compiled.version != version:
+                    compiled = CompiledRules.load(version)
+                    self._compiled = compiled
+        return compiled
+
+    def mask(self, kind, ids, applicant, within_days=None, service_id=None):
+        return self.rules().mask(kind, ids, applicant, within_days=within_days, service_id=service_id)
+
+    def eligible(self, kind, ids, applicant, within_days=None, service_id=None):
+        """The target IDs, in their given order, that the applicant may access."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        mask = self.mask(kind, ids, applicant, within_days=within_days, service_id=service_id)
+        return ids[mask].tolist()
+
+
+evaluator = EligibilityEvaluator()
+
+
+def invalidate_rules():
+    """Mark access conditions as changed so every worker recompiles its rules."""
+    bump_version(NAMESPACE)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.access.models import EffectivePrice
+
+
+class Command(BaseCommand):
+    help = 'Recompute the prices in effect today; run daily so policies starting or expiring are picked up'
+
+    def handle(self, *args, **options):
+        written = EffectivePrice.refresh()
+        self.stdout.write(f'  {written} effective prices')
+        self.stdout.write(self.style.SUCCESS('\nEffective prices refreshed'))
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from parler.models import TranslatableModel, TranslatedFields
 from apps.infrastructures.models import Infrastructure
 from apps.equipment.models import Equipment
@@ -182,6 +184,13 @@ class PricingPolicy(TranslatableModel):
         default='per_hour'
     )
 
+    # User types with their own price column, falling back to base_price
+    USER_TYPES = [
+        ('academic', 'Academic'),
+        ('commercial', 'Commercial'),
+        ('internal', 'Internal'),
+    ]
+
     # Price in PLN
     base_price = models.DecimalField(
         max_digits=10,
@@ -266,4 +275,140 @@ class PricingPolicy(TranslatableModel):
         if not any([self.infrastructure, self.equipment, self.service]):
             raise ValidationError(
                 'Pricing policy must be linked to at least one: infrastructure, equipment, or service'
-            )
\ No newline at end of file
+            )
+
+    @property
+    def target(self):
+        """The (infrastructure, equipment, service) IDs this policy prices."""
+        return (self.infrastructure_id, self.equipment_id, self.service_id)
+
+    def price_for(self, user_type):
+        """Unit price for a user type, falling back to the base price; None for custom quotes."""
+        if self.pricing_type == 'free':
+            return 0
+        price = getattr(self, f'{user_type}_price')
+        return self.base_price if price is None else price
+
+
+class EffectivePrice(models.Model):
+    """
+    Materialized price in effect today per target, user type and pricing type.
+
+    Of the active policies valid today on the same target, the one valid
+    from the latest date is in effect for each pricing type. One row is
+    kept per user type, so price filters and sorting in search are a
+    single indexed join instead of repeated joins over pricing_policies.
+    Refreshed daily and whenever a policy is saved or deleted.
+    """
+
+    policy = models.ForeignKey(
+        PricingPolicy,
+        on_delete=models.CASCADE,
+        related_name='effective_prices'
+    )
+
+    # Copied from the policy; the composite indexes below lead with them
+    infrastructure = models.ForeignKey(
+        Infrastructure,
+        on_delete=models.CASCADE,
+        related_name='effective_prices',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    equipment = models.ForeignKey(
+        Equipment,
+        on_delete=models.CASCADE,
+        related_name='effective_prices',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.CASCADE,
+        related_name='effective_prices',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+
+    user_type = models.CharField(max_length=20, choices=PricingPolicy.USER_TYPES)
+    pricing_type = models.CharField(max_length=20, choices=PricingPolicy.PRICING_TYPES)
+
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Unit price in PLN for this user type (empty for custom quotes)"
+    )
+    setup_fee = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
+
+    effective_on = models.DateField(help_text="Day the row was computed for")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['policy', 'user_type'], name='unique_effective_price_policy_user_type'),
+        ]
+        indexes = [
+            models.Index(fields=['infrastructure', 'user_type', 'amount']),
+            models.Index(fields=['equipment', 'user_type', 'amount']),
+            models.Index(fields=['service', 'user_type', 'amount']),
+            models.Index(fields=['user_type', 'pricing_type', 'amount']),
+        ]
+
+    def __str__(self):
+        return f"{self.policy_id} {self.user_type}: {self.amount}"
+
+    @classmethod
+    def refresh(cls, targets=None, day=None):
+        """
+        Recompute the rows of the given (infrastructure, equipment, service)
+        ID targets, or of all targets, for a day (today by default).
+        """
+        day = day or timezone.localdate()
+        policies = PricingPolicy.objects.filter(
+            Q(valid_from__isnull=True) | Q(valid_from__lte=day),
+            Q(valid_until__isnull=True) | Q(valid_until__gte=day),
+            is_active=True
+        )
+        stale = cls.objects.all()
+        if targets is not None:
+            target_filter = Q(pk__in=[])
+            for infrastructure_id, equipment_id, service_id in set(targets):
+                target_filter |= Q(
+                    infrastructure_id=infrastructure_id, equipment_id=equipment_id, service_id=service_id
+                )
+            policies = policies.filter(target_filter)
+            stale = stale.filter(target_filter)
+
+        # Latest valid_from wins per target and pricing type
+        effective = {}
+        for policy in policies.order_by(F('valid_from').asc(nulls_first=True), 'pk'):
+            effective[(policy.target, policy.pricing_type)] = policy
+
+        rows = [
+            cls(
+                policy=policy,
+                infrastructure_id=policy.infrastructure_id,
+                equipment_id=policy.equipment_id,
+                service_id=policy.service_id,
+                user_type=user_type,
+                pricing_type=policy.pricing_type,
+                amount=policy.price_for(user_type),
+                setup_fee=policy.setup_fee,
+                effective_on=day
+            )
+            for policy in effective.values()
+            for user_type, _ in PricingPolicy.USER_TYPES
+        ]
+        with transaction.atomic():
+            stale.delete()
+            cls.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
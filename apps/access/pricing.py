@@ -0,0 +1,226 @@
+"""
+Effective prices of services on equipment.
+
+A price for (equipment, service, user type) on a given day combines the
+pricing policies defined at several levels. The most specific active policy
+valid on that day wins, in this order:
+
+    equipment + service
+    service at the equipment's infrastructure
+    service
+    equipment
+    infrastructure
+
+Within one level the policy valid from the latest date wins. The policy's
+price for the user type (``academic_price`` etc.) is used, falling back to
+``base_price``, and its ``setup_fee`` is added. Without any policy the
+``EquipmentService.estimated_cost`` is quoted.
+
+Quotes for any number of tuples are resolved with three queries and kept
+for the rest of the day; saving a policy, an equipment-service link or
+equipment bumps a version counter so every worker starts afresh.
+
+Usage:
+    from apps.access.pricing import resolver
+
+    quote = resolver.quote(equipment, service, 'academic')
+    quote.total, quote.items
+    quotes = resolver.quotes([(equipment_id, service_id, 'commercial'), ...])
+"""
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+import threading
+
+from django.db.models import Q
+from django.utils import timezone
+
+from ScientaGrid.versioning import get_version, bump_version
+from apps.equipment.models import Equipment
+from apps.services.models import EquipmentService
+from .models import PricingPolicy
+
+NAMESPACE = 'access:pricing'
+
+USER_TYPES = tuple(code for code, _ in PricingPolicy.USER_TYPES)
+
+# Days kept in the memo; requests for past or future dates stay cheap too
+MEMO_DAYS = 3
+
+QuoteItem = namedtuple('QuoteItem', ['label', 'amount'])
+
+Quote = namedtuple('Quote', [
+    'equipment_id', 'service_id', 'user_type', 'source', 'policy_id', 'pricing_type', 'items', 'total'
+])
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+def level_keys(infrastructure_id, equipment_id, service_id):
+    """Precedence table keys for a tuple, paired with their level, most specific first."""
+    keys = []
+    if service_id is not None:
+        if equipment_id is not None:
+            keys.append(('equipment_service', (None, equipment_id, service_id)))
+        if infrastructure_id is not None:
+            keys.append(('infrastructure_service', (infrastructure_id, None, service_id)))
+        keys.append(('service', (None, None, service_id)))
+    if equipment_id is not None:
+        keys.append(('equipment', (None, equipment_id, None)))
+    if infrastructure_id is not None:
+        keys.append(('infrastructure', (infrastructure_id, None, None)))
+    return keys
+
+
+def policy_key(policy):
+    """The precedence table key of a policy row; equipment makes the infrastructure redundant."""
+    infrastructure_id = None if policy['equipment_id'] else policy['infrastructure_id']
+    return (infrastructure_id, policy['equipment_id'], policy['service_id'])
+
+
+def price_items(policy, user_type):
+    """Itemized amounts a policy charges a user type; None for custom quotes."""
+    if policy['pricing_type'] == 'free':
+        return [QuoteItem('Free', Decimal('0.00'))]
+    price = policy[f'{user_type}_price']
+    label = f'{user_type.capitalize()} price'
+    if price is None:
+        price = policy['base_price']
+        label = 'Base price'
+    if price is None:
+        return None
+    items = [QuoteItem(label, price)]
+    if policy['setup_fee']:
+        items.append(QuoteItem('Setup fee', policy['setup_fee']))
+    return items
+
+
+def compute(requests, day):
+    """
+    Quote (equipment_id, service_id, user_type) tuples for a day, without memoization.
+
+    Runs three queries regardless of the number of tuples: equipment
+    infrastructures, candidate policies, and estimated costs.
+    """
+    equipment_ids = {equipment_id for equipment_id, _, _ in requests if equipment_id is not None}
+    service_ids = {service_id for _, service_id, _ in requests if service_id is not None}
+
+    infrastructures = dict(
+        Equipment.objects.filter(pk__in=equipment_ids).values_list('pk', 'infrastructure_id')
+    ) if equipment_ids else {}
+    infrastructure_ids = {pk for pk in infrastructures.values() if pk is not None}
+
+    policies = PricingPolicy.objects.filter(
+        Q(equipment_id__in=equipment_ids) | Q(service_id__in=service_ids) | Q(infrastructure_id__in=infrastructure_ids),
+        Q(valid_from__isnull=True) | Q(valid_from__lte=day),
+        Q(valid_until__isnull=True) | Q(valid_until__gte=day),
+        is_active=True
+    ).values(
+        'pk', 'infrastructure_id', 'equipment_id', 'service_id', 'pricing_type', 'base_price',
+        'academic_price', 'commercial_price', 'internal_price', 'setup_fee', 'valid_from'
+    )
+
+    # Precedence table: key -> the policy that applies at that key
+    table = {}
+    for policy in policies:
+        key = policy_key(policy)
+        current = table.get(key)
+        rank = (policy['valid_from'] or day.min, policy['pk'])
+        if current is None or rank > (current['valid_from'] or day.min, current['pk']):
+            table[key] = policy
+
+    estimates = {}
+    if equipment_ids and service_ids:
+        links = EquipmentService.objects.filter(
+            equipment_id__in=equipment_ids,
+            service_id__in=service_ids,
+            estimated_cost__isnull=False
+        ).values_list('equipment_id', 'service_id', 'estimated_cost')
+        for equipment_id, service_id, cost in links:
+            estimates.setdefault((equipment_id, service_id), cost)
+
+    quotes = {}
+    for request in requests:
+        equipment_id, service_id, user_type = request
+        quotes[request] = _quote(
+            equipment_id, service_id, user_type, infrastructures.get(equipment_id), table, estimates
+        )
+    return quotes
+
+
+def _quote(equipment_id, service_id, user_type, infrastructure_id, table, estimates):
+    for level, key in level_keys(infrastructure_id, equipment_id, service_id):
+        policy = table.get(key)
+        if policy is None:
+            continue
+        items = price_items(policy, user_type)
+        total = sum(item.amount for item in items) if items is not None else None
+        return Quote(
+            equipment_id, service_id, user_type, level, policy['pk'], policy['pricing_type'],
+            tuple(items or ()), total
+        )
+
+    cost = estimates.get((equipment_id, service_id))
+    if cost is not None:
+        return Quote(
+            equipment_id, service_id, user_type, 'estimated_cost', None, None,
+            (QuoteItem('Estimated cost', cost),), cost
+        )
+    return Quote(equipment_id, service_id, user_type, None, None, None, (), None)
+
+
+class PricingResolver:
+    """Quotes with a per-day memo, shared by the threads of a worker."""
+
+    def __init__(self):
+        self._days = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def quotes(self, requests, on=None):
+        """
+        Quote many (equipment, service, user type) tuples at once.
+
+        Equipment and service may be given as instances or IDs, either may be
+        None. Returns a dict keyed by the ID tuples.
+        """
+        day = on or timezone.localdate()
+        keys = []
+        for equipment, service, user_type in requests:
+            if user_type not in USER_TYPES:
+                raise ValueError(f'Unknown user type: {user_type}')
+            keys.append((_pk(equipment), _pk(service), user_type))
+
+        version = get_version(NAMESPACE)
+        with self._lock:
+            if version != self._version:
+                self._days.clear()
+                self._version = version
+            memo = self._days.setdefault(day, {})
+            self._days.move_to_end(day)
+            while len(self._days) > MEMO_DAYS:
+                self._days.popitem(last=False)
+            missing = list({key for key in keys if key not in memo})
+
+        if missing:
+            computed = compute(missing, day)
+            with self._lock:
+                memo.update(computed)
+        return {key: memo[key] for key in keys}
+
+    def quote(self, equipment, service, user_type, on=None):
+        """Quote a single tuple."""
+        return next(iter(self.quotes([(equipment, service, user_type)], on=on).values()))
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+
+
+resolver = PricingResolver()
+
+
+def invalidate_prices():
+    """Mark prices as changed so every worker recomputes its quotes."""
+    bump_version(NAMESPACE)
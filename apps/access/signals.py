@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from apps.access.eligibility import invalidate_rules
+from apps.access.models import AccessCondition, EffectivePrice, PricingPolicy
+from apps.access.pricing import invalidate_prices
+from apps.equipment.models import Equipment
+from apps.services.models import EquipmentService
+
+
+@receiver(pre_save, sender=Equipment)
+def remember_equipment_infrastructure(sender, instance, raw=False, **kwargs):
+    """Remember where equipment was, so only moving it invalidates what depends on its infrastructure."""
+    if raw or instance.pk is None:
+        return
+    instance._previous_infrastructure_id = Equipment.objects.filter(pk=instance.pk).values_list(
+        'infrastructure_id', flat=True
+    ).first()
+
+
+def equipment_moved(instance, signal, created=False, **kwargs):
+    """Whether saved or deleted equipment was created, deleted or moved to another infrastructure."""
+    if signal is post_delete or created:
+        return True
+    return getattr(instance, '_previous_infrastructure_id', None) != instance.infrastructure_id
+
+
+# Equipment is included because moving it changes its infrastructure's policies
+PRICING_MODELS = (PricingPolicy, EquipmentService, Equipment)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_pricing(sender, instance, **kwargs):
+    """Bump the pricing version whenever something a quote depends on changes."""
+    if sender not in PRICING_MODELS or kwargs.get('raw'):
+        return
+    if sender is Equipment and not equipment_moved(instance, **kwargs):
+        return
+
+    invalidate_prices()
+    # Bump again once committed, so a worker that quoted mid-transaction
+    # does not keep the pre-commit prices
+    transaction.on_commit(invalidate_prices)
+
+
+# Equipment is included because moving it changes the conditions it inherits
+ELIGIBILITY_MODELS = (AccessCondition, Equipment)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_eligibility(sender, instance, **kwargs):
+    """Bump the eligibility version whenever an access condition changes or equipment moves."""
+    if sender not in ELIGIBILITY_MODELS or kwargs.get('raw'):
+        return
+    if sender is Equipment and not equipment_moved(instance, **kwargs):
+        return
+
+    invalidate_rules()
+    transaction.on_commit(invalidate_rules)
+
+
+@receiver(pre_save, sender=PricingPolicy)
+def remember_pricing_target(sender, instance, raw=False, **kwargs):
+    """Remember what a policy priced before, so a policy moved elsewhere refreshes both targets."""
+    if raw or instance.pk is None:
+        return
+    previous = PricingPolicy.objects.filter(pk=instance.pk).values_list(
+        'infrastructure_id', 'equipment_id', 'service_id'
+    ).first()
+    instance._previous_target = previous
+
+
+@receiver(post_save, sender=PricingPolicy)
+def refresh_effective_prices_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    targets = [instance.target]
+    if getattr(instance, '_previous_target', None):
+        targets.append(instance._previous_target)
+    EffectivePrice.refresh(targets)
+
+
+@receiver(post_delete, sender=PricingPolicy)
+def refresh_effective_prices_on_delete(sender, instance, **kwargs):
+    # The policy's own rows are gone by cascade; another policy may now be in effect
+    EffectivePrice.refresh([instance.target])
@@ -1,11 +1,14 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from decimal import Decimal
 from datetime import date
-from apps.access.models import AccessCondition, PricingPolicy
+from apps.access.models import AccessCondition, EffectivePrice, PricingPolicy
+from apps.access.eligibility import Applicant, EligibilityEvaluator
+from apps.access.pricing import PricingResolver
 from apps.infrastructures.models import Infrastructure
 from apps.equipment.models import Equipment
-from apps.services.models import Service
+from apps.services.models import EquipmentService, Service
 from apps.institutions.models import Institution
 from apps.locations.models import Country, Region, City
 
@@ -171,3 +174,280 @@ class PricingPolicyModelTest(TestCase):
         """Test pricing_type is one of valid choices."""
         valid_types = ['free', 'per_hour', 'per_day', 'per_sample', 'per_measurement', 'per_project', 'custom']
         self.assertIn(self.pricing.pricing_type, valid_types)
+
+
+class PricingResolverTest(TestCase):
+    """Tests for effective price resolution."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.equipment = Equipment.objects.create(infrastructure=self.infrastructure)
+        self.other_equipment = Equipment.objects.create(infrastructure=self.infrastructure)
+        self.service = Service.objects.create(code='XRD')
+        self.day = date(2025, 6, 1)
+
+        PricingPolicy.objects.create(
+            infrastructure=self.infrastructure,
+            base_price=Decimal('200.00'),
+            academic_price=Decimal('100.00'),
+            valid_from=date(2025, 1, 1)
+        )
+        self.resolver = PricingResolver()
+
+    def test_infrastructure_policy_applies(self):
+        """Test an infrastructure-wide policy prices its equipment by user type."""
+        academic = self.resolver.quote(self.equipment, self.service, 'academic', on=self.day)
+        commercial = self.resolver.quote(self.equipment, self.service, 'commercial', on=self.day)
+
+        self.assertEqual(academic.source, 'infrastructure')
+        self.assertEqual(academic.total, Decimal('100.00'))
+        self.assertEqual(commercial.total, Decimal('200.00'))
+        self.assertEqual(commercial.items[0].label, 'Base price')
+
+    def test_most_specific_policy_wins(self):
+        """Test an equipment and service policy overrides broader ones and adds its setup fee."""
+        PricingPolicy.objects.create(service=self.service, base_price=Decimal('150.00'))
+        PricingPolicy.objects.create(
+            equipment=self.equipment,
+            service=self.service,
+            academic_price=Decimal('80.00'),
+            setup_fee=Decimal('20.00')
+        )
+
+        quotes = self.resolver.quotes([
+            (self.equipment, self.service, 'academic'),
+            (self.other_equipment, self.service, 'academic'),
+        ], on=self.day)
+
+        quote = quotes[(self.equipment.pk, self.service.pk, 'academic')]
+        self.assertEqual(quote.source, 'equipment_service')
+        self.assertEqual([item.amount for item in quote.items], [Decimal('80.00'), Decimal('20.00')])
+        self.assertEqual(quote.total, Decimal('100.00'))
+        self.assertEqual(quotes[(self.other_equipment.pk, self.service.pk, 'academic')].source, 'service')
+
+    def test_validity_dates(self):
+        """Test expired and future policies are ignored and the latest valid one wins."""
+        PricingPolicy.objects.create(
+            infrastructure=self.infrastructure,
+            base_price=Decimal('300.00'),
+            valid_from=date(2025, 5, 1),
+            valid_until=date(2025, 5, 31)
+        )
+        PricingPolicy.objects.create(
+            infrastructure=self.infrastructure,
+            base_price=Decimal('400.00'),
+            valid_from=date(2025, 7, 1)
+        )
+
+        self.assertEqual(self.resolver.quote(self.equipment, None, 'commercial', on=self.day).total, Decimal('200.00'))
+        self.assertEqual(
+            self.resolver.quote(self.equipment, None, 'commercial', on=date(2025, 5, 15)).total,
+            Decimal('300.00')
+        )
+
+    def test_estimated_cost_fallback(self):
+        """Test the equipment-service estimate is quoted when no policy applies."""
+        PricingPolicy.objects.all().delete()
+        EquipmentService.objects.create(equipment=self.equipment, service=self.service, estimated_cost=Decimal('75.00'))
+
+        quote = self.resolver.quote(self.equipment, self.service, 'internal', on=self.day)
+
+        self.assertEqual(quote.source, 'estimated_cost')
+        self.assertEqual(quote.total, Decimal('75.00'))
+
+    def test_quotes_in_bulk_and_memoized(self):
+        """Test many tuples take three queries, and repeats none until pricing changes."""
+        requests = [
+            (equipment, self.service, user_type)
+            for equipment in (self.equipment, self.other_equipment)
+            for user_type in ('academic', 'commercial', 'internal')
+        ]
+
+        with self.assertNumQueries(3):
+            self.resolver.quotes(requests, on=self.day)
+        with self.assertNumQueries(0):
+            self.resolver.quotes(requests, on=self.day)
+
+        PricingPolicy.objects.create(equipment=self.equipment, base_price=Decimal('10.00'))
+        quote = self.resolver.quote(self.equipment, self.service, 'commercial', on=self.day)
+        self.assertEqual(quote.total, Decimal('10.00'))
+
+    def test_only_moving_equipment_invalidates(self):
+        """Test editing equipment keeps memoized quotes and moving it drops them."""
+        self.resolver.quote(self.equipment, self.service, 'academic', on=self.day)
+
+        self.equipment.name = 'Diffractometer'
+        self.equipment.save()
+        with self.assertNumQueries(0):
+            self.resolver.quote(self.equipment, self.service, 'academic', on=self.day)
+
+        institution = self.infrastructure.institution
+        self.equipment.infrastructure = Infrastructure.objects.create(institution=institution, city=institution.city)
+        self.equipment.save()
+        quote = self.resolver.quote(self.equipment, self.service, 'academic', on=self.day)
+        self.assertIsNone(quote.total)
+
+    def test_unknown_user_type(self):
+        """Test an unknown user type is rejected."""
+        with self.assertRaises(ValueError):
+            self.resolver.quote(self.equipment, self.service, 'student')
+
+
+class EffectivePriceTest(TestCase):
+    """Tests for the materialized prices in effect."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.other_infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.policy = PricingPolicy.objects.create(
+            infrastructure=self.infrastructure,
+            base_price=Decimal('200.00'),
+            academic_price=Decimal('100.00'),
+            valid_from=date(2020, 1, 1)
+        )
+
+    def amounts(self, infrastructure):
+        return dict(
+            EffectivePrice.objects.filter(infrastructure=infrastructure).values_list('user_type', 'amount')
+        )
+
+    def test_rows_per_user_type_refreshed_on_save(self):
+        """Test saving a policy materializes its price for every user type."""
+        self.assertEqual(self.amounts(self.infrastructure), {
+            'academic': Decimal('100.00'),
+            'commercial': Decimal('200.00'),
+            'internal': Decimal('200.00'),
+        })
+
+    def test_latest_valid_policy_in_effect(self):
+        """Test a newer policy of the same type replaces the older one, a future one does not."""
+        PricingPolicy.objects.create(
+            infrastructure=self.infrastructure, base_price=Decimal('250.00'), valid_from=date(2021, 1, 1)
+        )
+        PricingPolicy.objects.create(
+            infrastructure=self.infrastructure, base_price=Decimal('999.00'), valid_from=date(2999, 1, 1)
+        )
+
+        self.assertEqual(self.amounts(self.infrastructure)['commercial'], Decimal('250.00'))
+        self.assertEqual(EffectivePrice.objects.filter(infrastructure=self.infrastructure).count(), 3)
+
+    def test_moved_and_deleted_policies(self):
+        """Test moving a policy refreshes both targets and deleting one clears its rows."""
+        self.policy.infrastructure = self.other_infrastructure
+        self.policy.save()
+
+        self.assertEqual(self.amounts(self.infrastructure), {})
+        self.assertEqual(self.amounts(self.other_infrastructure)['academic'], Decimal('100.00'))
+
+        self.policy.delete()
+        self.assertFalse(EffectivePrice.objects.exists())
+
+    def test_daily_refresh_drops_expired(self):
+        """Test a refresh for a later day drops policies that expired."""
+        PricingPolicy.objects.filter(pk=self.policy.pk).update(valid_until=date(2024, 12, 31))
+
+        EffectivePrice.refresh(day=date(2025, 1, 1))
+
+        self.assertFalse(EffectivePrice.objects.exists())
+
+
+class EligibilityEvaluatorTest(TestCase):
+    """Tests for vectorised access eligibility."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.other_infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.microscope = Equipment.objects.create(infrastructure=self.infrastructure)
+        self.laser = Equipment.objects.create(infrastructure=self.infrastructure)
+        self.press = Equipment.objects.create(infrastructure=self.other_infrastructure)
+        self.equipment_ids = [self.microscope.pk, self.laser.pk, self.press.pk]
+
+        # Everything at the first infrastructure needs booking two days ahead
+        AccessCondition.objects.create(
+            infrastructure=self.infrastructure, access_type='open', min_booking_days=2
+        )
+        AccessCondition.objects.create(
+            equipment=self.laser, access_type='open', requires_safety_certification=True
+        )
+        AccessCondition.objects.create(
+            equipment=self.press, access_type='commercial', requires_booking=True, min_booking_days=14
+        )
+        self.evaluator = EligibilityEvaluator()
+
+    def test_requirements_and_user_types(self):
+        """Test missing certification and user type restrictions exclude equipment."""
+        academic = Applicant('academic')
+        certified = Applicant('commercial', safety_certification=True)
+
+        self.assertEqual(self.evaluator.eligible('equipment', self.equipment_ids, academic), [self.microscope.pk])
+        self.assertEqual(self.evaluator.eligible('equipment', self.equipment_ids, certified), self.equipment_ids)
+
+    def test_booking_horizon(self):
+        """Test infrastructure booking windows apply to its equipment."""
+        applicant = Applicant('commercial', safety_certification=True)
+
+        self.assertEqual(self.evaluator.eligible('equipment', self.equipment_ids, applicant, within_days=1), [])
+        self.assertEqual(
+            self.evaluator.eligible('equipment', self.equipment_ids, applicant, within_days=7),
+            [self.microscope.pk, self.laser.pk]
+        )
+
+    def test_service_conditions_apply_on_top(self):
+        """Test a service's conditions narrow equipment eligibility."""
+        service = Service.objects.create(code='XRD')
+        AccessCondition.objects.create(service=service, access_type='open', requires_training=True)
+
+        untrained = self.evaluator.eligible(
+            'equipment', self.equipment_ids, Applicant('academic'), service_id=service.pk
+        )
+        trained = self.evaluator.eligible(
+            'equipment', self.equipment_ids, Applicant('academic', training=True), service_id=service.pk
+        )
+
+        self.assertEqual(untrained, [])
+        self.assertEqual(trained, [self.microscope.pk])
+
+    def test_compiled_once_and_invalidated(self):
+        """Test rules compile once and recompile after a condition is saved."""
+        applicant = Applicant('academic')
+        self.evaluator.rules()
+
+        with self.assertNumQueries(0):
+            self.evaluator.eligible('equipment', self.equipment_ids, applicant)
+
+        AccessCondition.objects.create(equipment=self.microscope, access_type='by_approval')
+        self.assertEqual(self.evaluator.eligible('equipment', self.equipment_ids, applicant), [])
+
+    def test_only_moving_equipment_recompiles(self):
+        """Test editing equipment keeps the compiled rules and moving it recompiles them."""
+        compiled = self.evaluator.rules()
+
+        self.press.name = 'Hydraulic Press'
+        self.press.save()
+        self.assertIs(self.evaluator.rules(), compiled)
+
+        self.press.infrastructure = self.infrastructure
+        self.press.save()
+        self.assertIsNot(self.evaluator.rules(), compiled)
+
+    def test_unknown_user_type(self):
+        """Test an unknown user type is rejected."""
+        with self.assertRaises(ValueError):
+            self.evaluator.eligible('equipment', self.equipment_ids, Applicant('student'))
@@ -1,9 +1,14 @@
 from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
 from django.utils.html import format_html
-from .models import AuditLog, ChangeHistory, DataQualityMetric
+from .models import AuditLog, ChangeHistory, HistorySnapshot, DataQualityMetric, DataQualityRollup
+from .admin_views import register_quality_dashboard_admin_view
 
 from ScientaGrid.admin import admin_site
 
+# Register data quality dashboard view
+register_quality_dashboard_admin_view(admin_site)
+
 
 @admin.register(AuditLog, site=admin_site)
 class AuditLogAdmin(admin.ModelAdmin):
@@ -137,6 +142,34 @@ class ChangeHistoryAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(HistorySnapshot, site=admin_site)
+class HistorySnapshotAdmin(admin.ModelAdmin):
+    list_display = [
+        'timestamp',
+        'content_type',
+        'object_id'
+    ]
+    list_filter = [
+        'content_type',
+        'timestamp'
+    ]
+    search_fields = [
+        'object_id'
+    ]
+    readonly_fields = [
+        'timestamp',
+        'content_type',
+        'object_id',
+        'data'
+    ]
+
+    date_hierarchy = 'timestamp'
+
+    def has_add_permission(self, request):
+        """Prevent manual creation."""
+        return False
+
+
 @admin.register(DataQualityMetric, site=admin_site)
 class DataQualityMetricAdmin(admin.ModelAdmin):
     list_display = [
@@ -228,15 +261,20 @@ class DataQualityMetricAdmin(admin.ModelAdmin):
 
     def recalculate_metrics(self, request, queryset):
         """Recalculate quality metrics for selected objects."""
+        # Group object IDs by content type so each model is recalculated in bulk
+        object_ids = {}
+        for content_type_id, object_id in queryset.values_list('content_type', 'object_id'):
+            object_ids.setdefault(content_type_id, []).append(object_id)
+
         count = 0
-        for metric in queryset:
+        for content_type_id, ids in object_ids.items():
+            content_type = ContentType.objects.get_for_id(content_type_id)
             try:
-                obj = metric.content_object
-                if obj:
-                    DataQualityMetric.calculate_for_object(obj)
-                    count += 1
+                count += DataQualityMetric.calculate_for_queryset(
+                    content_type.get_all_objects_for_this_type(pk__in=ids)
+                )
             except Exception as e:
-                self.message_user(request, f'Error recalculating for {metric}: {e}', level='error')
+                self.message_user(request, f'Error recalculating for {content_type}: {e}', level='error')
 
         self.message_user(request, f'Recalculated metrics for {count} objects.')
 
@@ -244,4 +282,33 @@ class DataQualityMetricAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         """Allow deletion to force recalculation."""
-        return True
\ No newline at end of file
+        return True
+
+
+@admin.register(DataQualityRollup, site=admin_site)
+class DataQualityRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        'content_type',
+        'dimension',
+        'dimension_label',
+        'object_count',
+        'avg_quality',
+        'p50_quality',
+        'p90_quality',
+        'refreshed_at'
+    ]
+    list_filter = [
+        'content_type',
+        'dimension'
+    ]
+    search_fields = [
+        'dimension_label'
+    ]
+
+    def has_add_permission(self, request):
+        """Rollups are computed, not entered."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Make read-only."""
+        return False
@@ -0,0 +1,57 @@
+from django.shortcuts import render
+from django.urls import path
+from .models import DataQualityRollup, DataQualityDirtyObject
+
+
+class DataQualityDashboardView:
+    """Custom admin view showing fleet-level data quality from precomputed rollups."""
+
+    def get_urls(self):
+        """Add custom URL for the dashboard view."""
+        urls = [
+            path(
+                'data-quality/',
+                self.admin_site.admin_view(self.dashboard_view),
+                name='data_quality_dashboard'
+            ),
+        ]
+        return urls
+
+    def dashboard_view(self, request):
+        """Render rollups grouped by breakdown dimension."""
+        dimension = request.GET.get('dimension', 'model')
+        if dimension not in dict(DataQualityRollup.DIMENSIONS):
+            dimension = 'model'
+
+        rollups = DataQualityRollup.objects.filter(
+            dimension=dimension
+        ).select_related('content_type').order_by('content_type', 'avg_quality')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Data Quality Dashboard',
+            'opts': {'app_label': 'audit'},
+            'dimension': dimension,
+            'dimensions': DataQualityRollup.DIMENSIONS,
+            'rollups': rollups,
+            'staleness': DataQualityDirtyObject.staleness(),
+        }
+
+        return render(request, 'admin/audit/data_quality_dashboard.html', context)
+
+
+# Register the view
+def register_quality_dashboard_admin_view(admin_site):
+    """Register data quality dashboard view with admin."""
+    dashboard_view = DataQualityDashboardView()
+    dashboard_view.admin_site = admin_site
+
+    # Add to admin URLs
+    original_get_urls = admin_site.get_urls
+
+    def get_urls():
+        urls = original_get_urls()
+        custom_urls = dashboard_view.get_urls()
+        return custom_urls + urls
+
+    admin_site.get_urls = get_urls
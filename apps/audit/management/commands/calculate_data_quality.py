@@ -1,10 +1,32 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps as django_apps
 from django.core.management.base import BaseCommand
-from apps.audit.models import DataQualityMetric
+from django.db import connections
+from django.db.models import Max, Min
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from apps.audit.models import DataQualityMetric, DataQualityDirtyObject, DataQualityRollup
 from apps.infrastructures.models import Infrastructure
 from apps.equipment.models import Equipment
 from apps.services.models import Service
 
 
+def _close_connections():
+    """Drop connections inherited from the parent so each worker opens its own."""
+    connections.close_all()
+
+
+def _calculate_range(model_label, start, end):
+    """Calculate metrics for objects with primary keys in [start, end)."""
+    model = django_apps.get_model(model_label)
+    return DataQualityMetric.calculate_for_queryset(
+        model.objects.filter(pk__gte=start, pk__lt=end)
+    )
+
+
 class Command(BaseCommand):
     help = 'Calculate data quality metrics for all objects'
 
@@ -14,8 +36,35 @@ class Command(BaseCommand):
             type=str,
             help='Calculate only for specific model (infrastructure, equipment, service)',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes (default: 1, no pool)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of primary keys per chunk (default: 1000)',
+        )
+        parser.add_argument(
+            '--dirty-only',
+            action='store_true',
+            help='Recalculate only objects marked dirty by recent changes',
+        )
+        parser.add_argument(
+            '--debounce',
+            type=int,
+            default=5,
+            help='With --dirty-only, skip objects changed in the last N seconds (default: 5)',
+        )
 
     def handle(self, *args, **options):
+        if options['dirty_only']:
+            self.process_dirty(options)
+            return
+
         models_to_process = []
 
         if options['model']:
@@ -33,20 +82,94 @@ class Command(BaseCommand):
         else:
             models_to_process = [Infrastructure, Equipment, Service]
 
+        workers = max(1, options['workers'])
+        chunk_size = max(1, options['chunk_size'])
         total_calculated = 0
+        start_time = time.monotonic()
 
         for model in models_to_process:
-            self.stdout.write(f'\nProcessing {model.__name__}...')
-            objects = model.objects.all()
+            total_calculated += self.process_model(model, workers, chunk_size, options['verbosity'])
+
+        elapsed = time.monotonic() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f'\nCalculated metrics for {total_calculated} objects in {elapsed:.2f}s'
+        ))
+
+    def process_dirty(self, options):
+        """Recalculate only objects marked dirty and report how far behind the metrics are."""
+        start_time = time.monotonic()
+        processed = DataQualityDirtyObject.process(
+            batch_size=max(1, options['chunk_size']),
+            debounce_seconds=options['debounce']
+        )
+        elapsed = time.monotonic() - start_time
+
+        staleness = DataQualityDirtyObject.staleness()
+        self.stdout.write(f'Pending dirty objects: {staleness["pending"]} (lag {staleness["lag_seconds"]:.0f}s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Recalculated metrics for {processed} dirty objects in {elapsed:.2f}s'
+        ))
+
+    def process_model(self, model, workers, chunk_size, verbosity):
+        """Split the primary-key space of a model into ranges and calculate each range."""
+        self.stdout.write(f'\nProcessing {model.__name__}...')
+        model_start = time.monotonic()
+        marked_before = timezone.now()
 
-            for obj in objects:
+        bounds = model.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('  No objects')
+            return 0
+
+        ranges = [
+            (start, start + chunk_size)
+            for start in range(bounds['first'], bounds['last'] + 1, chunk_size)
+        ]
+        expected = model.objects.count()
+        calculated = 0
+
+        def report(count):
+            nonlocal calculated
+            calculated += count
+            if verbosity >= 2:
+                self.stdout.write(f'  {calculated}/{expected} ({calculated * 100 // expected}%)')
+
+        if workers == 1:
+            for start, end in ranges:
                 try:
-                    metric = DataQualityMetric.calculate_for_object(obj)
-                    total_calculated += 1
-                    self.stdout.write(
-                        f'  {obj}: Quality={metric.quality_score}%, Completeness={metric.completeness_score}%'
-                    )
+                    report(_calculate_range(model._meta.label, start, end))
                 except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'  Error processing {obj}: {e}'))
+                    self.stdout.write(self.style.ERROR(f'  Error processing pk {start}-{end - 1}: {e}'))
+        else:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_close_connections
+            ) as executor:
+                futures = {
+                    executor.submit(_calculate_range, model._meta.label, start, end): (start, end)
+                    for start, end in ranges
+                }
+                for future in as_completed(futures):
+                    start, end = futures[future]
+                    try:
+                        report(future.result())
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'  Error processing pk {start}-{end - 1}: {e}'))
+
+        # A full run covers every change made before it started
+        content_type = ContentType.objects.get_for_model(model)
+        DataQualityDirtyObject.objects.filter(
+            content_type=content_type,
+            last_marked_at__lte=marked_before
+        ).delete()
+        DataQualityRollup.refresh(content_type)
 
-        self.stdout.write(self.style.SUCCESS(f'\nCalculated metrics for {total_calculated} objects'))
\ No newline at end of file
+        elapsed = time.monotonic() - model_start
+        throughput = calculated / elapsed if elapsed > 0 else calculated
+        self.stdout.write(
+            f'  {model.__name__}: {calculated} objects in {elapsed:.2f}s ({throughput:.0f} objects/s)'
+        )
+        return calculated
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from apps.audit.models import ChangeHistory, HistorySnapshot
+
+
+class Command(BaseCommand):
+    help = 'Store history snapshots for objects with many changes since their last snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-changes',
+            type=int,
+            default=50,
+            help='Snapshot objects with at least this many changes since their last snapshot (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        latest_snapshot = HistorySnapshot.objects.filter(
+            content_type=OuterRef('content_type'),
+            object_id=OuterRef('object_id')
+        ).order_by('-timestamp').values('timestamp')[:1]
+
+        pending = ChangeHistory.objects.annotate(
+            last_snapshot=Subquery(latest_snapshot)
+        ).filter(
+            Q(last_snapshot__isnull=True) | Q(timestamp__gt=F('last_snapshot'))
+        ).order_by().values('content_type', 'object_id').annotate(
+            changes=Count('id')
+        ).filter(changes__gte=options['min_changes'])
+
+        # Group object IDs by content type so each model is loaded in one query
+        object_ids = {}
+        for row in pending:
+            object_ids.setdefault(row['content_type'], []).append(row['object_id'])
+
+        total_created = 0
+
+        for content_type_id, ids in object_ids.items():
+            content_type = ContentType.objects.get_for_id(content_type_id)
+            snapshots = [
+                HistorySnapshot(
+                    content_type=content_type,
+                    object_id=obj.pk,
+                    data=ChangeHistory.serialize_object(obj)
+                )
+                for obj in content_type.get_all_objects_for_this_type(pk__in=ids)
+            ]
+            HistorySnapshot.objects.bulk_create(snapshots)
+            total_created += len(snapshots)
+            self.stdout.write(f'  {content_type}: {len(snapshots)} snapshots')
+
+        self.stdout.write(self.style.SUCCESS(f'\nCreated {total_created} history snapshots'))
@@ -1,6 +1,14 @@
-from django.db import models
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.db import models, transaction
+from django.db.models import Count, Exists, Min, OuterRef
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
+from ScientaGrid.db import bulk_upsert
 from apps.users.models import UserProfile
 import json
 
@@ -210,12 +218,130 @@ class ChangeHistory(models.Model):
         return cls.objects.create(
             content_object=content_object,
             field_name=field_name,
-            old_value=str(old_value) if old_value is not None else '',
-            new_value=str(new_value) if new_value is not None else '',
+            old_value=cls.serialize_value(old_value),
+            new_value=cls.serialize_value(new_value),
             user=user,
             change_type=change_type
         )
 
+    @staticmethod
+    def serialize_value(value):
+        """Convert a field value to the string form stored in the history."""
+        return str(value) if value is not None else ''
+
+    @staticmethod
+    def tracked_fields(model):
+        """Get the fields whose changes are recorded for a model."""
+        return [
+            field for field in model._meta.get_fields()
+            if field.concrete and not field.many_to_many and not field.one_to_many and not field.auto_created
+        ]
+
+    @classmethod
+    def serialize_object(cls, content_object):
+        """Get the current state of an object in the same form as the recorded changes."""
+        return {
+            field.name: cls.serialize_value(getattr(content_object, field.name, None))
+            for field in cls.tracked_fields(type(content_object))
+        }
+
+    @classmethod
+    def reconstruct(cls, content_type, object_id, at):
+        """
+        Rebuild the state of a tracked object at a given moment.
+
+        Starts from the nearest HistorySnapshot taken at or before `at` and replays only
+        the changes recorded after it. Objects without an earlier snapshot are rebuilt
+        from their current state by rolling back the changes recorded after `at`.
+
+        Usage:
+            ChangeHistory.reconstruct(Infrastructure, infrastructure.pk, datetime(2026, 1, 1))
+
+        Returns:
+            Dictionary of field name to value (as string), or None if the object
+            did not exist at that moment or cannot be rebuilt.
+        """
+        if not isinstance(content_type, ContentType):
+            content_type = ContentType.objects.get_for_model(content_type)
+
+        history = cls.objects.filter(content_type=content_type, object_id=object_id)
+
+        snapshot = HistorySnapshot.objects.filter(
+            content_type=content_type,
+            object_id=object_id,
+            timestamp__lte=at
+        ).order_by('-timestamp').first()
+
+        if snapshot:
+            state = dict(snapshot.data)
+            deltas = history.filter(
+                timestamp__gt=snapshot.timestamp,
+                timestamp__lte=at
+            ).order_by('timestamp', 'id').values_list('field_name', 'new_value')
+            for field_name, new_value in deltas:
+                state[field_name] = new_value
+            return state
+
+        # No checkpoint before `at` - roll back from the current state
+        content_object = content_type.get_all_objects_for_this_type(pk=object_id).first()
+        if content_object is None:
+            return None
+
+        created_at = getattr(content_object, 'created_at', None)
+        if created_at and created_at > at:
+            return None
+
+        state = cls.serialize_object(content_object)
+        deltas = history.filter(
+            timestamp__gt=at
+        ).order_by('-timestamp', '-id').values_list('field_name', 'old_value')
+        for field_name, old_value in deltas:
+            state[field_name] = old_value
+        return state
+
+
+class HistorySnapshot(models.Model):
+    """Full-state checkpoint of a tracked object used to speed up history reconstruction."""
+
+    # What object
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE
+    )
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    # When
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # State of all tracked fields (as strings, like ChangeHistory values)
+    data = models.JSONField(
+        help_text="JSON representation of the object state at this moment"
+    )
+
+    class Meta:
+        ordering = ['-timestamp']
+        verbose_name_plural = "History Snapshots"
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', '-timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type} {self.object_id} - snapshot at {self.timestamp}"
+
+    @classmethod
+    def capture(cls, content_object):
+        """
+        Store the current state of an object as a checkpoint.
+
+        Usage:
+            HistorySnapshot.capture(infrastructure)
+        """
+        return cls.objects.create(
+            content_object=content_object,
+            data=ChangeHistory.serialize_object(content_object)
+        )
+
 
 class DataQualityMetric(models.Model):
     """Tracks data quality and completeness metrics."""
@@ -260,6 +386,9 @@ class DataQualityMetric(models.Model):
     has_pricing = models.BooleanField(default=False)
     has_access_conditions = models.BooleanField(default=False)
 
+    # What DataQualityRollup last counted for this metric, see DataQualityRollup.counted()
+    rollup_counted = models.JSONField(null=True, blank=True, editable=False)
+
     # Tracking
     last_updated = models.DateTimeField(auto_now=True)
     calculated_at = models.DateTimeField(auto_now_add=True)
@@ -272,6 +401,15 @@ class DataQualityMetric(models.Model):
     def __str__(self):
         return f"{self.content_type} {self.object_id} - Quality: {self.quality_score}%"
 
+    CHECK_FIELDS = [
+        'has_description',
+        'has_contact',
+        'has_location',
+        'has_documentation',
+        'has_pricing',
+        'has_access_conditions',
+    ]
+
     @property
     def quality_level(self):
         """Get quality level as text."""
@@ -298,7 +436,6 @@ class DataQualityMetric(models.Model):
         total_fields = 0
         filled_fields = 0
         missing_fields = []
-        warnings = []
 
         # Get all fields
         for field in content_object._meta.get_fields():
@@ -347,42 +484,660 @@ class DataQualityMetric(models.Model):
         if hasattr(content_object, 'access_conditions'):
             has_access_conditions = content_object.access_conditions.filter(is_active=True).exists()
 
+        # Create or update metric
+        metric, created = cls.objects.update_or_create(
+            content_type=ct,
+            object_id=content_object.pk,
+            defaults=cls._build_values(
+                completeness,
+                missing_fields,
+                has_description=has_description,
+                has_contact=has_contact,
+                has_location=has_location,
+                has_documentation=has_documentation,
+                has_pricing=has_pricing,
+                has_access_conditions=has_access_conditions,
+            )
+        )
+
+        return metric
+
+    @staticmethod
+    def _build_values(completeness, missing_fields, **checks):
+        """Compute the weighted quality score and warnings from completeness and specific checks."""
         # Calculate quality score (weighted)
         quality_checks = [
             (completeness, 0.4),  # 40% weight
-            (100 if has_description else 0, 0.15),  # 15%
-            (100 if has_contact else 0, 0.15),  # 15%
-            (100 if has_location else 0, 0.1),  # 10%
-            (100 if has_documentation else 0, 0.1),  # 10%
-            (100 if (has_pricing and has_access_conditions) else 0, 0.1),  # 10%
+            (100 if checks['has_description'] else 0, 0.15),  # 15%
+            (100 if checks['has_contact'] else 0, 0.15),  # 15%
+            (100 if checks['has_location'] else 0, 0.1),  # 10%
+            (100 if checks['has_documentation'] else 0, 0.1),  # 10%
+            (100 if (checks['has_pricing'] and checks['has_access_conditions']) else 0, 0.1),  # 10%
         ]
 
         quality_score = sum(score * weight for score, weight in quality_checks)
 
         # Generate warnings
-        if not has_description:
+        warnings = []
+        if not checks['has_description']:
             warnings.append("Missing description")
-        if not has_contact:
+        if not checks['has_contact']:
             warnings.append("Missing contact information")
-        if not has_documentation:
+        if not checks['has_documentation']:
             warnings.append("No documentation uploaded")
 
-        # Create or update metric
-        metric, created = cls.objects.update_or_create(
-            content_type=ct,
-            object_id=content_object.pk,
-            defaults={
-                'completeness_score': round(completeness, 2),
-                'quality_score': round(quality_score, 2),
-                'missing_fields': missing_fields,
-                'warnings': warnings,
-                'has_description': has_description,
-                'has_contact': has_contact,
-                'has_location': has_location,
-                'has_documentation': has_documentation,
-                'has_pricing': has_pricing,
-                'has_access_conditions': has_access_conditions,
-            }
+        return {
+            'completeness_score': round(completeness, 2),
+            'quality_score': round(quality_score, 2),
+            'missing_fields': missing_fields,
+            'warnings': warnings,
+            **checks,
+        }
+
+    @staticmethod
+    def _related_exists(model, accessor, **filters):
+        """Build an Exists() subquery for a reverse relation of the model."""
+        relation = next(
+            rel for rel in model._meta.related_objects if rel.get_accessor_name() == accessor
+        )
+        return Exists(
+            relation.related_model._base_manager.filter(**{relation.field.name: OuterRef('pk')}, **filters)
+        )
+
+    @classmethod
+    def _check_expressions(cls, model):
+        """
+        Build the per-row expressions for the specific checks of a model.
+
+        Mirrors the checks of calculate_for_object: each value is either an annotation
+        (Exists subquery) or the name of a column read from values().
+        """
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        checks = {}
+
+        if hasattr(model, '_parler_meta') and 'description' in model._parler_meta.get_all_fields():
+            translations = model._parler_meta.get_model_by_field('description')
+            checks['has_description'] = Exists(
+                translations.objects.filter(master=OuterRef('pk')).exclude(description='')
+            )
+        elif 'description' in concrete:
+            checks['has_description'] = 'description'
+
+        if hasattr(model, 'contact_persons'):
+            checks['has_contact'] = cls._related_exists(model, 'contact_persons')
+        elif 'email' in concrete:
+            checks['has_contact'] = 'email'
+
+        if 'city' in concrete:
+            checks['has_location'] = 'city_id'
+        elif hasattr(model, 'city') and 'infrastructure' in concrete:
+            # Location derived through the parent infrastructure (e.g. Equipment.city)
+            checks['has_location'] = 'infrastructure__city_id'
+
+        if hasattr(model, 'documents'):
+            checks['has_documentation'] = cls._related_exists(model, 'documents', status='active')
+
+        if hasattr(model, 'pricing_policies'):
+            checks['has_pricing'] = cls._related_exists(model, 'pricing_policies', is_active=True)
+
+        if hasattr(model, 'access_conditions'):
+            checks['has_access_conditions'] = cls._related_exists(model, 'access_conditions', is_active=True)
+
+        return checks
+
+    @classmethod
+    def calculate_for_queryset(cls, queryset, batch_size=1000):
+        """
+        Calculate and save quality metrics for all objects of a queryset at once.
+
+        All checks are derived in a single query using annotated Exists() subqueries,
+        completeness is computed from values() rows and metrics are written back with
+        one upsert per batch. A translated description counts if any language has it.
+
+        Usage:
+            DataQualityMetric.calculate_for_queryset(Infrastructure.objects.all())
+
+        Returns:
+            Number of metrics written
+        """
+        model = queryset.model
+        ct = ContentType.objects.get_for_model(model)
+
+        fields = ChangeHistory.tracked_fields(model)
+        checks = cls._check_expressions(model)
+        annotations = {name: expr for name, expr in checks.items() if not isinstance(expr, str)}
+        columns = [field.attname for field in fields] + [expr for expr in checks.values() if isinstance(expr, str)]
+
+        rows = queryset.order_by().annotate(**annotations).values('pk', *columns, *annotations)
+
+        def is_filled(value):
+            return value is not None and value != ''
+
+        metrics = []
+        total_written = 0
+
+        for row in rows.iterator(chunk_size=batch_size):
+            missing_fields = []
+            filled_fields = 0
+            for field in fields:
+                if is_filled(row[field.attname]):
+                    filled_fields += 1
+                elif not field.blank:  # Required field
+                    missing_fields.append(field.name)
+
+            completeness = (filled_fields / len(fields) * 100) if fields else 0
+
+            check_values = {}
+            for name in cls.CHECK_FIELDS:
+                expr = checks.get(name)
+                if expr is None:
+                    check_values[name] = False
+                elif isinstance(expr, str):
+                    check_values[name] = is_filled(row[expr])
+                else:
+                    check_values[name] = bool(row[name])
+
+            values = cls._build_values(completeness, missing_fields, **check_values)
+            metrics.append(cls(content_type=ct, object_id=row['pk'], **values))
+
+            if len(metrics) >= batch_size:
+                total_written += cls._bulk_upsert(metrics)
+                metrics = []
+
+        if metrics:
+            total_written += cls._bulk_upsert(metrics)
+
+        return total_written
+
+    @classmethod
+    def _bulk_upsert(cls, metrics):
+        """Insert or update metrics in a single statement."""
+        bulk_upsert(
+            cls,
+            metrics,
+            unique_fields=['content_type', 'object_id'],
+            update_fields=[
+                'completeness_score',
+                'quality_score',
+                'missing_fields',
+                'warnings',
+                *cls.CHECK_FIELDS,
+                'last_updated',
+            ]
+        )
+        return len(metrics)
+
+
+class DataQualityDirtyObject(models.Model):
+    """Objects whose DataQualityMetric is out of date and waiting for recalculation."""
+
+    # What object
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE
+    )
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    # When the metric became stale and when the object last changed
+    first_marked_at = models.DateTimeField(default=timezone.now)
+    last_marked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['last_marked_at']
+        unique_together = [['content_type', 'object_id']]
+        verbose_name_plural = "Data Quality Dirty Objects"
+
+    def __str__(self):
+        return f"{self.content_type} {self.object_id} - dirty since {self.first_marked_at}"
+
+    @classmethod
+    def mark(cls, model, object_ids):
+        """
+        Mark objects as needing recalculation.
+
+        Marking an already dirty object only moves its last_marked_at forward,
+        so first_marked_at keeps track of how long the metric has been stale.
+
+        Usage:
+            DataQualityDirtyObject.mark(Infrastructure, [infrastructure.pk])
+        """
+        ct = ContentType.objects.get_for_model(model)
+        now = timezone.now()
+        bulk_upsert(
+            cls,
+            [
+                cls(content_type=ct, object_id=object_id, first_marked_at=now, last_marked_at=now)
+                for object_id in set(object_ids) if object_id is not None
+            ],
+            unique_fields=['content_type', 'object_id'],
+            update_fields=['last_marked_at']
         )
 
-        return metric
\ No newline at end of file
+    @classmethod
+    def process(cls, batch_size=1000, debounce_seconds=5):
+        """
+        Recalculate metrics for dirty objects in batches.
+
+        Rollups are updated from each batch's changes. Only objects that
+        have not changed for `debounce_seconds` are processed, so a
+        burst of edits to one object results in a single recalculation. Objects marked
+        again while a batch is processed stay dirty for the next run.
+
+        Returns:
+            Number of dirty objects processed
+        """
+        cutoff = timezone.now() - timedelta(seconds=debounce_seconds)
+        processed = 0
+
+        while True:
+            batch = list(
+                cls.objects.filter(last_marked_at__lte=cutoff).values_list(
+                    'pk', 'content_type_id', 'object_id'
+                )[:batch_size]
+            )
+            if not batch:
+                break
+
+            object_ids = {}
+            for _, content_type_id, object_id in batch:
+                object_ids.setdefault(content_type_id, set()).add(object_id)
+
+            for content_type_id, ids in object_ids.items():
+                ct = ContentType.objects.get_for_id(content_type_id)
+                model = ct.model_class()
+                existing_ids = set(model._base_manager.filter(pk__in=ids).values_list('pk', flat=True))
+
+                DataQualityMetric.calculate_for_queryset(model.objects.filter(pk__in=existing_ids))
+
+                # Objects deleted since they were marked lose their metric, and
+                # their share of the rollups
+                deleted = DataQualityMetric.objects.filter(content_type=ct, object_id__in=ids - existing_ids)
+                removed = list(deleted.filter(rollup_counted__isnull=False).values_list('rollup_counted', flat=True))
+                deleted.delete()
+
+                DataQualityRollup.update(ct, existing_ids, removed)
+
+            cls.objects.filter(
+                pk__in=[pk for pk, _, _ in batch],
+                last_marked_at__lte=cutoff
+            ).delete()
+            processed += len(batch)
+
+        return processed
+
+    @classmethod
+    def staleness(cls):
+        """
+        Get how far behind the quality metrics are.
+
+        Returns:
+            Dictionary with the number of pending objects, when the oldest one became
+            stale and the lag in seconds
+        """
+        stats = cls.objects.aggregate(pending=Count('id'), oldest=Min('first_marked_at'))
+        lag = (timezone.now() - stats['oldest']).total_seconds() if stats['oldest'] else 0
+        return {
+            'pending': stats['pending'],
+            'oldest_marked_at': stats['oldest'],
+            'lag_seconds': lag,
+        }
+
+
+class DataQualityRollup(models.Model):
+    """Precomputed fleet-level quality statistics per model and breakdown dimension."""
+
+    # Which model the statistics describe
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE
+    )
+
+    # Breakdown
+    DIMENSIONS = [
+        ('model', 'Model'),
+        ('institution', 'Institution'),
+        ('city', 'City'),
+        ('technology_domain', 'Technology Domain'),
+    ]
+    dimension = models.CharField(
+        max_length=20,
+        choices=DIMENSIONS
+    )
+    dimension_id = models.PositiveIntegerField(
+        default=0,
+        help_text="ID of the institution, city or domain (0 for the whole model)"
+    )
+    dimension_label = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Name of the institution, city or domain at refresh time"
+    )
+
+    # Statistics
+    object_count = models.IntegerField(default=0)
+    score_sum = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Sum of quality scores, kept so the average can be updated incrementally"
+    )
+    avg_quality = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    p50_quality = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    p90_quality = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    lacking_contact = models.IntegerField(default=0)
+    lacking_documentation = models.IntegerField(default=0)
+    lacking_pricing = models.IntegerField(default=0)
+    lacking_location = models.IntegerField(default=0)
+
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    # How each model maps onto the breakdown dimensions: (lookup, model of the dimension)
+    MODEL_DIMENSIONS = {
+        'infrastructures.infrastructure': {
+            'institution': ('institution', 'institutions.Institution'),
+            'city': ('city', 'locations.City'),
+            'technology_domain': ('technology_domains', 'taxonomy.TechnologyDomain'),
+        },
+        'equipment.equipment': {
+            'institution': ('infrastructure__institution', 'institutions.Institution'),
+            'city': ('infrastructure__city', 'locations.City'),
+            'technology_domain': ('technology_domains', 'taxonomy.TechnologyDomain'),
+        },
+        'services.service': {
+            'technology_domain': ('technology_domains', 'taxonomy.TechnologyDomain'),
+        },
+    }
+
+    class Meta:
+        ordering = ['content_type', 'dimension', 'avg_quality']
+        unique_together = [['content_type', 'dimension', 'dimension_id']]
+        verbose_name_plural = "Data Quality Rollups"
+        indexes = [
+            models.Index(fields=['dimension', 'content_type']),
+        ]
+
+    def __str__(self):
+        label = self.dimension_label or self.get_dimension_display()
+        return f"{self.content_type} by {self.dimension}: {label} - {self.avg_quality}%"
+
+    def _share(self, count):
+        return round(count * 100 / self.object_count, 1) if self.object_count else 0
+
+    @property
+    def lacking_contact_share(self):
+        """Percentage of objects without contact information."""
+        return self._share(self.lacking_contact)
+
+    @property
+    def lacking_documentation_share(self):
+        """Percentage of objects without active documentation."""
+        return self._share(self.lacking_documentation)
+
+    @property
+    def lacking_pricing_share(self):
+        """Percentage of objects without active pricing."""
+        return self._share(self.lacking_pricing)
+
+    @property
+    def lacking_location_share(self):
+        """Percentage of objects without location."""
+        return self._share(self.lacking_location)
+
+    @staticmethod
+    def _percentile(sorted_scores, fraction):
+        """Nearest-rank percentile of an already sorted list."""
+        return sorted_scores[max(0, math.ceil(len(sorted_scores) * fraction) - 1)]
+
+    UPDATE_FIELDS = [
+        'dimension_label',
+        'object_count',
+        'score_sum',
+        'avg_quality',
+        'p50_quality',
+        'p90_quality',
+        'lacking_contact',
+        'lacking_documentation',
+        'lacking_pricing',
+        'lacking_location',
+        'refreshed_at',
+    ]
+
+    # Metric columns a rollup is built from, in the order of ``counted`` values
+    METRIC_COLUMNS = ['quality_score', 'has_contact', 'has_documentation', 'has_pricing', 'has_location']
+
+    @classmethod
+    def _memberships(cls, model, object_ids=None):
+        """Map object IDs to their sorted (dimension, dimension_id) groups below the whole model."""
+        memberships = {}
+        for dimension, (lookup, _) in cls.MODEL_DIMENSIONS.get(model._meta.label_lower, {}).items():
+            objects = model._base_manager.order_by().filter(**{f'{lookup}__isnull': False})
+            if object_ids is not None:
+                objects = objects.filter(pk__in=object_ids)
+            for object_id, dimension_id in objects.values_list('pk', lookup):
+                memberships.setdefault(object_id, set()).add((dimension, dimension_id))
+        return {object_id: sorted(groups) for object_id, groups in memberships.items()}
+
+    @staticmethod
+    def counted(groups, values):
+        """
+        What a metric contributes to the rollups: its groups, score and checks.
+
+        Stored on the metric as ``rollup_counted`` when it is added to the
+        rollups, so a later change can be subtracted exactly.
+        """
+        score, *checks = values
+        return {
+            'groups': [['model', 0]] + [list(group) for group in groups],
+            'score': str(score),
+            'checks': [bool(check) for check in checks],
+        }
+
+    @classmethod
+    def _labels(cls, model, groups):
+        """Current names of the institutions, cities or domains of some groups."""
+        labels = {}
+        for dimension, (_, dimension_model) in cls.MODEL_DIMENSIONS.get(model._meta.label_lower, {}).items():
+            dimension_ids = [dimension_id for group_dimension, dimension_id in groups if group_dimension == dimension]
+            if not dimension_ids:
+                continue
+            for obj in django_apps.get_model(dimension_model).objects.filter(
+                pk__in=dimension_ids
+            ).prefetch_related('translations'):
+                labels[(dimension, obj.pk)] = str(obj)[:255]
+        return labels
+
+    @classmethod
+    def _set_percentiles(cls, rollup, scores):
+        scores = sorted(scores)
+        rollup.p50_quality = cls._percentile(scores, 0.5)
+        rollup.p90_quality = cls._percentile(scores, 0.9)
+
+    @classmethod
+    def refresh(cls, content_type):
+        """
+        Recompute all rollups of one model from its DataQualityMetric rows.
+
+        Reads the metrics once and each dimension mapping once, groups them in
+        memory and replaces the model's rollups in a single upsert. Every
+        metric's ``rollup_counted`` is rewritten to match, after which
+        ``update()`` keeps the rollups current from the changed objects alone.
+
+        Usage:
+            DataQualityRollup.refresh(ContentType.objects.get_for_model(Infrastructure))
+
+        Returns:
+            Number of rollup rows written
+        """
+        model = content_type.model_class()
+        rows = list(DataQualityMetric.objects.filter(content_type=content_type).values_list(
+            'pk', 'object_id', *cls.METRIC_COLUMNS
+        ))
+        memberships = cls._memberships(model) if model else {}
+
+        groups = {}
+        counted_metrics = []
+        for pk, object_id, *values in rows:
+            counted = cls.counted(memberships.get(object_id, []), values)
+            counted_metrics.append(DataQualityMetric(pk=pk, rollup_counted=counted))
+            for group in counted['groups']:
+                groups.setdefault(tuple(group), []).append(values)
+
+        labels = cls._labels(model, groups) if model else {}
+        rollups = []
+        for (dimension, dimension_id), group_values in groups.items():
+            rollup = cls(
+                content_type=content_type,
+                dimension=dimension,
+                dimension_id=dimension_id,
+                dimension_label=labels.get((dimension, dimension_id), ''),
+                object_count=len(group_values),
+                score_sum=sum(values[0] for values in group_values),
+                lacking_contact=sum(1 for values in group_values if not values[1]),
+                lacking_documentation=sum(1 for values in group_values if not values[2]),
+                lacking_pricing=sum(1 for values in group_values if not values[3]),
+                lacking_location=sum(1 for values in group_values if not values[4]),
+            )
+            rollup.avg_quality = round(rollup.score_sum / rollup.object_count, 2)
+            cls._set_percentiles(rollup, [values[0] for values in group_values])
+            rollups.append(rollup)
+
+        with transaction.atomic():
+            bulk_upsert(
+                cls,
+                rollups,
+                unique_fields=['content_type', 'dimension', 'dimension_id'],
+                update_fields=cls.UPDATE_FIELDS
+            )
+            DataQualityMetric.objects.bulk_update(counted_metrics, ['rollup_counted'], batch_size=1000)
+
+            # Remove groups that no longer have any objects
+            stale = cls.objects.filter(content_type=content_type)
+            for dimension in {key[0] for key in groups}:
+                stale = stale.exclude(
+                    dimension=dimension,
+                    dimension_id__in=[key[1] for key in groups if key[0] == dimension]
+                )
+            stale.delete()
+
+        return len(rollups)
+
+    @classmethod
+    def update(cls, content_type, object_ids, removed=()):
+        """
+        Bring the rollups up to date with the metrics of some changed objects.
+
+        Counts, score sums and ``lacking_*`` counters are kept as deltas: each
+        changed metric is subtracted from the groups it was last counted in
+        (its ``rollup_counted``) and added to its current ones. ``removed``
+        holds the ``rollup_counted`` of metrics deleted with their objects.
+        Only the exact percentiles need every score of a group; they are
+        recomputed in one pass over the model's metrics, and only when the
+        scores of some group changed.
+
+        Usage:
+            DataQualityRollup.update(content_type, [infrastructure.pk])
+
+        Returns:
+            Number of rollup rows written
+        """
+        model = content_type.model_class()
+        deltas = {}
+        rescore = set()
+
+        def apply(counted, sign):
+            score = Decimal(counted['score'])
+            for group in counted['groups']:
+                delta = deltas.setdefault(tuple(group), [0, Decimal('0'), 0, 0, 0, 0])
+                delta[0] += sign
+                delta[1] += sign * score
+                for index, present in enumerate(counted['checks'], start=2):
+                    if not present:
+                        delta[index] += sign
+
+        for counted in removed:
+            apply(counted, -1)
+            rescore.update(tuple(group) for group in counted['groups'])
+
+        with transaction.atomic():
+            rows = list(DataQualityMetric.objects.select_for_update().filter(
+                content_type=content_type, object_id__in=object_ids
+            ).values_list('pk', 'object_id', 'rollup_counted', *cls.METRIC_COLUMNS))
+            memberships = cls._memberships(model, [row[1] for row in rows]) if model else {}
+
+            counted_metrics = []
+            for pk, object_id, previous, *values in rows:
+                counted = cls.counted(memberships.get(object_id, []), values)
+                if counted == previous:
+                    continue
+                counted_metrics.append(DataQualityMetric(pk=pk, rollup_counted=counted))
+                apply(counted, 1)
+                groups = {tuple(group) for group in counted['groups']}
+                if previous is None:
+                    rescore.update(groups)
+                    continue
+                apply(previous, -1)
+                previous_groups = {tuple(group) for group in previous['groups']}
+                # Same score in the same group leaves its percentiles alone
+                rescore.update(groups | previous_groups if previous['score'] != counted['score']
+                               else groups ^ previous_groups)
+
+            if not deltas:
+                return 0
+            DataQualityMetric.objects.bulk_update(counted_metrics, ['rollup_counted'], batch_size=1000)
+
+            existing = cls.objects.select_for_update().filter(content_type=content_type)
+            by_dimension = {}
+            for dimension, dimension_id in deltas:
+                by_dimension.setdefault(dimension, []).append(dimension_id)
+            group_filter = models.Q()
+            for dimension, dimension_ids in by_dimension.items():
+                group_filter |= models.Q(dimension=dimension, dimension_id__in=dimension_ids)
+            rollups = {(rollup.dimension, rollup.dimension_id): rollup for rollup in existing.filter(group_filter)}
+
+            labels = cls._labels(model, [group for group in deltas if group not in rollups]) if model else {}
+            for group, (count, score_sum, contact, documentation, pricing, location) in deltas.items():
+                rollup = rollups.get(group)
+                if rollup is None:
+                    rollup = rollups[group] = cls(
+                        content_type=content_type,
+                        dimension=group[0],
+                        dimension_id=group[1],
+                        dimension_label=labels.get(group, '')
+                    )
+                rollup.object_count += count
+                rollup.score_sum += score_sum
+                rollup.lacking_contact += contact
+                rollup.lacking_documentation += documentation
+                rollup.lacking_pricing += pricing
+                rollup.lacking_location += location
+                if rollup.object_count > 0:
+                    rollup.avg_quality = round(rollup.score_sum / rollup.object_count, 2)
+
+            empty = [group for group, rollup in rollups.items() if rollup.object_count <= 0]
+            for group in empty:
+                rollup = rollups.pop(group)
+                if rollup.pk:
+                    rollup.delete()
+
+            rescore &= set(rollups)
+            if rescore:
+                scores = {group: [] for group in rescore}
+                for counted in DataQualityMetric.objects.filter(
+                    content_type=content_type, rollup_counted__isnull=False
+                ).values_list('rollup_counted', flat=True).iterator(chunk_size=2000):
+                    for group in counted['groups']:
+                        group_scores = scores.get(tuple(group))
+                        if group_scores is not None:
+                            group_scores.append(Decimal(counted['score']))
+                for group, group_scores in scores.items():
+                    cls._set_percentiles(rollups[group], group_scores)
+
+            bulk_upsert(
+                cls,
+                list(rollups.values()),
+                unique_fields=['content_type', 'dimension', 'dimension_id'],
+                update_fields=cls.UPDATE_FIELDS
+            )
+
+        return len(rollups)
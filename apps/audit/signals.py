@@ -1,7 +1,7 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from .models import AuditLog, ChangeHistory
+from .models import AuditLog, ChangeHistory, HistorySnapshot, DataQualityDirtyObject
 
 # Models to track
 from apps.infrastructures.models import Infrastructure
@@ -9,9 +9,22 @@ from apps.equipment.models import Equipment
 from apps.services.models import Service
 from apps.institutions.models import Institution
 
+from apps.infrastructures.models import ContactPerson
+from apps.documents.models import Document
+from apps.access.models import AccessCondition, PricingPolicy
+
 # Add more models as needed
 TRACKED_MODELS = [Infrastructure, Equipment, Service, Institution]
 
+# Models with a DataQualityMetric, and the relations through which other models affect it
+QUALITY_MODELS = [Infrastructure, Equipment, Service]
+QUALITY_PARENT_RELATIONS = {
+    ContactPerson: ['infrastructure'],
+    Document: ['infrastructure', 'equipment', 'service'],
+    PricingPolicy: ['infrastructure', 'equipment', 'service'],
+    AccessCondition: ['infrastructure', 'equipment', 'service'],
+}
+
 
 @receiver(post_save)
 def log_creation_and_updates(sender, instance, created, **kwargs):
@@ -26,6 +39,8 @@ def log_creation_and_updates(sender, instance, created, **kwargs):
             description=f"Created {sender.__name__}: {instance}",
             category=sender.__name__.lower()
         )
+        # Initial checkpoint so history reconstruction never has to start from scratch
+        HistorySnapshot.capture(instance)
     else:
         AuditLog.log_action(
             action_type='update',
@@ -65,21 +80,49 @@ def track_field_changes(sender, instance, **kwargs):
         return
 
     # Compare fields
-    for field in instance._meta.get_fields():
-        if field.concrete and not field.many_to_many and not field.one_to_many:
-            if field.auto_created:
-                continue
-
-            field_name = field.name
-            old_value = getattr(old_instance, field_name, None)
-            new_value = getattr(instance, field_name, None)
-
-            # Check if value changed
-            if old_value != new_value:
-                ChangeHistory.log_change(
-                    content_object=instance,
-                    field_name=field_name,
-                    old_value=old_value,
-                    new_value=new_value,
-                    change_type='update'
-                )
\ No newline at end of file
+    for field in ChangeHistory.tracked_fields(sender):
+        field_name = field.name
+        old_value = getattr(old_instance, field_name, None)
+        new_value = getattr(instance, field_name, None)
+
+        # Check if value changed
+        if old_value != new_value:
+            ChangeHistory.log_change(
+                content_object=instance,
+                field_name=field_name,
+                old_value=old_value,
+                new_value=new_value,
+                change_type='update'
+            )
+
+
+def _parent_fields(sender):
+    """Get the foreign keys through which a model affects DataQualityMetric of its parents."""
+    return [sender._meta.get_field(relation) for relation in QUALITY_PARENT_RELATIONS[sender]]
+
+
+@receiver(pre_save)
+def remember_quality_parents(sender, instance, raw=False, **kwargs):
+    """Remember the previous parents so moving an object also refreshes its old parent."""
+    if raw or sender not in QUALITY_PARENT_RELATIONS or not instance.pk:
+        return
+
+    attnames = [field.attname for field in _parent_fields(sender)]
+    instance._quality_previous_parents = sender._base_manager.filter(pk=instance.pk).values(*attnames).first()
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def mark_quality_dirty(sender, instance, raw=False, **kwargs):
+    """Mark objects whose DataQualityMetric is affected by this change for recalculation."""
+    if raw:
+        return
+
+    if sender in QUALITY_MODELS:
+        DataQualityDirtyObject.mark(sender, [instance.pk])
+    elif sender in QUALITY_PARENT_RELATIONS:
+        previous = getattr(instance, '_quality_previous_parents', None) or {}
+        for field in _parent_fields(sender):
+            ids = {getattr(instance, field.attname), previous.get(field.attname)} - {None}
+            if ids:
+                DataQualityDirtyObject.mark(field.related_model, ids)
@@ -1,6 +1,14 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
 from django.test import TestCase
-from apps.audit.models import AuditLog, ChangeHistory, DataQualityMetric
-from apps.infrastructures.models import Infrastructure
+from django.utils import timezone
+from apps.audit.models import (
+    AuditLog, ChangeHistory, HistorySnapshot, DataQualityMetric, DataQualityDirtyObject, DataQualityRollup
+)
+from apps.infrastructures.models import Infrastructure, ContactPerson
 from apps.institutions.models import Institution
 from apps.locations.models import Country, Region, City
 from apps.users.models import UserProfile, StaffRole
@@ -127,6 +135,68 @@ class ChangeHistoryTest(TestCase):
         self.assertEqual(change.change_type, 'update')
 
 
+class ChangeHistoryReconstructionTest(TestCase):
+    """Tests for rebuilding object state from ChangeHistory."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+
+        self.infrastructure = Infrastructure.objects.create(
+            institution=institution,
+            city=city,
+            reliability=3
+        )
+
+        self.before_change = timezone.now()
+        self.infrastructure.reliability = 4
+        self.infrastructure.save()
+
+        self.between_changes = timezone.now()
+        self.infrastructure.reliability = 5
+        self.infrastructure.email = 'lab@test.edu'
+        self.infrastructure.save()
+
+    def test_snapshot_created_with_object(self):
+        """Test creating a tracked object stores an initial snapshot."""
+        snapshot = HistorySnapshot.objects.get(
+            content_type__model='infrastructure',
+            object_id=self.infrastructure.pk
+        )
+        self.assertEqual(snapshot.data['reliability'], '3')
+
+    def test_reconstruct_from_snapshot(self):
+        """Test state is replayed from the nearest snapshot."""
+        state = ChangeHistory.reconstruct(Infrastructure, self.infrastructure.pk, self.before_change)
+        self.assertEqual(state['reliability'], '3')
+        self.assertEqual(state['email'], '')
+
+        state = ChangeHistory.reconstruct(Infrastructure, self.infrastructure.pk, self.between_changes)
+        self.assertEqual(state['reliability'], '4')
+
+        state = ChangeHistory.reconstruct(Infrastructure, self.infrastructure.pk, timezone.now())
+        self.assertEqual(state['reliability'], '5')
+        self.assertEqual(state['email'], 'lab@test.edu')
+
+    def test_reconstruct_without_snapshot(self):
+        """Test state is rolled back from the current object when no snapshot exists."""
+        HistorySnapshot.objects.all().delete()
+
+        state = ChangeHistory.reconstruct(Infrastructure, self.infrastructure.pk, self.between_changes)
+        self.assertEqual(state['reliability'], '4')
+        self.assertEqual(state['email'], '')
+
+    def test_reconstruct_before_creation(self):
+        """Test reconstruction returns None before the object existed."""
+        HistorySnapshot.objects.all().delete()
+        long_ago = self.infrastructure.created_at - timedelta(days=1)
+
+        self.assertIsNone(ChangeHistory.reconstruct(Infrastructure, self.infrastructure.pk, long_ago))
+
+
 class DataQualityMetricTest(TestCase):
     """Tests for DataQualityMetric model."""
 
@@ -177,4 +247,215 @@ class DataQualityMetricTest(TestCase):
         metric = DataQualityMetric.calculate_for_object(self.infrastructure)
 
         quality_levels = ['Poor', 'Fair', 'Good', 'Excellent']
-        self.assertIn(metric.quality_level, quality_levels)
\ No newline at end of file
+        self.assertIn(metric.quality_level, quality_levels)
+
+    def test_bulk_calculation_matches_per_object(self):
+        """Test bulk calculation produces the same metrics as per-object calculation."""
+        ContactPerson.objects.create(
+            infrastructure=self.infrastructure,
+            first_name='Jan',
+            last_name='Kowalski',
+            email='jan@test.edu'
+        )
+        expected = DataQualityMetric.calculate_for_object(self.infrastructure)
+
+        written = DataQualityMetric.calculate_for_queryset(Infrastructure.objects.all())
+        metric = DataQualityMetric.objects.get(pk=expected.pk)
+
+        self.assertEqual(written, 1)
+        self.assertEqual(DataQualityMetric.objects.count(), 1)
+        self.assertEqual(float(metric.completeness_score), float(expected.completeness_score))
+        self.assertEqual(float(metric.quality_score), float(expected.quality_score))
+        self.assertEqual(metric.missing_fields, expected.missing_fields)
+        self.assertEqual(metric.warnings, expected.warnings)
+        for check in DataQualityMetric.CHECK_FIELDS:
+            self.assertEqual(getattr(metric, check), getattr(expected, check), check)
+
+    def test_bulk_calculation_without_related_checks(self):
+        """Test bulk calculation for a model without contact or location relations."""
+        from apps.services.models import Service
+
+        Service.objects.create(code='SVC-1')
+        written = DataQualityMetric.calculate_for_queryset(Service.objects.all())
+        metric = DataQualityMetric.objects.get(content_type__model='service')
+
+        self.assertEqual(written, 1)
+        self.assertFalse(metric.has_contact)
+        self.assertFalse(metric.has_location)
+        self.assertIn('Missing description', metric.warnings)
+
+    def test_calculate_data_quality_command(self):
+        """Test management command calculates metrics in chunks and reports throughput."""
+        out = StringIO()
+        call_command('calculate_data_quality', '--chunk-size', '1', stdout=out)
+
+        self.assertTrue(
+            DataQualityMetric.objects.filter(content_type__model='infrastructure').exists()
+        )
+        self.assertIn('objects/s', out.getvalue())
+        self.assertIn('Calculated metrics for 1 objects', out.getvalue())
+
+
+class DataQualityDirtyObjectTest(TestCase):
+    """Tests for incremental data quality recalculation."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+
+        self.infrastructure = Infrastructure.objects.create(
+            institution=institution,
+            city=city
+        )
+
+    def test_save_marks_object_dirty(self):
+        """Test saving a tracked object marks it dirty once."""
+        self.infrastructure.save()
+
+        self.assertEqual(DataQualityDirtyObject.objects.count(), 1)
+        self.assertEqual(DataQualityDirtyObject.staleness()['pending'], 1)
+
+    def test_related_change_marks_parent_dirty(self):
+        """Test adding a contact person marks its infrastructure dirty."""
+        DataQualityDirtyObject.objects.all().delete()
+        ContactPerson.objects.create(
+            infrastructure=self.infrastructure,
+            first_name='Jan',
+            last_name='Kowalski',
+            email='jan@test.edu'
+        )
+
+        dirty = DataQualityDirtyObject.objects.get()
+        self.assertEqual(dirty.content_object, self.infrastructure)
+
+    def test_process_recalculates_dirty_objects(self):
+        """Test processing recalculates dirty objects and clears them."""
+        processed = DataQualityDirtyObject.process(debounce_seconds=0)
+
+        self.assertEqual(processed, 1)
+        self.assertTrue(DataQualityMetric.objects.filter(object_id=self.infrastructure.pk).exists())
+        self.assertEqual(DataQualityDirtyObject.staleness()['pending'], 0)
+
+    def test_process_respects_debounce(self):
+        """Test recently changed objects wait for the debounce period."""
+        processed = DataQualityDirtyObject.process(debounce_seconds=60)
+
+        self.assertEqual(processed, 0)
+        self.assertEqual(DataQualityDirtyObject.objects.count(), 1)
+
+    def test_process_removes_metric_of_deleted_object(self):
+        """Test metrics of deleted objects are removed."""
+        DataQualityMetric.calculate_for_object(self.infrastructure)
+        self.infrastructure.delete()
+
+        DataQualityDirtyObject.process(debounce_seconds=0)
+
+        self.assertFalse(DataQualityMetric.objects.exists())
+
+    def test_command_dirty_only(self):
+        """Test management command in dirty-only mode."""
+        out = StringIO()
+        call_command('calculate_data_quality', '--dirty-only', '--debounce', '0', stdout=out)
+
+        self.assertIn('Recalculated metrics for 1 dirty objects', out.getvalue())
+        self.assertIn('Pending dirty objects: 0', out.getvalue())
+
+
+class DataQualityRollupTest(TestCase):
+    """Tests for precomputed data quality rollups."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        self.city = City.objects.create(region=region)
+        self.institution = Institution.objects.create(city=self.city)
+
+        self.infrastructures = [
+            Infrastructure.objects.create(
+                institution=self.institution,
+                city=self.city,
+                email=email
+            )
+            for email in ['lab@test.edu', '']
+        ]
+        DataQualityDirtyObject.process(debounce_seconds=0)
+
+    def snapshot(self):
+        return sorted(DataQualityRollup.objects.values_list(
+            'dimension', 'dimension_id', 'object_count', 'score_sum', 'avg_quality', 'p50_quality',
+            'p90_quality', 'lacking_contact', 'lacking_documentation', 'lacking_pricing', 'lacking_location'
+        ))
+
+    def test_rollups_refreshed_after_processing(self):
+        """Test processing dirty objects refreshes rollups of the affected model."""
+        rollup = DataQualityRollup.objects.get(dimension='model', content_type__model='infrastructure')
+
+        self.assertEqual(rollup.object_count, 2)
+        self.assertEqual(rollup.lacking_location, 0)
+        self.assertEqual(rollup.lacking_contact_share, 100)
+        self.assertLessEqual(rollup.p50_quality, rollup.p90_quality)
+
+    def test_rollups_by_dimension(self):
+        """Test rollups are broken down by institution and city."""
+        by_institution = DataQualityRollup.objects.get(dimension='institution')
+        by_city = DataQualityRollup.objects.get(dimension='city')
+
+        self.assertEqual(by_institution.dimension_id, self.institution.pk)
+        self.assertEqual(by_institution.object_count, 2)
+        self.assertEqual(by_city.dimension_id, self.city.pk)
+
+    def test_incremental_updates_match_refresh(self):
+        """Test rollups updated from changed objects equal a full recomputation."""
+        other_city = City.objects.create(region=self.city.region)
+        moved, edited = self.infrastructures
+        moved.city = other_city
+        moved.email = ''
+        moved.save()
+        edited.email = 'facility@test.edu'
+        edited.save()
+        Infrastructure.objects.create(institution=self.institution, city=other_city, email='new@test.edu')
+        DataQualityDirtyObject.process(debounce_seconds=0)
+
+        updated = self.snapshot()
+        self.assertEqual(
+            DataQualityRollup.objects.get(dimension='city', dimension_id=other_city.pk).object_count, 2
+        )
+        DataQualityRollup.refresh(ContentType.objects.get_for_model(Infrastructure))
+        self.assertEqual(updated, self.snapshot())
+
+    def test_deleted_objects_leave_rollups(self):
+        """Test deleting objects subtracts them and drops groups left empty."""
+        for infrastructure in self.infrastructures:
+            infrastructure.delete()
+        DataQualityDirtyObject.process(debounce_seconds=0)
+
+        self.assertFalse(DataQualityRollup.objects.exists())
+
+    def test_unchanged_metrics_not_rewritten(self):
+        """Test reprocessing objects whose metrics did not change leaves the rollups alone."""
+        before = self.snapshot()
+        content_type = ContentType.objects.get_for_model(Infrastructure)
+
+        self.assertEqual(DataQualityRollup.update(content_type, [self.infrastructures[0].pk]), 0)
+        self.assertEqual(before, self.snapshot())
+
+    def test_stale_groups_removed(self):
+        """Test groups without objects are removed on refresh."""
+        DataQualityMetric.objects.all().delete()
+        DataQualityRollup.refresh(ContentType.objects.get_for_model(Infrastructure))
+
+        self.assertFalse(DataQualityRollup.objects.exists())
+
+    def test_dashboard_view(self):
+        """Test admin dashboard renders rollups."""
+        UserProfile.objects.create_superuser(username='admin', email='admin@test.edu', password='adminpass')
+        self.client.login(username='admin', password='adminpass')
+
+        response = self.client.get('/admin/data-quality/', {'dimension': 'institution'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['rollups']), 1)
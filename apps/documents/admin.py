@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.db.models import Prefetch
+from django.urls import reverse
 from django.utils.html import format_html
 from parler.admin import TranslatableAdmin, TranslatableTabularInline
-from .models import DocumentType, Document
+from . import versioning
+from .models import DocumentBlob, DocumentPreview, DocumentType, Document, UploadSession
 
 from ScientaGrid.admin import admin_site
 
@@ -70,6 +73,7 @@ class DocumentInline(TranslatableTabularInline):  # Changed from TabularInline t
 @admin.register(Document, site=admin_site)
 class DocumentAdmin(TranslatableAdmin):
     list_display = [
+        'preview_thumbnail',
         'get_title',  # Changed from 'title' to custom method
         'get_filename',  # Changed from 'filename'
         'document_type',
@@ -122,6 +126,8 @@ class DocumentAdmin(TranslatableAdmin):
     )
 
     readonly_fields = [
+        'original_filename',
+        'content_hash',
         'file_size',
         'file_extension',
         'mime_type',
@@ -143,15 +149,35 @@ class DocumentAdmin(TranslatableAdmin):
         if obj.file:
             return format_html(
                 '<a href="{}" target="_blank">{}</a>',
-                obj.file.url,
+                reverse('documents:download', args=[obj.pk]),
                 obj.filename
             )
         return "-"
     get_filename.short_description = 'File'
 
+    def preview_thumbnail(self, obj):
+        """Show the small preview if one has been generated."""
+        small_previews = getattr(obj.blob, 'small_previews', None) if obj.blob else None
+        if small_previews:
+            return format_html(
+                '<img src="{}" width="{}" height="{}" loading="lazy" alt="">',
+                reverse('documents:preview', args=[obj.pk, 'small']),
+                small_previews[0].width,
+                small_previews[0].height
+            )
+        return "-"
+    preview_thumbnail.short_description = 'Preview'
+
     def get_queryset(self, request):
         """Override to get distinct documents."""
-        qs = Document.objects.all()
+        # Only the small preview rows are loaded; images are fetched by the browser
+        qs = Document.objects.select_related('blob', 'document_type').prefetch_related(
+            Prefetch(
+                'blob__previews',
+                queryset=DocumentPreview.objects.filter(variant='small'),
+                to_attr='small_previews'
+            )
+        )
         ordering = self.get_ordering(request) or ['-created_at']
         safe_ordering = [o for o in ordering if 'translation' not in o]
         if safe_ordering:
@@ -165,6 +191,8 @@ class DocumentAdmin(TranslatableAdmin):
             return fieldsets + (
                 ('File Metadata', {
                     'fields': (
+                        'original_filename',
+                        'content_hash',
                         'file_size',
                         'file_extension',
                         'mime_type'
@@ -216,33 +244,73 @@ class DocumentAdmin(TranslatableAdmin):
         'mark_active',
         'mark_archived',
         'mark_public',
-        'mark_private'
+        'mark_private',
+        'mark_earlier_versions_obsolete',
+        'mark_chains_obsolete'
     ]
 
     def mark_active(self, request, queryset):
-        updated = queryset.update(status='active')
+        updated = versioning.set_status(queryset, 'active')
         self.message_user(request, f'{updated} documents marked as active.')
 
     mark_active.short_description = "Mark selected as active"
 
     def mark_archived(self, request, queryset):
-        updated = queryset.update(status='archived')
+        updated = versioning.set_status(queryset, 'archived')
         self.message_user(request, f'{updated} documents marked as archived.')
 
     mark_archived.short_description = "Mark selected as archived"
 
     def mark_public(self, request, queryset):
-        updated = queryset.update(is_public=True)
+        updated = versioning.set_public(queryset, True)
         self.message_user(request, f'{updated} documents marked as public.')
 
     mark_public.short_description = "Mark selected as public"
 
     def mark_private(self, request, queryset):
-        updated = queryset.update(is_public=False)
+        updated = versioning.set_public(queryset, False)
         self.message_user(request, f'{updated} documents marked as private.')
 
     mark_private.short_description = "Mark selected as private"
 
+    def mark_earlier_versions_obsolete(self, request, queryset):
+        updated = versioning.obsolete_earlier_versions(queryset)
+        self.message_user(request, f'{updated} earlier versions marked as obsolete.')
+
+    mark_earlier_versions_obsolete.short_description = "Mark earlier versions of selected as obsolete"
+
+    def mark_chains_obsolete(self, request, queryset):
+        updated = versioning.obsolete_chains(queryset)
+        self.message_user(request, f'{updated} documents in the selected version chains marked as obsolete.')
+
+    mark_chains_obsolete.short_description = "Mark all versions of selected as obsolete"
+
+
+@admin.register(DocumentBlob, site=admin_site)
+class DocumentBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'size', 'file', 'ref_count', 'created_at']
+
+    def has_add_permission(self, request):
+        """Blobs are created by uploading documents."""
+        return False
+
+
+@admin.register(UploadSession, site=admin_site)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'received_size', 'total_size', 'status', 'updated_at']
+    list_filter = ['status', 'updated_at']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = [
+        'user', 'document_type', 'infrastructure', 'equipment', 'service', 'title',
+        'filename', 'total_size', 'received_size', 'status', 'document', 'created_at', 'updated_at'
+    ]
+
+    def has_add_permission(self, request):
+        """Sessions are opened through the upload API."""
+        return False
+
 
 # Update other admins to include document inline
 from apps.infrastructures.admin import InfrastructureAdmin
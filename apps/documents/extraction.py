@@ -0,0 +1,108 @@
+"""
+Text extraction from uploaded documents.
+
+Extraction runs in the document worker pool after the upload commits, so
+saving a document never waits for a PDF to be parsed. Text is extracted
+once per blob: documents sharing content share the result.
+
+PDF support needs the optional ``pypdf`` package; without it PDFs are
+marked unsupported. DOCX, TXT and CSV are read with the standard library.
+
+Usage:
+    from apps.documents import extraction, workers
+
+    workers.schedule(extraction.process, document.blob_id, document.file_extension)
+    extraction.process(blob_id, 'pdf')
+"""
+import logging
+import zipfile
+from xml.etree import ElementTree
+
+from .models import DocumentBlob, DocumentText
+
+logger = logging.getLogger(__name__)
+
+# Stop reading text beyond this many characters
+MAX_TEXT_CHARS = 5_000_000
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def extract_plain(fileobj):
+    raw = fileobj.read(MAX_TEXT_CHARS * 4)
+    for encoding in ('utf-8', 'cp1250'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('utf-8', errors='replace')
+
+
+def extract_docx(fileobj):
+    with zipfile.ZipFile(fileobj) as archive:
+        with archive.open('word/document.xml') as xml:
+            paragraphs = []
+            current = []
+            for event, element in ElementTree.iterparse(xml, events=('end',)):
+                if element.tag == f'{WORD_NAMESPACE}t' and element.text:
+                    current.append(element.text)
+                elif element.tag == f'{WORD_NAMESPACE}p':
+                    paragraphs.append(''.join(current))
+                    current = []
+                    element.clear()
+    return '\n'.join(paragraphs)
+
+
+def extract_pdf(fileobj):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFormat('pypdf is not installed')
+
+    pages = []
+    length = 0
+    for page in PdfReader(fileobj).pages:
+        text = page.extract_text() or ''
+        pages.append(text)
+        length += len(text)
+        if length >= MAX_TEXT_CHARS:
+            break
+    return '\n'.join(pages)
+
+
+EXTRACTORS = {
+    'txt': extract_plain,
+    'csv': extract_plain,
+    'docx': extract_docx,
+    'pdf': extract_pdf,
+}
+
+
+def extract(fileobj, extension):
+    """Return the text of a file, or raise UnsupportedFormat."""
+    extractor = EXTRACTORS.get((extension or '').lower())
+    if extractor is None:
+        raise UnsupportedFormat(f"No extractor for '.{extension}'")
+    return extractor(fileobj)[:MAX_TEXT_CHARS]
+
+
+def process(blob_id, extension):
+    """Extract and store the text of a blob unless that was already done."""
+    if DocumentText.objects.filter(blob_id=blob_id).exists():
+        return None
+    blob = DocumentBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return None
+
+    try:
+        with blob.file.open('rb') as fileobj:
+            text = extract(fileobj, extension)
+    except UnsupportedFormat as error:
+        return DocumentText.store(blob_id, '', status='unsupported', error=str(error))
+    except Exception as error:
+        logger.exception('Text extraction failed for blob %s', blob_id)
+        return DocumentText.store(blob_id, '', status='failed', error=str(error))
+    return DocumentText.store(blob_id, text)
@@ -0,0 +1,141 @@
+"""
+Single-pass inspection of uploaded files.
+
+One read of the upload yields its SHA-256, its size and its real MIME type,
+sniffed from the magic bytes of the first few KB. Validation, metadata and
+blob storage all use that result, so no check reopens or rereads the file.
+
+Usage:
+    from apps.documents.inspection import inspect, check_extension
+
+    inspection = inspect(uploaded_file)
+    check_extension(inspection.mime_type, 'pdf')
+"""
+from collections import namedtuple
+import codecs
+import hashlib
+
+from django.core.exceptions import ValidationError
+
+
+HEAD_SIZE = 8 * 1024
+OCTET_STREAM = 'application/octet-stream'
+
+EXTENSION_MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'xls': 'application/vnd.ms-excel',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'ppt': 'application/vnd.ms-powerpoint',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'tif': 'image/tiff',
+    'tiff': 'image/tiff',
+    'bmp': 'image/bmp',
+    'webp': 'image/webp',
+    'txt': 'text/plain',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+    'gz': 'application/gzip',
+    'tgz': 'application/gzip',
+    '7z': 'application/x-7z-compressed',
+}
+
+# Magic bytes at the start of the file, in order of specificity
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (b'\x7fELF', 'application/x-executable'),
+]
+
+# Extensions a detected container type may carry; the extension then
+# decides the specific type (an OLE file may be .doc, .xls or .ppt)
+CONTAINER_EXTENSIONS = {
+    'application/zip': {'zip', 'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp'},
+    'application/x-ole-storage': {'doc', 'xls', 'ppt', 'msg'},
+    'text/plain': {'txt', 'csv', 'tsv', 'json', 'xml', 'md', 'log', 'dat'},
+}
+
+# Content that is never accepted under another extension
+EXECUTABLE_TYPES = {'application/x-msdownload', 'application/x-executable'}
+
+FileInspection = namedtuple('FileInspection', ['sha256', 'size', 'mime_type'])
+
+
+def sniff(head):
+    """Detect a MIME type from the first bytes of a file."""
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    # Two-byte signatures also start ordinary text; confirm with their headers
+    if head[:2] == b'BM' and head[6:10] == b'\x00\x00\x00\x00':
+        return 'image/bmp'
+    if head[:2] == b'MZ' and len(head) >= 64:
+        pe_offset = int.from_bytes(head[60:64], 'little')
+        if head[pe_offset:pe_offset + 4] == b'PE\x00\x00':
+            return 'application/x-msdownload'
+    if head and b'\x00' not in head:
+        try:
+            # Not final: a multi-byte character may be cut at the end of the head
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            return 'text/plain'
+        except UnicodeDecodeError:
+            pass
+    return OCTET_STREAM
+
+
+def inspect(content, chunk_size=64 * 1024):
+    """Hash, measure and sniff a file in one chunked read."""
+    sha256 = hashlib.sha256()
+    size = 0
+    head = b''
+    content.seek(0)
+    for chunk in content.chunks(chunk_size):
+        if len(head) < HEAD_SIZE:
+            head += chunk[:HEAD_SIZE - len(head)]
+        sha256.update(chunk)
+        size += len(chunk)
+    content.seek(0)
+    return FileInspection(sha256.hexdigest(), size, sniff(head))
+
+
+def check_extension(mime_type, extension):
+    """
+    Raise ValidationError if the detected content contradicts the file extension.
+
+    Only extensions registered to a specific type are checked; any other
+    extension (CAD, instrument data, text formats) is left to the document
+    type's list of allowed extensions. Executables are always rejected.
+    """
+    if mime_type in EXECUTABLE_TYPES:
+        raise ValidationError('Executable files cannot be uploaded')
+    expected = EXTENSION_MIME_TYPES.get(extension)
+    if mime_type == OCTET_STREAM or expected is None or expected == mime_type:
+        return
+    if extension in CONTAINER_EXTENSIONS.get(mime_type, ()):
+        return
+    raise ValidationError(
+        f"File content ({mime_type}) does not match its extension '.{extension}'"
+    )
+
+
+def mime_type_for(mime_type, extension):
+    """The MIME type to record: the sniffed one, refined by extension for containers and text."""
+    if mime_type == OCTET_STREAM or mime_type in CONTAINER_EXTENSIONS:
+        return EXTENSION_MIME_TYPES.get(extension, mime_type)
+    return mime_type
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from apps.documents import extraction
+from apps.documents.models import DocumentBlob, DocumentText
+
+
+class Command(BaseCommand):
+    help = 'Extract searchable text from documents that have not been processed yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry blobs whose extraction failed before'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            DocumentText.objects.filter(status='failed').delete()
+
+        blobs = DocumentBlob.objects.filter(text__isnull=True).annotate(
+            extension=Max('documents__file_extension')
+        ).values_list('pk', 'extension')
+
+        statuses = {}
+        for blob_id, extension in blobs.iterator():
+            document_text = extraction.process(blob_id, extension)
+            if document_text is not None:
+                statuses[document_text.status] = statuses.get(document_text.status, 0) + 1
+
+        for status, count in sorted(statuses.items()):
+            self.stdout.write(f'  {status}: {count}')
+        self.stdout.write(self.style.SUCCESS('\nDocument text extracted'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from apps.documents import previews
+from apps.documents.models import DocumentBlob, DocumentPreview
+
+
+class Command(BaseCommand):
+    help = 'Generate missing document previews and prune the preview store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune-only',
+            action='store_true',
+            help='Only drop least recently used previews over the size limit'
+        )
+
+    def handle(self, *args, **options):
+        if not options['prune_only']:
+            blobs = DocumentBlob.objects.annotate(
+                extension=Max('documents__file_extension')
+            ).values_list('pk', 'extension')
+
+            created = 0
+            for blob_id, extension in blobs.iterator():
+                if previews.supports(extension):
+                    created += len(previews.generate(blob_id, extension))
+            self.stdout.write(f'  {created} previews generated')
+
+        pruned = DocumentPreview.prune()
+        self.stdout.write(f'  {pruned} previews pruned')
+        self.stdout.write(self.style.SUCCESS('\nDocument previews updated'))
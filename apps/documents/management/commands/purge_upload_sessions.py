@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.documents.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = 'Abort chunked uploads that have been idle too long and delete their partial files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Abort sessions idle for longer than this many hours (default: 24)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        aborted = UploadSession.purge(cutoff)
+        self.stdout.write(self.style.SUCCESS(f'{aborted} upload sessions aborted'))
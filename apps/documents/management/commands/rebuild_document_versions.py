@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from apps.documents import versioning
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored version chain root and ordinal of every document'
+
+    def handle(self, *args, **options):
+        updated = versioning.rebuild_chains()
+        self.stdout.write(f'  {updated} documents updated')
+        self.stdout.write(self.style.SUCCESS('\nDocument version chains rebuilt'))
@@ -0,0 +1,48 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.documents.models import Document, DocumentBlob
+
+
+class Command(BaseCommand):
+    help = 'Move files of documents uploaded before content-addressed storage into shared blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-files',
+            action='store_true',
+            help='Leave the original files in place after moving them into blobs'
+        )
+
+    def handle(self, *args, **options):
+        documents = Document.objects.filter(blob__isnull=True).exclude(file='').order_by('pk')
+        moved = 0
+        missing = 0
+
+        for document in documents.iterator():
+            path = document.file.name
+            if not default_storage.exists(path):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'  Missing file for document {document.pk}: {path}'))
+                continue
+
+            with default_storage.open(path) as content, transaction.atomic():
+                blob = DocumentBlob.store(content)
+                Document.objects.filter(pk=document.pk).update(
+                    blob=blob,
+                    file=blob.file.name,
+                    content_hash=blob.sha256,
+                    file_size=blob.size,
+                    original_filename=document.original_filename or os.path.basename(path)
+                )
+            moved += 1
+
+            still_used = Document.objects.filter(file=path).exists()
+            if not options['keep_files'] and path != blob.file.name and not still_used:
+                default_storage.delete(path)
+
+        blobs = DocumentBlob.objects.count()
+        self.stdout.write(f'  {moved} documents moved into {blobs} blobs, {missing} files missing')
+        self.stdout.write(self.style.SUCCESS('\nDocument blobs stored'))
@@ -1,9 +1,22 @@
-from django.db import models
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from parler.models import TranslatableModel, TranslatedFields
+from ScientaGrid import counters
 from apps.infrastructures.models import Infrastructure
 from apps.equipment.models import Equipment
 from apps.services.models import Service
+from .inspection import EXTENSION_MIME_TYPES, OCTET_STREAM, check_extension, inspect, mime_type_for
+import hashlib
+import logging
 import os
+import re
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
 
 
 class DocumentType(TranslatableModel):
@@ -56,6 +69,133 @@ class DocumentType(TranslatableModel):
             return [ext.strip().lower() for ext in self.allowed_extensions.split(',')]
         return []
 
+    def validate_file(self, extension=None, size=None):
+        """Check a file extension and size in bytes against this type's restrictions."""
+        from django.core.exceptions import ValidationError
+
+        allowed = self.get_allowed_extensions_list()
+        if extension is not None and allowed and extension not in allowed:
+            raise ValidationError(
+                f"File type '.{extension}' is not allowed for this document type. "
+                f"Allowed types: {', '.join(allowed)}"
+            )
+
+        if size is not None and size > self.max_file_size_mb * 1024 * 1024:
+            raise ValidationError(
+                f"File size ({round(size / (1024 * 1024), 2)} MB) exceeds maximum allowed "
+                f"({self.max_file_size_mb} MB)"
+            )
+
+
+def blob_upload_path(sha256):
+    """Content-addressed path of a blob, fanned out by hash prefix."""
+    return f'documents/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+class AssembledUpload(File):
+    """A file assembled on local disk, which storage can move into place instead of copying."""
+
+    def __init__(self, file, name, path):
+        super().__init__(file, name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+class DocumentBlob(models.Model):
+    """
+    Stored file content, shared by every Document with the same bytes.
+
+    Blobs are stored once under their SHA-256 and reference-counted, so the
+    same manual attached to many pieces of equipment takes one file on disk
+    and re-uploading it writes nothing.
+
+    Usage:
+        blob = DocumentBlob.store(uploaded_file)
+        DocumentBlob.release(blob.pk)
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField(help_text="Size in bytes")
+    mime_type = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Type detected from the content"
+    )
+    file = models.FileField(max_length=255)
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of documents using this content"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes, {self.ref_count} refs)"
+
+    @classmethod
+    def _acquire(cls, sha256):
+        """Take a reference on an existing blob; returns None if there is none."""
+        if cls.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+            return cls.objects.get(sha256=sha256)
+        return None
+
+    @classmethod
+    def store(cls, content, inspection=None):
+        """
+        Store file content and take a reference on it.
+
+        The content is inspected in one pass (unless an inspection is
+        passed in); it is only written when no blob with the same hash
+        exists yet.
+        """
+        sha256, size, mime_type = inspection or inspect(content)
+        blob = cls._acquire(sha256)
+        if blob is not None:
+            return blob
+
+        name = blob_upload_path(sha256)
+        try:
+            with transaction.atomic():
+                blob = cls.objects.create(
+                    sha256=sha256, size=size, mime_type=mime_type, file=name, ref_count=1
+                )
+                # Written once the row is taken, as release() checks for it before deleting
+                # the file. A file left over from a rolled back upload has the same bytes.
+                if not default_storage.exists(name):
+                    default_storage.save(name, content)
+        except IntegrityError:
+            # Stored concurrently by another upload
+            return cls._acquire(sha256)
+        return blob
+
+    @classmethod
+    def release(cls, pk):
+        """Drop a reference; the blob and its file are deleted with the last one."""
+        with transaction.atomic():
+            cls.objects.filter(pk=pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            orphan = cls.objects.select_for_update().filter(pk=pk, ref_count=0).first()
+            if orphan is not None:
+                sha256 = orphan.sha256
+                names = [orphan.file.name] + list(orphan.previews.values_list('file', flat=True))
+                orphan.delete()
+                transaction.on_commit(lambda: cls._delete_files(sha256, names))
+
+    @classmethod
+    def _delete_files(cls, sha256, names):
+        """Delete the files of a released blob, unless the same content was stored again meanwhile."""
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is not None:
+                in_use = {blob.file.name} | set(blob.previews.values_list('file', flat=True))
+                names = [name for name in names if name not in in_use]
+            for name in names:
+                default_storage.delete(name)
+
 
 def document_upload_path(instance, filename):
     """Generate upload path for documents."""
@@ -90,6 +230,28 @@ class Document(TranslatableModel):
         help_text="Upload the document file"
     )
 
+    blob = models.ForeignKey(
+        DocumentBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='documents',
+        editable=False
+    )
+
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the file content"
+    )
+
+    original_filename = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Name of the file as uploaded"
+    )
+
     # What this document relates to
     infrastructure = models.ForeignKey(
         Infrastructure,
@@ -157,6 +319,20 @@ class Document(TranslatableModel):
         help_text="Previous version of this document"
     )
 
+    # Maintained on save so a version chain resolves in one query
+    chain_root_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="ID of the first version in this document's version chain"
+    )
+
+    version_ordinal = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Position of this document in its version chain"
+    )
+
     # Visibility and access
     is_public = models.BooleanField(
         default=False,
@@ -207,14 +383,26 @@ class Document(TranslatableModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['chain_root_id', 'version_ordinal']),
+        ]
 
     def __str__(self):
         title = self.safe_translation_getter('title', any_language=True) or self.filename
         return title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered to notice when a document is moved to another version chain
+        instance._loaded_replaces_id = instance.__dict__.get('replaces_id')
+        return instance
+
     @property
     def filename(self):
-        """Get the filename from the file path."""
+        """Get the filename as uploaded, falling back to the file path."""
+        if self.original_filename:
+            return self.original_filename
         if self.file:
             return os.path.basename(self.file.name)
         return ''
@@ -239,42 +427,131 @@ class Document(TranslatableModel):
     def increment_download_count(self):
         """Increment download counter."""
         from django.utils import timezone
+        counters.increment(Document, self.pk, 'download_count', touch='last_downloaded_at')
         self.download_count += 1
         self.last_downloaded_at = timezone.now()
-        self.save(update_fields=['download_count', 'last_downloaded_at'])
 
-    def save(self, *args, **kwargs):
-        """Auto-populate file metadata on save."""
-        if self.file:
-            # Get file size
-            if not self.file_size:
-                self.file_size = self.file.size
-
-            # Get file extension
-            if not self.file_extension:
-                _, ext = os.path.splitext(self.file.name)
-                self.file_extension = ext.lower().replace('.', '')
-
-            # Get MIME type (basic detection)
-            if not self.mime_type:
-                ext_mime_map = {
-                    'pdf': 'application/pdf',
-                    'doc': 'application/msword',
-                    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                    'xls': 'application/vnd.ms-excel',
-                    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    'ppt': 'application/vnd.ms-powerpoint',
-                    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-                    'jpg': 'image/jpeg',
-                    'jpeg': 'image/jpeg',
-                    'png': 'image/png',
-                    'gif': 'image/gif',
-                    'txt': 'text/plain',
-                    'csv': 'text/csv',
-                }
-                self.mime_type = ext_mime_map.get(self.file_extension, 'application/octet-stream')
+    def successor_ids(self):
+        """IDs of all later versions derived from this document, from one query over its chain."""
+        if self.pk is None or self.chain_root_id is None:
+            return []
+        children = {}
+        members = Document.objects.filter(chain_root_id=self.chain_root_id)
+        for pk, replaces_id in members.values_list('pk', 'replaces_id'):
+            children.setdefault(replaces_id, []).append(pk)
+        found = []
+        pending = list(children.get(self.pk, []))
+        while pending:
+            pk = pending.pop()
+            if pk != self.pk and pk not in found:
+                found.append(pk)
+                pending.extend(children.get(pk, []))
+        return found
+
+    def _version_chain_changed(self):
+        if self._state.adding or self.chain_root_id is None:
+            return True
+        return self.replaces_id != getattr(self, '_loaded_replaces_id', self.replaces_id)
+
+    def _assign_version_chain(self):
+        """Take the chain root and ordinal from the replaced version."""
+        if self.replaces_id is None:
+            # A new first version gets its own ID as root once inserted
+            self.chain_root_id = self.pk
+            self.version_ordinal = 1
+            return
+        previous = Document.objects.values('pk', 'chain_root_id', 'version_ordinal').get(pk=self.replaces_id)
+        self.chain_root_id = previous['chain_root_id'] or previous['pk']
+        self.version_ordinal = previous['version_ordinal'] + 1
+
+    def has_new_upload(self):
+        return bool(self.file) and not self.file._committed
+
+    def upload_extension(self):
+        """Extension of a newly assigned file, or of the stored one."""
+        if not self.has_new_upload():
+            return self.file_extension
+        _, ext = os.path.splitext(self.file.name)
+        return ext.lower().replace('.', '')
+
+    def inspect_upload(self):
+        """
+        Hash, measure and sniff a newly assigned file, once.
+
+        The result is kept for the upload, so validation in clean() and
+        storage in save() share a single read. Returns None if the file is
+        already stored.
+        """
+        if not self.has_new_upload():
+            return None
+        upload = self.file.file
+        cached = getattr(self, '_inspection', None)
+        if cached is None or cached[0] is not upload:
+            self._inspection = (upload, inspect(upload))
+        return self._inspection[1]
+
+    def _store_upload(self):
+        """Move a newly assigned file into content-addressed storage."""
+        inspection = self.inspect_upload()
+        extension = self.upload_extension()
+        upload = self.file.file
+        self.original_filename = os.path.basename(self.file.name)
+        # Pass the upload itself so temporary files are moved, not copied
+        blob = DocumentBlob.store(upload, inspection)
+        self._inspection = None
+        self.blob = blob
+        self.content_hash = blob.sha256
+        self.file_size = blob.size
+        self.file = blob.file.name
+        # Picked up by the post_save handler scheduling text extraction
+        self._uploaded_blob = True
+        self.file_extension = extension
+        self.mime_type = mime_type_for(inspection.mime_type, extension)
 
-        super().save(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        """Store new uploads by content and auto-populate file metadata on save."""
+        previous_blob_id = self.blob_id
+        update_fields = kwargs.get('update_fields')
+        successors = []
+        if (update_fields is None or 'replaces' in update_fields) and self._version_chain_changed():
+            previous_ordinal = self.version_ordinal
+            successors = self.successor_ids()
+            self._assign_version_chain()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'chain_root_id', 'version_ordinal'}
+
+        with transaction.atomic():
+            # The blob reference is rolled back along with a failed save
+            if self.file and not self.file._committed:
+                self._store_upload()
+
+            if self.file:
+                # Get file size
+                if not self.file_size:
+                    self.file_size = self.file.size
+
+                # Get file extension
+                if not self.file_extension:
+                    _, ext = os.path.splitext(self.filename)
+                    self.file_extension = ext.lower().replace('.', '')
+
+                # Get MIME type from the extension when the content was not inspected
+                if not self.mime_type:
+                    self.mime_type = EXTENSION_MIME_TYPES.get(self.file_extension, OCTET_STREAM)
+
+            super().save(*args, **kwargs)
+            if self.chain_root_id is None:
+                self.chain_root_id = self.pk
+                Document.objects.filter(pk=self.pk).update(chain_root_id=self.pk)
+            if successors:
+                # Later versions move along with this one, keeping their distance
+                Document.objects.filter(pk__in=successors).update(
+                    chain_root_id=self.chain_root_id,
+                    version_ordinal=F('version_ordinal') + (self.version_ordinal - previous_ordinal)
+                )
+            if previous_blob_id and previous_blob_id != self.blob_id:
+                DocumentBlob.release(previous_blob_id)
+        self._loaded_replaces_id = self.replaces_id
 
     def clean(self):
         """Validate document."""
@@ -286,20 +563,429 @@ class Document(TranslatableModel):
                 'Document must be linked to at least one: infrastructure, equipment, or service'
             )
 
-        # Validate file extension if document type has restrictions
-        if self.document_type and self.document_type.allowed_extensions and self.file:
-            allowed = self.document_type.get_allowed_extensions_list()
-            if allowed and self.file_extension not in allowed:
-                raise ValidationError(
-                    f"File type '.{self.file_extension}' is not allowed for this document type. "
-                    f"Allowed types: {', '.join(allowed)}"
+        # A document cannot replace itself or one of its own later versions
+        if self.replaces_id and (self.replaces_id == self.pk or self.replaces_id in self.successor_ids()):
+            raise ValidationError({'replaces': 'A document cannot replace itself or a later version of itself'})
+
+        # Check a new file's content against its extension
+        inspection = self.inspect_upload()
+        if inspection is not None:
+            check_extension(inspection.mime_type, self.upload_extension())
+
+        # Validate file extension and size if document type has restrictions
+        if self.document_type:
+            self.document_type.validate_file(
+                extension=self.upload_extension() if self.file else None,
+                size=inspection.size if inspection else self.file_size or None
+            )
+
+
+class DocumentText(models.Model):
+    """
+    Text extracted from a blob, stored once per content hash.
+
+    The text is kept as zlib-compressed chunks; search goes through the
+    DocumentTerm index instead of scanning it.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    STATUS_CHOICES = [
+        ('done', 'Extracted'),
+        ('unsupported', 'Unsupported Format'),
+        ('failed', 'Failed'),
+    ]
+
+    blob = models.OneToOneField(
+        DocumentBlob,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='text'
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    char_count = models.PositiveIntegerField(default=0)
+    term_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Document texts"
+
+    def __str__(self):
+        return f"{self.blob}: {self.status}"
+
+    def get_text(self):
+        """Decompress and join the stored chunks."""
+        return ''.join(
+            zlib.decompress(data).decode('utf-8')
+            for data in self.chunks.order_by('ordinal').values_list('data', flat=True)
+        )
+
+    @classmethod
+    def store(cls, blob_id, text, status='done', error=''):
+        """Replace the text, its chunks and search terms of a blob."""
+        terms = DocumentTerm.terms(text)
+        if len(terms) > DocumentTerm.MAX_TERMS:
+            logger.warning(
+                'Indexing the first %d of %d distinct terms of blob %s',
+                DocumentTerm.MAX_TERMS, len(terms), blob_id
+            )
+            terms = terms[:DocumentTerm.MAX_TERMS]
+        with transaction.atomic():
+            DocumentTerm.objects.filter(blob_id=blob_id).delete()
+            document_text, _ = cls.objects.update_or_create(
+                blob_id=blob_id,
+                defaults={
+                    'status': status,
+                    'char_count': len(text),
+                    'term_count': len(terms),
+                    'error': error
+                }
+            )
+            document_text.chunks.all().delete()
+            DocumentTextChunk.objects.bulk_create([
+                DocumentTextChunk(
+                    text=document_text,
+                    ordinal=ordinal,
+                    data=zlib.compress(text[start:start + cls.CHUNK_SIZE].encode('utf-8'))
                 )
+                for ordinal, start in enumerate(range(0, len(text), cls.CHUNK_SIZE))
+            ])
+            DocumentTerm.objects.bulk_create(
+                [DocumentTerm(blob_id=blob_id, term=term) for term in terms],
+                batch_size=1000
+            )
+        return document_text
 
-        # Validate file size
-        if self.document_type and self.file_size:
-            max_size = self.document_type.max_file_size_mb * 1024 * 1024
-            if self.file_size > max_size:
-                raise ValidationError(
-                    f"File size ({self.file_size_mb} MB) exceeds maximum allowed "
-                    f"({self.document_type.max_file_size_mb} MB)"
-                )
\ No newline at end of file
+
+class DocumentTextChunk(models.Model):
+    """One compressed slice of extracted text."""
+
+    text = models.ForeignKey(DocumentText, on_delete=models.CASCADE, related_name='chunks')
+    ordinal = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = [['text', 'ordinal']]
+
+
+class DocumentTerm(models.Model):
+    """
+    Distinct words of a blob's text, for searching document content.
+
+    Indexed by term first, so matching a query word is a prefix range scan.
+    """
+
+    WORD_RE = re.compile(r'\w{3,}')
+    MAX_TERM_LENGTH = 50
+    MAX_TERMS = 20000
+
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=MAX_TERM_LENGTH)
+
+    class Meta:
+        unique_together = [['term', 'blob']]
+
+    def __str__(self):
+        return self.term
+
+    @classmethod
+    def terms(cls, text):
+        """Distinct lower-cased words of at least three characters, in order of appearance."""
+        found = dict.fromkeys(
+            word[:cls.MAX_TERM_LENGTH] for word in cls.WORD_RE.findall(text.lower())
+        )
+        return list(found)
+
+    @classmethod
+    def matching_documents(cls, query_text):
+        """Active public documents whose content contains every word of the query (as a prefix)."""
+        words = cls.terms(query_text)
+        if not words:
+            return Document.objects.none()
+        documents = Document.objects.filter(status='active', is_public=True)
+        for word in words:
+            documents = documents.filter(
+                blob_id__in=cls.objects.filter(term__startswith=word).values('blob_id')
+            )
+        return documents
+
+
+class DocumentPreview(models.Model):
+    """
+    A downscaled JPEG preview of a blob in one size variant.
+
+    Previews are generated in the background and cached by content hash, so
+    documents sharing content share previews. The store is kept under
+    ``DOCUMENT_PREVIEW_CACHE_MB`` (default 200) by dropping the least
+    recently served previews; they are regenerated on demand.
+    """
+
+    # Longest edge in pixels per variant
+    VARIANTS = {
+        'small': 160,
+        'medium': 640,
+    }
+
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.CASCADE, related_name='previews')
+    variant = models.CharField(max_length=10, choices=[(name, name.title()) for name in VARIANTS])
+    file = models.FileField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    byte_size = models.PositiveIntegerField()
+
+    hit_count = models.PositiveIntegerField(default=0)
+    last_accessed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [['blob', 'variant']]
+
+    def __str__(self):
+        return f"{self.blob.sha256[:12]} {self.variant} ({self.width}x{self.height})"
+
+    @staticmethod
+    def upload_path(sha256, variant):
+        return f'documents/previews/{sha256[:2]}/{sha256}-{variant}.jpg'
+
+    def touch(self):
+        """Record a hit for LRU pruning, through the buffered counters."""
+        counters.increment(DocumentPreview, self.pk, 'hit_count', touch='last_accessed_at')
+
+    @classmethod
+    def prune(cls, max_bytes=None):
+        """Delete least recently used previews until the store fits; returns previews deleted."""
+        if max_bytes is None:
+            max_bytes = getattr(settings, 'DOCUMENT_PREVIEW_CACHE_MB', 200) * 1024 * 1024
+        total = cls.objects.aggregate(total=Sum('byte_size'))['total'] or 0
+        if total <= max_bytes:
+            return 0
+
+        doomed = []
+        names = []
+        for pk, name, byte_size in cls.objects.order_by('last_accessed_at', 'pk').values_list(
+            'pk', 'file', 'byte_size'
+        ).iterator():
+            if total <= max_bytes:
+                break
+            doomed.append(pk)
+            names.append(name)
+            total -= byte_size
+
+        with transaction.atomic():
+            cls.objects.filter(pk__in=doomed).delete()
+            transaction.on_commit(lambda: [default_storage.delete(name) for name in names])
+        return len(doomed)
+
+
+class UploadSession(models.Model):
+    """
+    A chunked, resumable upload of a document.
+
+    The filename and size are validated against the document type before
+    any bytes are accepted. Chunks are appended in order to a partial file
+    next to the media storage, each checked against its SHA-256; a client
+    that lost its connection asks for the current offset and continues from
+    there. Completing the session turns the assembled file into a Document,
+    moving it into blob storage without another copy.
+
+    Settings:
+        DOCUMENT_UPLOAD_CHUNK_SIZE: largest accepted chunk (default 8 MB)
+        DOCUMENT_UPLOAD_DIR: directory of partial files (default MEDIA_ROOT/uploads)
+    """
+
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('complete', 'Complete'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    user = models.ForeignKey(
+        'users.UserProfile',
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+
+    # Document to create
+    document_type = models.ForeignKey(
+        DocumentType,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    infrastructure = models.ForeignKey(
+        Infrastructure,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    equipment = models.ForeignKey(
+        Equipment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    title = models.CharField(max_length=255, blank=True)
+
+    # Transfer
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_size}/{self.total_size} bytes, {self.status})"
+
+    @staticmethod
+    def chunk_size():
+        return getattr(settings, 'DOCUMENT_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+
+    @property
+    def extension(self):
+        return os.path.splitext(self.filename)[1].lower().replace('.', '')
+
+    @property
+    def partial_path(self):
+        directory = getattr(settings, 'DOCUMENT_UPLOAD_DIR', os.path.join(settings.MEDIA_ROOT, 'uploads'))
+        return os.path.join(directory, f'{self.pk}.part')
+
+    def clean(self):
+        """Validate the announced file before any bytes are stored."""
+        from django.core.exceptions import ValidationError
+
+        if not any([self.infrastructure_id, self.equipment_id, self.service_id]):
+            raise ValidationError(
+                'Document must be linked to at least one: infrastructure, equipment, or service'
+            )
+        if self.total_size <= 0:
+            raise ValidationError('File is empty')
+        if self.document_type:
+            self.document_type.validate_file(extension=self.extension, size=self.total_size)
+
+    def append(self, offset, stream, sha256=None):
+        """
+        Append one chunk read from ``stream`` at ``offset``.
+
+        The chunk is streamed to the partial file and hashed in the same
+        pass; on a checksum mismatch the file is cut back and nothing is
+        recorded. Returns the new offset. The caller holds a row lock.
+        """
+        from django.core.exceptions import ValidationError
+
+        if self.status != 'open':
+            raise ValidationError(f'Upload is {self.status}')
+        if offset != self.received_size:
+            raise ValidationError(f'Expected offset {self.received_size}, got {offset}')
+
+        os.makedirs(os.path.dirname(self.partial_path), exist_ok=True)
+        limit = min(self.chunk_size(), self.total_size - offset)
+        chunk_hash = hashlib.sha256()
+        written = 0
+        with open(self.partial_path, 'ab') as partial:
+            partial.truncate(offset)
+            while True:
+                data = stream.read(min(64 * 1024, limit - written + 1))
+                if not data:
+                    break
+                written += len(data)
+                if written > limit:
+                    partial.truncate(offset)
+                    raise ValidationError(f'Chunk is larger than {limit} bytes')
+                chunk_hash.update(data)
+                partial.write(data)
+            if sha256 and chunk_hash.hexdigest() != sha256.lower():
+                partial.truncate(offset)
+                raise ValidationError('Chunk checksum mismatch')
+
+        self.received_size = offset + written
+        self.save(update_fields=['received_size', 'updated_at'])
+        return self.received_size
+
+    def complete(self, sha256=None):
+        """Create the Document from the assembled file; returns it."""
+        from django.core.exceptions import ValidationError
+
+        if self.status != 'open':
+            raise ValidationError(f'Upload is {self.status}')
+        if self.received_size != self.total_size:
+            raise ValidationError(f'Received {self.received_size} of {self.total_size} bytes')
+
+        path = self.partial_path
+        if not os.path.exists(path):
+            # Moved into storage by a save that then failed and rolled back
+            self.abort()
+            raise ValidationError('Upload data is no longer available; start a new upload')
+        with open(path, 'rb') as assembled:
+            document = Document(
+                file=AssembledUpload(assembled, name=self.filename, path=path),
+                document_type=self.document_type,
+                infrastructure=self.infrastructure,
+                equipment=self.equipment,
+                service=self.service,
+                uploaded_by=self.user
+            )
+            document.title = self.title or self.filename
+            # One read checks the checksum, the content type and the real size
+            inspection = document.inspect_upload()
+            if sha256 and inspection.sha256 != sha256.lower():
+                raise ValidationError('File checksum mismatch')
+            document.clean()
+
+            with transaction.atomic():
+                document.save()
+
+                self.document = document
+                self.status = 'complete'
+                self.save(update_fields=['document', 'status', 'updated_at'])
+
+        # Content that was already stored leaves the partial file behind
+        if os.path.exists(path):
+            os.remove(path)
+        return document
+
+    def abort(self):
+        self.status = 'aborted'
+        self.save(update_fields=['status', 'updated_at'])
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    @classmethod
+    def purge(cls, older_than):
+        """Abort open sessions idle since before ``older_than``; returns sessions aborted."""
+        stale = cls.objects.filter(status='open', updated_at__lt=older_than)
+        count = 0
+        for session in stale.iterator():
+            session.abort()
+            count += 1
+        return count
@@ -0,0 +1,131 @@
+"""
+Preview generation for image and PDF documents.
+
+Runs in the document worker pool. The original is decoded once, at reduced
+resolution where the format allows it (JPEG draft mode), and every size
+variant is produced from that single decode. For PDFs the first image
+embedded on the first page is used as the preview, which needs the
+optional ``pypdf`` package; PDFs without one get no preview.
+
+A blob's generation is queued once: a cache key marks it pending until
+its previews exist, or for ``PENDING_TTL`` seconds if they cannot be made.
+
+Usage:
+    from apps.documents import previews
+
+    previews.schedule(document.blob_id, document.file_extension)
+"""
+import io
+import logging
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from PIL import Image
+
+from . import workers
+from .models import DocumentBlob, DocumentPreview
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tif', 'tiff', 'webp'}
+JPEG_QUALITY = 80
+# Seconds a queued generation keeps further requests from queueing another
+PENDING_TTL = 300
+
+
+def supports(extension):
+    return (extension or '').lower() in IMAGE_EXTENSIONS | {'pdf'}
+
+
+def _first_pdf_image(fileobj):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    pages = PdfReader(fileobj).pages
+    if not pages or not pages[0].images:
+        return None
+    return io.BytesIO(pages[0].images[0].data)
+
+
+def _open_source(fileobj, extension):
+    if extension == 'pdf':
+        fileobj = _first_pdf_image(fileobj)
+        if fileobj is None:
+            return None
+    return Image.open(fileobj)
+
+
+def render(image, size):
+    """Return JPEG bytes and dimensions of an image scaled to fit ``size``."""
+    image = image.copy()
+    image.thumbnail((size, size))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return output.getvalue(), image.size
+
+
+def generate(blob_id, extension):
+    """Create the missing preview variants of a blob; returns the previews created."""
+    extension = (extension or '').lower()
+    blob = DocumentBlob.objects.filter(pk=blob_id).first()
+    if blob is None or not supports(extension):
+        return []
+    missing = set(DocumentPreview.VARIANTS) - set(blob.previews.values_list('variant', flat=True))
+    if not missing:
+        cache.delete(_pending_key(blob_id))
+        return []
+
+    largest = max(DocumentPreview.VARIANTS[variant] for variant in missing)
+    try:
+        with blob.file.open('rb') as fileobj:
+            image = _open_source(fileobj, extension)
+            if image is None:
+                return []
+            # Let the JPEG decoder scale down while decoding
+            image.draft('RGB', (largest, largest))
+            image.load()
+    except Exception:
+        logger.exception('Could not decode blob %s for previews', blob_id)
+        return []
+
+    created = []
+    # Largest first, each smaller variant scaled from the previous one
+    for variant in sorted(missing, key=DocumentPreview.VARIANTS.get, reverse=True):
+        data, (width, height) = render(image, DocumentPreview.VARIANTS[variant])
+        name = default_storage.save(DocumentPreview.upload_path(blob.sha256, variant), ContentFile(data))
+        try:
+            with transaction.atomic():
+                created.append(DocumentPreview.objects.create(
+                    blob=blob,
+                    variant=variant,
+                    file=name,
+                    width=width,
+                    height=height,
+                    byte_size=len(data)
+                ))
+        except IntegrityError:
+            # Generated concurrently for another document with the same content
+            default_storage.delete(name)
+        image.thumbnail((width, height))
+
+    if created:
+        DocumentPreview.prune()
+    cache.delete(_pending_key(blob_id))
+    return created
+
+
+def _pending_key(blob_id):
+    return f'documents:preview-pending:{blob_id}'
+
+
+def schedule(blob_id, extension):
+    """Queue preview generation for a blob unless it is already queued; returns whether it was."""
+    if not supports(extension) or not cache.add(_pending_key(blob_id), True, PENDING_TTL):
+        return False
+    workers.schedule(generate, blob_id, extension)
+    return True
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import extraction, previews, workers
+from .models import Document, DocumentBlob
+
+
+@receiver(post_save, sender=Document)
+def process_uploaded_content(sender, instance, **kwargs):
+    """Queue text extraction and previews for newly uploaded content."""
+    if getattr(instance, '_uploaded_blob', False):
+        instance._uploaded_blob = False
+        workers.schedule(extraction.process, instance.blob_id, instance.file_extension)
+        previews.schedule(instance.blob_id, instance.file_extension)
+
+
+@receiver(post_delete, sender=Document)
+def release_document_blob(sender, instance, **kwargs):
+    """Drop the deleted document's reference on its content."""
+    if instance.blob_id:
+        DocumentBlob.release(instance.blob_id)
@@ -1,13 +1,50 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, IntegrityError
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ScientaGrid import counters
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
-from apps.documents.models import DocumentType, Document
+from PIL import Image
+
+from apps.documents import extraction, previews, versioning, workers
+from apps.documents.inspection import check_extension, inspect, sniff
+from apps.documents.models import (
+    DocumentBlob, DocumentPreview, DocumentTerm, DocumentText, DocumentType, Document, UploadSession
+)
+from apps.equipment.models import Equipment
 from apps.infrastructures.models import Infrastructure
 from apps.institutions.models import Institution
 from apps.locations.models import Country, Region, City
 from apps.users.models import UserProfile, StaffRole
 
 
+class TemporaryMediaMixin:
+    """Store uploads, blobs and previews in a MEDIA_ROOT of the test class, removed afterwards."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        # Undone in a class cleanup, after those of settings the class overrides itself
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+
 class DocumentTypeModelTest(TestCase):
     """Tests for DocumentType model."""
 
@@ -46,7 +83,7 @@ class DocumentTypeModelTest(TestCase):
         self.assertIn('docx', extensions)
 
 
-class DocumentModelTest(TestCase):
+class DocumentModelTest(TemporaryMediaMixin, TestCase):
     """Tests for Document model."""
 
     def setUp(self):
@@ -122,6 +159,10 @@ class DocumentModelTest(TestCase):
         self.document.description = 'User manual for test equipment'
         self.document.save()
 
+    def tearDown(self):
+        """Drop increments left buffered by the test."""
+        counters.discard()
+
     def test_document_creation(self):
         """Test document is created correctly."""
         self.assertEqual(self.document.infrastructure, self.infrastructure)
@@ -175,3 +216,691 @@ class DocumentModelTest(TestCase):
         self.assertIsNotNone(self.document.file_size)
         self.assertEqual(self.document.file_extension, 'pdf')
         self.assertEqual(self.document.mime_type, 'application/pdf')
+
+
+class DocumentBlobTest(TemporaryMediaMixin, TestCase):
+    """Tests for content-addressed document storage."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+
+    def create_document(self, name, content):
+        return Document.objects.create(
+            infrastructure=self.infrastructure,
+            file=SimpleUploadedFile(name, content)
+        )
+
+    def test_identical_content_is_stored_once(self):
+        """Test documents with the same bytes share one blob and file."""
+        first = self.create_document('manual.pdf', b'shared manual')
+        second = self.create_document('manual-copy.pdf', b'shared manual')
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 2)
+        self.assertEqual(second.filename, 'manual-copy.pdf')
+        self.assertEqual(second.file_extension, 'pdf')
+        self.assertEqual(second.file_size, len(b'shared manual'))
+        self.assertEqual(len(second.content_hash), 64)
+
+    def test_last_reference_deletes_blob(self):
+        """Test the blob and its file go away with the last document using them."""
+        first = self.create_document('a.txt', b'safety sheet')
+        second = self.create_document('b.txt', b'safety sheet')
+        name = first.file.name
+
+        first.delete()
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_replacing_file_releases_previous_blob(self):
+        """Test uploading a new file to a document drops its reference on the old content."""
+        document = self.create_document('v1.txt', b'version one')
+        old_blob_id = document.blob_id
+
+        document.file = SimpleUploadedFile('v2.txt', b'version two')
+        document.save()
+
+        self.assertNotEqual(document.blob_id, old_blob_id)
+        self.assertFalse(DocumentBlob.objects.filter(pk=old_blob_id).exists())
+        self.assertEqual(document.filename, 'v2.txt')
+
+    def test_failed_save_keeps_reference_count(self):
+        """Test a document that fails to save takes no reference on the blob."""
+        self.create_document('a.txt', b'calibration log')
+
+        with self.assertRaises(IntegrityError):
+            Document.objects.create(
+                infrastructure=self.infrastructure,
+                file=SimpleUploadedFile('b.txt', b'calibration log'),
+                status=None
+            )
+
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+
+    def test_content_stored_again_before_release_commits_keeps_file(self):
+        """Test the file survives when the same content is stored while its last release commits."""
+        document = self.create_document('a.txt', b'beamline schedule')
+        name = document.file.name
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            document.delete()
+        again = self.create_document('b.txt', b'beamline schedule')
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(again.file.name, name)
+        self.assertTrue(default_storage.exists(name))
+
+
+@override_settings(COUNTER_FLUSHER=False)
+class DocumentDownloadViewTest(TemporaryMediaMixin, TestCase):
+    """Tests for the document download view."""
+
+    def setUp(self):
+        """Set up test data."""
+        counters.discard()
+        self.user = UserProfile.objects.create_user(username='reader', password='testpass')
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.document = Document.objects.create(
+            infrastructure=infrastructure,
+            file=SimpleUploadedFile('manual.txt', b'0123456789'),
+            is_public=True,
+            requires_login=False
+        )
+        self.url = reverse('documents:download', args=[self.document.pk])
+
+    def tearDown(self):
+        """Drop increments left buffered by the test."""
+        counters.discard()
+
+    def test_download_streams_whole_file(self):
+        """Test a plain GET returns the file as an attachment with validators."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('manual.txt', response['Content-Disposition'])
+        self.assertEqual(response['ETag'], f'"{self.document.content_hash}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range_request_returns_partial_content(self):
+        """Test a byte range is answered with 206 and only those bytes."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end of the file is rejected."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test a client holding the current content gets 304."""
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.document.content_hash}"')
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_login_required(self):
+        """Test documents requiring login redirect anonymous users."""
+        Document.objects.filter(pk=self.document.pk).update(requires_login=True)
+
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_inactive_documents_are_staff_only(self):
+        """Test archived documents are hidden from non-staff users."""
+        Document.objects.filter(pk=self.document.pk).update(status='archived')
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_private_documents_need_view_permission(self):
+        """Test private documents are hidden from logged-in users without the view permission."""
+        Document.objects.filter(pk=self.document.pk).update(is_public=False)
+        self.client.force_login(self.user)
+        preview_url = reverse('documents:preview', args=[self.document.pk, 'small'])
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(preview_url).status_code, 404)
+
+        self.user.user_permissions.add(Permission.objects.get(codename='view_document'))
+        self.user = UserProfile.objects.get(pk=self.user.pk)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(DOCUMENT_SENDFILE='x-accel-redirect', DOCUMENT_ACCEL_PREFIX='/protected/')
+    def test_sendfile_mode_delegates_to_proxy(self):
+        """Test sendfile mode returns no body and points the proxy at the file."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.document.file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_downloads_are_counted_once_per_transfer(self):
+        """Test resumed ranges do not count as extra downloads and nothing is written per request."""
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        self.client.get(self.url, HTTP_RANGE='bytes=5-')
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.download_count, 0)
+        counters.flush()
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.download_count, 1)
+
+
+@override_settings(DOCUMENT_WORKERS=0)
+class DocumentTextExtractionTest(TemporaryMediaMixin, TestCase):
+    """Tests for document text extraction and content search."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.equipment = Equipment.objects.create(infrastructure=self.infrastructure)
+
+    def create_document(self, name, content, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Document.objects.create(file=SimpleUploadedFile(name, content), **kwargs)
+
+    def test_text_extracted_once_per_content(self):
+        """Test text is stored compressed per blob and reused by identical uploads."""
+        content = 'Cryogenic sample holder\nCalibration procedure'.encode('utf-8')
+        first = self.create_document('manual.txt', content, equipment=self.equipment)
+        self.create_document('copy.txt', content, infrastructure=self.infrastructure)
+
+        document_text = DocumentText.objects.get()
+        self.assertEqual(document_text.blob_id, first.blob_id)
+        self.assertEqual(document_text.status, 'done')
+        self.assertEqual(document_text.get_text(), content.decode('utf-8'))
+        self.assertIn('cryogenic', set(first.blob.terms.values_list('term', flat=True)))
+
+    def test_docx_extraction(self):
+        """Test paragraphs are read from a DOCX archive."""
+        body = (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            '<w:p><w:r><w:t>Vacuum</w:t></w:r><w:r><w:t> pump</w:t></w:r></w:p>'
+            '<w:p><w:r><w:t>Maintenance</w:t></w:r></w:p>'
+            '</w:body></w:document>'
+        )
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as docx:
+            docx.writestr('word/document.xml', body)
+        archive.seek(0)
+
+        self.assertEqual(extraction.extract(archive, 'docx'), 'Vacuum pump\nMaintenance')
+
+    def test_unsupported_format_is_recorded(self):
+        """Test formats without an extractor are marked and not retried."""
+        document = self.create_document('photo.png', b'not really a png', equipment=self.equipment)
+
+        self.assertEqual(DocumentText.objects.get(blob=document.blob).status, 'unsupported')
+
+    def test_search_matches_document_content(self):
+        """Test equipment and infrastructures are found by the text of their documents."""
+        from apps.search.services import SearchService
+
+        self.create_document(
+            'manual.txt', b'Cryogenic holder calibration', equipment=self.equipment, is_public=True
+        )
+        self.create_document(
+            'sheet.csv', b'reagent,hazard\nnitrogen,cryogenic', infrastructure=self.infrastructure, is_public=True
+        )
+
+        equipment, _, count = SearchService.search_equipment('cryogen calibration')
+        self.assertEqual(count, 1)
+        self.assertEqual(equipment[0], self.equipment)
+
+        infrastructures, _, count = SearchService.search_infrastructures('nitrogen')
+        self.assertEqual(count, 1)
+        self.assertEqual(infrastructures[0], self.infrastructure)
+
+    def test_private_documents_not_matched(self):
+        """Test the content of private documents is not searchable."""
+        private = self.create_document('notes.txt', b'Confidential beamtime notes', equipment=self.equipment)
+
+        self.assertFalse(DocumentTerm.matching_documents('beamtime').exists())
+
+        private.is_public = True
+        private.save()
+        self.assertEqual(list(DocumentTerm.matching_documents('beamtime')), [private])
+
+    def test_term_limit_logged(self):
+        """Test texts with more distinct words than indexed are cut in order of appearance, with a warning."""
+        document = self.create_document('index.txt', b'', equipment=self.equipment)
+        text = ' '.join(f'word{number}' for number in range(DocumentTerm.MAX_TERMS + 5))
+
+        with self.assertLogs('apps.documents.models', level='WARNING'):
+            DocumentText.store(document.blob_id, text)
+
+        terms = DocumentTerm.objects.filter(blob_id=document.blob_id)
+        self.assertEqual(terms.count(), DocumentTerm.MAX_TERMS)
+        self.assertTrue(terms.filter(term='word0').exists())
+        self.assertFalse(terms.filter(term=f'word{DocumentTerm.MAX_TERMS}').exists())
+
+
+@override_settings(DOCUMENT_WORKERS=0)
+class DocumentPreviewTest(TemporaryMediaMixin, TestCase):
+    """Tests for document preview generation."""
+
+    def setUp(self):
+        """Set up test data."""
+        counters.discard()
+        cache.clear()
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+
+    def image_bytes(self, size=(1200, 800), color='navy'):
+        output = io.BytesIO()
+        Image.new('RGB', size, color).save(output, 'PNG')
+        return output.getvalue()
+
+    def create_document(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Document.objects.create(
+                infrastructure=self.infrastructure,
+                file=SimpleUploadedFile(name, content),
+                is_public=True,
+                requires_login=False
+            )
+
+    def test_variants_generated_on_upload(self):
+        """Test every size variant is generated, scaled to fit its bounds."""
+        document = self.create_document('photo.png', self.image_bytes())
+
+        sizes = dict(
+            (variant, (width, height))
+            for variant, width, height in document.blob.previews.values_list('variant', 'width', 'height')
+        )
+        self.assertEqual(sizes, {'small': (160, 107), 'medium': (640, 427)})
+
+    def test_previews_shared_by_content(self):
+        """Test identical uploads reuse the previews of the first one."""
+        content = self.image_bytes()
+        self.create_document('a.png', content)
+        self.create_document('b.png', content)
+
+        self.assertEqual(DocumentPreview.objects.count(), 2)
+
+    def test_prune_drops_least_recently_used(self):
+        """Test pruning removes the previews served longest ago first."""
+        old = self.create_document('old.png', self.image_bytes(color='red'))
+        recent = self.create_document('new.png', self.image_bytes(color='green'))
+        DocumentPreview.objects.filter(blob=old.blob).update(last_accessed_at='2020-01-01T00:00:00Z')
+        keep = DocumentPreview.objects.filter(blob=recent.blob).aggregate(total=Sum('byte_size'))['total']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pruned = DocumentPreview.prune(max_bytes=keep)
+
+        self.assertEqual(pruned, 2)
+        self.assertEqual(set(DocumentPreview.objects.values_list('blob_id', flat=True)), {recent.blob_id})
+
+    def test_preview_view(self):
+        """Test the preview view serves JPEG bytes and records the hit."""
+        document = self.create_document('photo.png', self.image_bytes())
+
+        response = self.client.get(reverse('documents:preview', args=[document.pk, 'small']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'\xff\xd8'))
+        self.assertEqual(counters.pending(), 1)
+
+    def test_missing_preview_queued_once(self):
+        """Test repeated requests for a missing preview queue a single generation."""
+        document = self.create_document('photo.png', self.image_bytes())
+        DocumentPreview.objects.all().delete()
+        url = reverse('documents:preview', args=[document.pk, 'small'])
+
+        with mock.patch.object(workers, 'schedule') as schedule:
+            for _ in range(3):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.assertEqual(schedule.call_count, 1)
+
+        previews.generate(document.blob_id, 'png')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_non_image_has_no_preview(self):
+        """Test formats without previews are skipped."""
+        document = self.create_document('notes.txt', b'plain text')
+
+        self.assertFalse(previews.supports('txt'))
+        self.assertFalse(document.blob.previews.exists())
+
+
+@override_settings(DOCUMENT_WORKERS=0, DOCUMENT_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTest(TemporaryMediaMixin, TestCase):
+    """Tests for the chunked upload API."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = UserProfile.objects.create_user(username='uploader', password='testpass')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_document'))
+        self.client.force_login(self.user)
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.doc_type = DocumentType.objects.create(code='DATA', allowed_extensions='csv', max_file_size_mb=1)
+
+    def start(self, filename='data.csv', size=10):
+        return self.client.post(
+            reverse('documents:upload_start'),
+            json.dumps({
+                'filename': filename,
+                'size': size,
+                'document_type': self.doc_type.pk,
+                'infrastructure': self.infrastructure.pk,
+                'title': 'Dataset'
+            }),
+            content_type='application/json'
+        )
+
+    def send(self, session_id, data, offset, total=10, sha256=None):
+        headers = {'HTTP_CONTENT_RANGE': f'bytes {offset}-{offset + len(data) - 1}/{total}'}
+        if sha256:
+            headers['HTTP_X_CHUNK_SHA256'] = sha256
+        return self.client.put(
+            reverse('documents:upload_session', args=[session_id]),
+            data,
+            content_type='application/octet-stream',
+            **headers
+        )
+
+    def test_upload_requires_add_permission(self):
+        """Test users who may only view documents cannot open upload sessions."""
+        viewer = UserProfile.objects.create_user(username='viewer', password='testpass')
+        viewer.user_permissions.add(Permission.objects.get(codename='view_document'))
+        self.client.force_login(viewer)
+
+        self.assertEqual(self.start().status_code, 403)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_upload_in_chunks_and_resume(self):
+        """Test chunks are appended in order, resumed from the reported offset and assembled."""
+        content = b'a,b\n1,2\n3,'
+        session_id = self.start().json()['id']
+
+        self.assertEqual(self.send(session_id, content[:4], 0).json()['offset'], 4)
+        # A retried chunk at an old offset is refused with the offset to resume from
+        response = self.send(session_id, content[:4], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 4)
+
+        offset = self.client.get(reverse('documents:upload_session', args=[session_id])).json()['offset']
+        self.send(session_id, content[offset:offset + 4], offset)
+        self.send(session_id, content[8:], 8)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('documents:upload_complete', args=[session_id]),
+                json.dumps({'sha256': hashlib.sha256(content).hexdigest()}),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.json()['document'])
+        self.assertEqual(document.filename, 'data.csv')
+        self.assertEqual(document.title, 'Dataset')
+        self.assertEqual(document.uploaded_by, self.user)
+        with document.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(os.path.exists(UploadSession.objects.get(pk=session_id).partial_path))
+
+    def test_chunk_checksum_mismatch_is_discarded(self):
+        """Test a corrupted chunk is refused without moving the offset."""
+        session_id = self.start().json()['id']
+
+        response = self.send(session_id, b'abcd', 0, sha256=hashlib.sha256(b'abce').hexdigest())
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).received_size, 0)
+        self.assertEqual(self.send(session_id, b'abcd', 0).json()['offset'], 4)
+
+    def test_validated_before_upload(self):
+        """Test disallowed extensions and oversized files are refused up front."""
+        self.assertEqual(self.start(filename='tool.exe').status_code, 400)
+        self.assertEqual(self.start(size=2 * 1024 * 1024).status_code, 400)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_incomplete_upload_cannot_complete(self):
+        """Test completing before every byte arrived is refused."""
+        session_id = self.start().json()['id']
+        self.send(session_id, b'abcd', 0)
+
+        response = self.client.post(reverse('documents:upload_complete', args=[session_id]))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Document.objects.exists())
+
+    def test_retry_after_failed_save_aborts(self):
+        """Test a retry after a failed save reports the lost upload instead of crashing."""
+        content = b'a,b\n1,2\n3,'
+        session_id = self.start().json()['id']
+        self.send(session_id, content[:4], 0)
+        self.send(session_id, content[4:8], 4)
+        self.send(session_id, content[8:], 8)
+        url = reverse('documents:upload_complete', args=[session_id])
+        save = Document.save
+
+        def failing_save(document, *args, **kwargs):
+            save(document, *args, **kwargs)
+            raise DatabaseError('Connection lost')
+
+        with mock.patch.object(Document, 'save', failing_save):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url)
+
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).status, 'aborted')
+        self.assertFalse(Document.objects.exists())
+
+
+class DocumentInspectionTest(TemporaryMediaMixin, TestCase):
+    """Tests for content sniffing and validation of uploads."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.doc_type = DocumentType.objects.create(code='MANUAL', allowed_extensions='pdf,txt', max_file_size_mb=1)
+
+    def document(self, name, content):
+        return Document(
+            infrastructure=self.infrastructure,
+            document_type=self.doc_type,
+            file=SimpleUploadedFile(name, content)
+        )
+
+    def test_sniff_magic_bytes(self):
+        """Test common formats are recognised from their first bytes."""
+        self.assertEqual(sniff(b'%PDF-1.7\n'), 'application/pdf')
+        self.assertEqual(sniff(b'\x89PNG\r\n\x1a\n\x00\x00'), 'image/png')
+        self.assertEqual(sniff(b'PK\x03\x04\x14\x00'), 'application/zip')
+        self.assertEqual(sniff('zażółć,gęślą\n'.encode('utf-8')), 'text/plain')
+        self.assertEqual(sniff(b'MZ is a fine way to start a sentence'), 'text/plain')
+        self.assertEqual(sniff(b'\x00\x01\x02\x03'), 'application/octet-stream')
+
+    def test_inspection_in_one_pass(self):
+        """Test hash, size and type come from a single read."""
+        upload = SimpleUploadedFile('manual.pdf', b'%PDF-1.4 body')
+
+        inspection = inspect(upload)
+
+        self.assertEqual(inspection.size, 13)
+        self.assertEqual(inspection.mime_type, 'application/pdf')
+        self.assertEqual(inspection.sha256, hashlib.sha256(b'%PDF-1.4 body').hexdigest())
+
+    def test_mismatched_content_rejected(self):
+        """Test a file whose content contradicts its extension fails validation."""
+        document = self.document('manual.pdf', b'\x89PNG\r\n\x1a\n' + b'\x00' * 20)
+
+        with self.assertRaises(ValidationError):
+            document.clean()
+
+    def test_clean_and_save_share_one_read(self):
+        """Test validation and storage inspect the upload once and record the sniffed type."""
+        document = self.document('manual.pdf', b'%PDF-1.4 body')
+        document.clean()
+        inspection = document.inspect_upload()
+
+        self.assertIs(document.inspect_upload(), inspection)
+        document.save()
+        self.assertEqual(document.mime_type, 'application/pdf')
+        self.assertEqual(document.blob.mime_type, 'application/pdf')
+        self.assertEqual(document.content_hash, inspection.sha256)
+
+    def test_text_recorded_by_extension(self):
+        """Test text content keeps the specific type given by its extension."""
+        document = Document.objects.create(
+            infrastructure=self.infrastructure,
+            file=SimpleUploadedFile('readings.csv', b'time,value\n1,2\n')
+        )
+
+        self.assertEqual(document.mime_type, 'text/csv')
+
+    def test_unlisted_text_extensions_accepted(self):
+        """Test text-based CAD and data formats are left to the document type."""
+        self.doc_type.allowed_extensions = 'step,dxf,stl,svg,cif'
+        self.doc_type.save()
+
+        for name in ('part.step', 'drawing.dxf', 'mesh.stl', 'figure.svg', 'structure.cif'):
+            document = self.document(name, b'solid mesh\n  facet normal 0 0 1\n')
+            document.clean()
+
+    def test_archive_and_container_extensions_accepted(self):
+        """Test archives and unlisted container formats pass the content check."""
+        check_extension(sniff(b'\x1f\x8b\x08\x00'), 'gz')
+        check_extension(sniff(b'\x1f\x8b\x08\x00'), 'tgz')
+        check_extension(sniff(b'7z\xbc\xaf\x27\x1c\x00\x04'), '7z')
+        check_extension(sniff(b'PK\x03\x04\x14\x00'), '3mf')
+        check_extension(sniff(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'), 'sldprt')
+
+        with self.assertRaises(ValidationError):
+            check_extension(sniff(b'\x1f\x8b\x08\x00'), 'pdf')
+
+
+class DocumentVersioningTest(TestCase):
+    """Tests for stored version chains and bulk status changes."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+        self.infrastructure = Infrastructure.objects.create(institution=institution, city=city)
+        self.v1 = Document.objects.create(infrastructure=self.infrastructure)
+        self.v2 = Document.objects.create(infrastructure=self.infrastructure, replaces=self.v1)
+        self.v3 = Document.objects.create(infrastructure=self.infrastructure, replaces=self.v2)
+
+    def test_chain_stored_on_save(self):
+        """Test versions share the root ID and are numbered in order."""
+        self.assertEqual(
+            [(d.chain_root_id, d.version_ordinal) for d in (self.v1, self.v2, self.v3)],
+            [(self.v1.pk, 1), (self.v1.pk, 2), (self.v1.pk, 3)]
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(list(versioning.chain(self.v3)), [self.v1, self.v2, self.v3])
+
+    def test_moving_version_moves_successors(self):
+        """Test re-pointing replaces carries later versions to the new chain."""
+        other = Document.objects.create(infrastructure=self.infrastructure)
+        self.v2.refresh_from_db()
+        self.v2.replaces = other
+        self.v2.save()
+
+        self.v3.refresh_from_db()
+        self.assertEqual((self.v3.chain_root_id, self.v3.version_ordinal), (other.pk, 3))
+        self.v1.refresh_from_db()
+        self.assertEqual(list(versioning.chain(self.v1)), [self.v1])
+
+    def test_cannot_replace_later_version(self):
+        """Test a version cycle is rejected."""
+        self.v1.replaces = self.v3
+
+        with self.assertRaises(ValidationError):
+            self.v1.clean()
+
+    def test_bulk_transitions_take_one_update(self):
+        """Test status changes are a single UPDATE and bump updated_at."""
+        before = Document.objects.get(pk=self.v1.pk).updated_at
+
+        with self.assertNumQueries(1):
+            updated = versioning.set_status(Document.objects.filter(pk__in=[self.v1.pk, self.v2.pk]), 'archived')
+
+        self.assertEqual(updated, 2)
+        self.assertGreater(Document.objects.get(pk=self.v1.pk).updated_at, before)
+        self.assertEqual(Document.objects.get(pk=self.v3.pk).status, 'active')
+
+    def test_obsolete_chains(self):
+        """Test every version of a chain becomes obsolete from any member."""
+        unrelated = Document.objects.create(infrastructure=self.infrastructure)
+
+        with self.assertNumQueries(1):
+            versioning.obsolete_chains(Document.objects.filter(pk=self.v2.pk))
+
+        self.assertEqual(set(versioning.chain(self.v1).values_list('status', flat=True)), {'obsolete'})
+        self.assertEqual(Document.objects.get(pk=unrelated.pk).status, 'active')
+
+    def test_obsolete_earlier_versions(self):
+        """Test only versions preceding the selected one become obsolete."""
+        versioning.obsolete_earlier_versions(Document.objects.filter(pk=self.v3.pk))
+
+        statuses = dict(Document.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[self.v1.pk], 'obsolete')
+        self.assertEqual(statuses[self.v2.pk], 'obsolete')
+        self.assertEqual(statuses[self.v3.pk], 'active')
+
+    def test_archive_infrastructure_documents(self):
+        """Test documents of an infrastructure and its equipment are archived together."""
+        equipment = Equipment.objects.create(infrastructure=self.infrastructure)
+        equipment_document = Document.objects.create(equipment=equipment)
+
+        with self.assertNumQueries(1):
+            updated = versioning.archive_infrastructures([self.infrastructure])
+
+        self.assertEqual(updated, 4)
+        self.assertEqual(Document.objects.get(pk=equipment_document.pk).status, 'archived')
+
+    def test_rebuild_chains(self):
+        """Test chains are recomputed for documents saved without them."""
+        Document.objects.update(chain_root_id=None, version_ordinal=1)
+
+        self.assertEqual(versioning.rebuild_chains(), 3)
+        self.v3.refresh_from_db()
+        self.assertEqual((self.v3.chain_root_id, self.v3.version_ordinal), (self.v1.pk, 3))
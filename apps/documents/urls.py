@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'documents'
+
+urlpatterns = [
+    path('<int:pk>/download/', views.download, name='download'),
+    path('<int:pk>/preview/<str:variant>/', views.preview, name='preview'),
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:session_id>/', views.upload_session, name='upload_session'),
+    path('uploads/<uuid:session_id>/complete/', views.upload_complete, name='upload_complete'),
+]
@@ -0,0 +1,116 @@
+"""
+Document version chains and set-based status changes.
+
+Every document stores the ID of the first version of its chain and its
+position in that chain, kept up to date on save. A whole chain is therefore
+one indexed query instead of a walk over ``replaced_by_documents``, and
+status changes over any number of documents or chains are a single UPDATE.
+
+``QuerySet.update()`` skips ``auto_now``, so the transitions set
+``updated_at`` themselves; downloads use it for Last-Modified.
+
+Usage:
+    from apps.documents import versioning
+
+    versioning.chain(document)
+    versioning.set_status(Document.objects.filter(pk__in=ids), 'archived')
+    versioning.obsolete_chains(Document.objects.filter(pk=document.pk))
+    versioning.archive_infrastructures([infrastructure])
+"""
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Document
+
+
+def chain(document):
+    """All versions of a document's chain, oldest first."""
+    return Document.objects.filter(chain_root_id=document.chain_root_id).order_by('version_ordinal', 'pk')
+
+
+def latest(document):
+    """The newest version in a document's chain."""
+    return chain(document).last()
+
+
+def _update(queryset, **values):
+    return queryset.update(updated_at=timezone.now(), **values)
+
+
+def set_status(queryset, status):
+    """Set the status of every document in a queryset; returns the number changed."""
+    return _update(queryset.exclude(status=status), status=status)
+
+
+def set_public(queryset, is_public):
+    """Make every document in a queryset public or private; returns the number changed."""
+    return _update(queryset.exclude(is_public=is_public), is_public=is_public)
+
+
+def chains_of(queryset):
+    """All versions of every chain a document in the queryset belongs to."""
+    return Document.objects.filter(chain_root_id__in=queryset.values('chain_root_id'))
+
+
+def obsolete_chains(queryset):
+    """Mark every version in the chains of the given documents obsolete."""
+    return set_status(chains_of(queryset), 'obsolete')
+
+
+def obsolete_earlier_versions(queryset):
+    """Mark the versions preceding each given document in its chain obsolete."""
+    later = queryset.filter(
+        chain_root_id=OuterRef('chain_root_id'),
+        version_ordinal__gt=OuterRef('version_ordinal')
+    )
+    return set_status(Document.objects.filter(Exists(later)), 'obsolete')
+
+
+def for_infrastructures(infrastructures):
+    """
+    Documents of the given infrastructures (a queryset or list) and of their equipment.
+
+    Service documents are not included: a service may be offered by
+    equipment of several infrastructures.
+    """
+    return Document.objects.filter(
+        Q(infrastructure__in=infrastructures) | Q(equipment__infrastructure__in=infrastructures)
+    )
+
+
+def archive_infrastructures(infrastructures):
+    """Archive all active and draft documents of the given infrastructures in one UPDATE."""
+    documents = for_infrastructures(infrastructures).filter(status__in=['active', 'draft'])
+    return set_status(documents, 'archived')
+
+
+def rebuild_chains():
+    """
+    Recompute chain roots and ordinals of all documents from ``replaces``.
+
+    Used to fill in documents created before chains were stored, or to
+    repair them; only rows whose values change are written.
+    """
+    rows = list(Document.objects.values_list('pk', 'replaces_id', 'chain_root_id', 'version_ordinal'))
+    children = {}
+    for pk, replaces_id, _, _ in rows:
+        children.setdefault(replaces_id, []).append(pk)
+
+    known = {pk for pk, _, _, _ in rows}
+    assigned = {}
+    # Deleting a version nulls ``replaces`` of the next one, which then starts a chain
+    pending = [(pk, pk, 1) for pk, replaces_id, _, _ in rows if replaces_id not in known]
+    while pending:
+        pk, root, ordinal = pending.pop()
+        if pk in assigned:
+            continue
+        assigned[pk] = (root, ordinal)
+        pending.extend((child, root, ordinal + 1) for child in children.get(pk, []))
+
+    changed = [
+        Document(pk=pk, chain_root_id=assigned[pk][0], version_ordinal=assigned[pk][1])
+        for pk, _, chain_root_id, version_ordinal in rows
+        if pk in assigned and assigned[pk] != (chain_root_id, version_ordinal)
+    ]
+    Document.objects.bulk_update(changed, ['chain_root_id', 'version_ordinal'], batch_size=500)
+    return len(changed)
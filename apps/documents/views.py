@@ -1,3 +1,303 @@
-from django.shortcuts import render
+import json
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, permission_required
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from django.views.decorators.http import require_http_methods, require_POST, require_safe
+
+from . import previews
+from .models import Document, DocumentPreview, UploadSession
+
+STREAM_CHUNK_SIZE = 64 * 1024
+PREVIEW_MAX_AGE = 24 * 60 * 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def can_download(user, document):
+    """
+    Whether a user may download a document.
+
+    Public documents not requiring login are open to everyone and other
+    public documents to any logged-in user. Private documents need staff
+    status or the view_document permission; documents that are not active
+    are for staff only.
+    """
+    if document.status != 'active' and not user.is_staff:
+        return False
+    if not document.is_public:
+        return user.is_staff or user.has_perm('documents.view_document')
+    if not document.requires_login:
+        return True
+    return user.is_authenticated
+
+
+def parse_range(header, size):
+    """
+    Return the (first, last) byte positions of a single-range ``Range`` header.
+
+    Returns None when the header is absent or not understood, in which case
+    the whole file is sent. Raises ValueError for an unsatisfiable range.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes
+        first = max(size - int(last), 0)
+        last = size - 1
+    if first > last or first >= size:
+        raise ValueError(header)
+    return first, last
+
+
+def stream_file(fileobj, first, last, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield bytes first..last of a file in chunks, closing it afterwards."""
+    try:
+        fileobj.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = fileobj.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def sendfile_response(document, mode):
+    """
+    Hand the transfer to the front proxy, configured by ``DOCUMENT_SENDFILE``.
+
+    'x-accel-redirect' (nginx) sends the storage name under
+    ``DOCUMENT_ACCEL_PREFIX``; 'x-sendfile' (Apache, lighttpd) sends the
+    absolute path. The proxy then handles ranges itself.
+    """
+    response = HttpResponse(content_type=document.mime_type or 'application/octet-stream')
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'DOCUMENT_ACCEL_PREFIX', '/protected/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + document.file.name
+    else:
+        response['X-Sendfile'] = document.file.path
+    return response
+
+
+@require_safe
+def download(request, pk):
+    """
+    Download a document.
+
+    Files are streamed in chunks, or handed to the proxy in sendfile mode.
+    Single byte ranges are supported so large files can be resumed, and
+    ETag (content hash) / Last-Modified allow conditional requests.
+    """
+    document = get_object_or_404(Document, pk=pk)
+    if not document.file:
+        raise Http404('Document has no file')
+    if not can_download(request.user, document):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        raise Http404('Document not found')
+
+    etag = quote_etag(document.content_hash) if document.content_hash else None
+    last_modified = int(document.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    sendfile = getattr(settings, 'DOCUMENT_SENDFILE', None)
+    size = document.file_size if document.file_size is not None else document.file.size
+    byte_range = None
+    if request.method == 'GET' and not sendfile:
+        # A range is only honoured if the client's copy is still current
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag or if_range == http_date(last_modified):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+    if sendfile:
+        response = sendfile_response(document, sendfile)
+        response['Content-Disposition'] = content_disposition_header(True, document.filename)
+    elif byte_range is not None:
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            stream_file(document.file.open('rb'), first, last),
+            status=206,
+            content_type=document.mime_type or 'application/octet-stream'
+        )
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = str(last - first + 1)
+        response['Content-Disposition'] = content_disposition_header(True, document.filename)
+    else:
+        response = FileResponse(
+            document.file.open('rb'),
+            as_attachment=True,
+            filename=document.filename,
+            content_type=document.mime_type or None
+        )
+
+    response['Accept-Ranges'] = 'bytes'
+    if etag:
+        response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+    # Count each download once, not every resumed range; the counter is
+    # buffered so this costs no write per request
+    if request.method == 'GET' and (byte_range is None or byte_range[0] == 0):
+        document.increment_download_count()
+    return response
+
+
+@require_safe
+def preview(request, pk, variant):
+    """
+    Serve a document preview image.
+
+    Missing previews are queued for generation and answered with 404 until
+    they exist.
+    """
+    if variant not in DocumentPreview.VARIANTS:
+        raise Http404('Unknown preview size')
+    document = get_object_or_404(Document.objects.select_related('blob'), pk=pk)
+    if not can_download(request.user, document) or document.blob is None:
+        raise Http404('Document not found')
+
+    etag = quote_etag(f'{document.blob.sha256}-{variant}')
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+
+    preview_image = DocumentPreview.objects.filter(blob=document.blob, variant=variant).first()
+    if preview_image is None:
+        previews.schedule(document.blob_id, document.file_extension)
+        raise Http404('Preview not available')
+
+    preview_image.touch()
+    response = FileResponse(preview_image.file.open('rb'), content_type='image/jpeg')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'private, max-age={PREVIEW_MAX_AGE}'
+    return response
+
+
+def upload_state(session):
+    return {
+        'id': str(session.pk),
+        'filename': session.filename,
+        'size': session.total_size,
+        'offset': session.received_size,
+        'chunk_size': UploadSession.chunk_size(),
+        'status': session.status,
+        'document': session.document_id,
+    }
+
+
+def validation_error_response(error, status=400):
+    return JsonResponse({'error': ' '.join(error.messages)}, status=status)
+
+
+@login_required
+@permission_required('documents.add_document', raise_exception=True)
+@require_POST
+def upload_start(request):
+    """
+    Open an upload session.
+
+    Expects JSON with ``filename`` and ``size`` plus ``document_type``,
+    ``infrastructure``, ``equipment``, ``service`` (IDs) and ``title``. The
+    file is validated against the document type before any bytes are sent.
+    """
+    try:
+        data = json.loads(request.body)
+        session = UploadSession(
+            user=request.user,
+            filename=str(data['filename'])[:255],
+            total_size=int(data['size']),
+            document_type_id=data.get('document_type'),
+            infrastructure_id=data.get('infrastructure'),
+            equipment_id=data.get('equipment'),
+            service_id=data.get('service'),
+            title=str(data.get('title', ''))[:255]
+        )
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Expected JSON with filename and size'}, status=400)
+
+    try:
+        session.full_clean()
+    except ValidationError as error:
+        return validation_error_response(error)
+    session.save()
+    return JsonResponse(upload_state(session), status=201)
+
+
+@login_required
+@permission_required('documents.add_document', raise_exception=True)
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+def upload_session(request, session_id):
+    """
+    GET reports the current offset to resume from, DELETE aborts, and PUT
+    appends one chunk.
+
+    A chunk is sent as the raw request body with ``Content-Range: bytes
+    first-last/total`` and optionally ``X-Chunk-SHA256``. A chunk at the
+    wrong offset is answered with 409 and the expected offset.
+    """
+    session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+
+    if request.method == 'GET':
+        return JsonResponse(upload_state(session))
+
+    if request.method == 'DELETE':
+        session.abort()
+        return JsonResponse(upload_state(session))
+
+    match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+    if not match or int(match.group(3)) != session.total_size:
+        return JsonResponse({'error': 'Content-Range header with the file size is required'}, status=400)
+    offset = int(match.group(1))
+
+    with transaction.atomic():
+        # Serialise chunks of one session
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if offset != session.received_size:
+            return JsonResponse(dict(upload_state(session), error='Unexpected offset'), status=409)
+        try:
+            session.append(offset, request, sha256=request.headers.get('X-Chunk-SHA256'))
+        except ValidationError as error:
+            return validation_error_response(error)
+    return JsonResponse(upload_state(session))
+
+
+@login_required
+@permission_required('documents.add_document', raise_exception=True)
+@require_POST
+def upload_complete(request, session_id):
+    """Assemble the uploaded chunks into a document; accepts an optional whole-file ``sha256``."""
+    session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else {}
+    except ValueError:
+        return JsonResponse({'error': 'Expected JSON'}, status=400)
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        try:
+            session.complete(sha256=data.get('sha256'))
+        except ValidationError as error:
+            return validation_error_response(error, status=409)
+    return JsonResponse(upload_state(session), status=201)
@@ -0,0 +1,56 @@
+"""
+Background worker pool for document processing.
+
+Jobs (text extraction, previews) are submitted once the current
+transaction commits and run in a small thread pool, so saving a document
+never waits for them. Each job gets its own database connection.
+
+Settings:
+    DOCUMENT_WORKERS: pool size (default 2); 0 runs jobs inline after
+        commit, which management commands and tests use
+
+Usage:
+    from apps.documents import workers
+
+    workers.schedule(extraction.process, blob_id, 'pdf')
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'DOCUMENT_WORKERS', 2),
+                thread_name_prefix='documents'
+            )
+        return _executor
+
+
+def _run(func, args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Document job %s%r crashed', func.__name__, args)
+    finally:
+        connection.close()
+
+
+def schedule(func, *args):
+    """Run ``func(*args)`` in the pool once the current transaction commits."""
+    if getattr(settings, 'DOCUMENT_WORKERS', 2) == 0:
+        transaction.on_commit(lambda: func(*args))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, func, args))
@@ -3,10 +3,11 @@ from parler.admin import TranslatableAdmin
 from .models import Equipment
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin, with_translations
 
 
 @admin.register(Equipment, site=admin_site)
-class EquipmentAdmin(TranslatableAdmin):
+class EquipmentAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'get_name',  # Changed from 'name' to custom method
         'get_infrastructure',  # Changed from 'infrastructure' to custom method
@@ -17,6 +18,8 @@ class EquipmentAdmin(TranslatableAdmin):
         'condition',
         'created_at'
     ]
+    list_select_related = ['infrastructure']
+    translation_related = ['infrastructure']
     list_filter = [
         'status',
         'is_available',
@@ -93,7 +96,7 @@ class EquipmentAdmin(TranslatableAdmin):
         if safe_ordering:
             qs = qs.order_by(*safe_ordering)
 
-        return qs
+        return with_translations(qs.select_related('infrastructure'), related=self.translation_related)
 
     def get_fieldsets(self, request, obj=None):
         """Add metadata fields when editing existing equipment."""
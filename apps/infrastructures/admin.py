@@ -3,6 +3,7 @@ from parler.admin import TranslatableAdmin
 from .models import Infrastructure, ContactPerson
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin
 
 
 class ContactPersonInline(admin.TabularInline):
@@ -13,7 +14,7 @@ class ContactPersonInline(admin.TabularInline):
 
 
 @admin.register(Infrastructure, site=admin_site)
-class InfrastructureAdmin(TranslatableAdmin):
+class InfrastructureAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'name',
         'institution',
@@ -23,6 +24,8 @@ class InfrastructureAdmin(TranslatableAdmin):
         'is_verified',
         'created_at'
     ]
+    list_select_related = ['institution', 'city']
+    translation_related = ['institution', 'city']
     list_filter = [
         'is_active',
         'is_verified',
@@ -48,6 +51,11 @@ class InfrastructureAdmin(TranslatableAdmin):
         ('Basic Information', {
             'fields': ('name', 'description', 'institution', 'city')
         }),
+        ('Coordinates', {
+            'fields': (('latitude', 'longitude'),),
+            'classes': ('collapse',),
+            'description': 'Leave empty to use the coordinates of the city'
+        }),
         ('Contact Information', {
             'fields': ('website', 'email', 'phone')
         }),
@@ -71,6 +79,15 @@ class InfrastructureAdmin(TranslatableAdmin):
 
     readonly_fields = ['created_by', 'created_at', 'updated_at']
 
+    actions = ['archive_documents']
+
+    def archive_documents(self, request, queryset):
+        from apps.documents import versioning
+        updated = versioning.archive_infrastructures(queryset)
+        self.message_user(request, f'{updated} documents archived.')
+
+    archive_documents.short_description = "Archive all documents of selected infrastructures"
+
     def get_fieldsets(self, request, obj=None):
         """Add metadata fields when editing existing infrastructure."""
         fieldsets = super().get_fieldsets(request, obj)
@@ -91,7 +108,7 @@ class InfrastructureAdmin(TranslatableAdmin):
 
 
 @admin.register(ContactPerson, site=admin_site)
-class ContactPersonAdmin(admin.ModelAdmin):
+class ContactPersonAdmin(TranslationPrefetchMixin, admin.ModelAdmin):
     list_display = [
         'full_name',
         'position',
@@ -100,6 +117,8 @@ class ContactPersonAdmin(admin.ModelAdmin):
         'is_primary',
         'created_at'
     ]
+    list_select_related = ['infrastructure']
+    translation_related = ['infrastructure']
     list_filter = ['is_primary', 'created_at']
     search_fields = [
         'first_name',
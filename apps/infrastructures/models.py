@@ -1,14 +1,14 @@
 from django.db import models
 from parler.models import TranslatableModel, TranslatedFields
 from apps.institutions.models import Institution
-from apps.locations.models import City
+from apps.locations.models import City, GeoLocatedMixin
 from apps.users.models import UserProfile
 
 
 # This relationship is added dynamically in research_problems/models.py
 # Just documenting it here for clarity
 # Infrastructure.research_problems - many-to-many with ResearchProblem
-class Infrastructure(TranslatableModel):
+class Infrastructure(GeoLocatedMixin, TranslatableModel):
     """Represents a research infrastructure facility."""
 
     translations = TranslatedFields(
@@ -103,6 +103,12 @@ class Infrastructure(TranslatableModel):
         """Convenience property to get country."""
         return self.city.region.country
 
+    def fallback_coordinates(self):
+        """Index by the city's coordinates when none are set."""
+        if self.city_id:
+            return self.city.coordinates
+        return None
+
 
 class ContactPerson(models.Model):
     """Represents a contact person for an infrastructure (no user account)."""
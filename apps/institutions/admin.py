@@ -3,10 +3,11 @@ from parler.admin import TranslatableAdmin
 from .models import Institution
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin
 
 
 @admin.register(Institution, site=admin_site)
-class InstitutionAdmin(TranslatableAdmin):
+class InstitutionAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'name',
         'institution_type',
@@ -14,6 +15,8 @@ class InstitutionAdmin(TranslatableAdmin):
         'is_active',
         'created_at'
     ]
+    list_select_related = ['city']
+    translation_related = ['city']
     list_filter = [
         'institution_type',
         'is_active',
@@ -34,7 +37,8 @@ class InstitutionAdmin(TranslatableAdmin):
             'fields': ('name', 'description', 'institution_type', 'is_active')
         }),
         ('Location', {
-            'fields': ('city', 'address')
+            'fields': ('city', 'address', ('latitude', 'longitude')),
+            'description': 'Leave coordinates empty to use those of the city'
         }),
         ('Contact Information', {
             'fields': ('website', 'email', 'phone')
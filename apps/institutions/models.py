@@ -1,9 +1,9 @@
 from django.db import models
 from parler.models import TranslatableModel, TranslatedFields
-from apps.locations.models import City
+from apps.locations.models import City, GeoLocatedMixin
 
 
-class Institution(TranslatableModel):
+class Institution(GeoLocatedMixin, TranslatableModel):
     """Represents an organization that hosts research infrastructures."""
 
     translations = TranslatedFields(
@@ -52,4 +52,10 @@ class Institution(TranslatableModel):
     @property
     def country(self):
         """Convenience property to get country through city."""
-        return self.city.region.country
\ No newline at end of file
+        return self.city.region.country
+
+    def fallback_coordinates(self):
+        """Index by the city's coordinates when none are set."""
+        if self.city_id:
+            return self.city.coordinates
+        return None
\ No newline at end of file
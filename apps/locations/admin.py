@@ -2,29 +2,67 @@ from parler.admin import TranslatableAdmin
 
 from django.contrib import admin
 
-from .models import City, Country, Region
+from .models import City, Country, LocationRollup, Region
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin
+
+
+class LocationRollupColumnsMixin:
+    """List columns read from LocationRollup through one annotated query."""
+
+    rollup_level = None
+
+    def get_queryset(self, request):
+        return LocationRollup.annotate_counts(super().get_queryset(request), self.rollup_level)
+
+    def infrastructure_total(self, obj):
+        return obj.infrastructure_count
+
+    infrastructure_total.short_description = "Infrastructures"
+    infrastructure_total.admin_order_field = "infrastructure_count"
+
+    def equipment_total(self, obj):
+        return obj.equipment_count
+
+    equipment_total.short_description = "Equipment"
+    equipment_total.admin_order_field = "equipment_count"
+
+    def service_total(self, obj):
+        return obj.service_count
+
+    service_total.short_description = "Services"
+    service_total.admin_order_field = "service_count"
 
 
 @admin.register(Country, site=admin_site)
-class CountryAdmin(TranslatableAdmin):
-    list_display = ["name", "code"]
+class CountryAdmin(LocationRollupColumnsMixin, TranslationPrefetchMixin, TranslatableAdmin):
+    list_display = ["name", "code", "infrastructure_total", "equipment_total", "service_total"]
+    rollup_level = "country"
     search_fields = ["translations__name", "code"]
     ordering = ["code"]
 
 
 @admin.register(Region, site=admin_site)
-class RegionAdmin(TranslatableAdmin):
-    list_display = ["name", "country", "code"]
+class RegionAdmin(LocationRollupColumnsMixin, TranslationPrefetchMixin, TranslatableAdmin):
+    list_display = ["name", "country", "code", "infrastructure_total", "equipment_total", "service_total"]
+    rollup_level = "region"
+    list_select_related = ["country"]
+    translation_related = ["country"]
     list_filter = ["country"]
     search_fields = ["translations__name", "code"]
     autocomplete_fields = ["country"]
 
 
 @admin.register(City, site=admin_site)
-class CityAdmin(TranslatableAdmin):
-    list_display = ["name", "region", "postal_code"]
+class CityAdmin(LocationRollupColumnsMixin, TranslationPrefetchMixin, TranslatableAdmin):
+    list_display = [
+        "name", "region", "postal_code", "latitude", "longitude",
+        "infrastructure_total", "equipment_total", "service_total"
+    ]
+    rollup_level = "city"
+    list_select_related = ["region"]
+    translation_related = ["region"]
     list_filter = ["region__country", "region"]
     search_fields = ["translations__name", "postal_code"]
     autocomplete_fields = ["region"]
\ No newline at end of file
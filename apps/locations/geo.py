@@ -0,0 +1,164 @@
+"""
+Geohash grid index and distance helpers.
+
+Coordinates are indexed by geohash, so nearby points share a prefix and a
+radius or bounding-box search becomes a handful of indexed prefix ranges.
+Candidates from those cells are then refined with an exact vectorised
+haversine distance. No spatial database extension is required.
+
+Usage:
+    from apps.locations import geo
+
+    geo.encode(50.0614, 19.9366)                     # "u2yhvd8zc"
+    geo.covering_cells(*geo.radius_bbox(50.06, 19.94, 50))
+    geo.haversine_km(50.06, 19.94, latitudes, longitudes)
+"""
+import math
+
+import numpy as np
+
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+# Upper bound on prefix ranges a single search may OR together
+MAX_CELLS = 32
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Return the geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        target, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Return the (latitude, longitude) size in degrees of a cell at a precision."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """
+    Return (min_lat, min_lon, max_lat, max_lon) enclosing a circle.
+
+    A circle crossing the antimeridian gives a box with ``min_lon`` greater
+    than ``max_lon``; one reaching a pole spans all longitudes.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    delta_lon = radius_km / (KM_PER_DEGREE * cos_lat)
+    if delta_lon >= 180.0 or min_lat == -90.0 or max_lat == 90.0:
+        return (min_lat, -180.0, max_lat, 180.0)
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return (min_lat, min_lon, max_lat, max_lon)
+
+
+def split_bbox(min_lat, min_lon, max_lat, max_lon):
+    """Split a box crossing the antimeridian into its two halves; other boxes are returned as they are."""
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_CELLS):
+    """
+    Return geohash prefixes whose cells together cover a bounding box.
+
+    Picks the finest precision that needs no more than ``max_cells`` cells.
+    A box crossing the antimeridian is covered half by half, each half
+    getting half of the cells.
+    """
+    boxes = split_bbox(min_lat, min_lon, max_lat, max_lon)
+    if len(boxes) > 1:
+        return sorted({
+            cell for box in boxes for cell in covering_cells(*box, max_cells=max(max_cells // 2, 1))
+        })
+
+    for precision in range(PRECISION, 0, -1):
+        lat_size, lon_size = cell_size(precision)
+        rows = math.floor((max_lat + 90) / lat_size) - math.floor((min_lat + 90) / lat_size) + 1
+        columns = math.floor((max_lon + 180) / lon_size) - math.floor((min_lon + 180) / lon_size) + 1
+        if rows * columns <= max_cells:
+            break
+
+    first_row = math.floor((min_lat + 90) / lat_size)
+    first_column = math.floor((min_lon + 180) / lon_size)
+    cells = set()
+    for row in range(first_row, first_row + rows):
+        for column in range(first_column, first_column + columns):
+            # Encode the centre of each grid cell, clamped to valid coordinates
+            latitude = min(-90 + (row + 0.5) * lat_size, 90.0)
+            longitude = min(-180 + (column + 0.5) * lon_size, 180.0)
+            cells.add(encode(latitude, longitude, precision))
+    return sorted(cells)
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in km from one point to arrays of points."""
+    lat1 = np.radians(float(latitude))
+    lon1 = np.radians(float(longitude))
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def refine(points, bbox, center=None, radius_km=None):
+    """
+    Filter candidate ``(id, latitude, longitude)`` rows exactly.
+
+    Returns ``{id: distance_km}`` for the points within ``radius_km`` of
+    ``center`` or, without a center, ``{id: None}`` for the points inside
+    ``bbox`` (which may cross the antimeridian, see ``radius_bbox``).
+    """
+    if not points:
+        return {}
+    ids = np.array([point[0] for point in points])
+    latitudes = np.array([point[1] for point in points], dtype=float)
+    longitudes = np.array([point[2] for point in points], dtype=float)
+
+    if center is not None:
+        distances = haversine_km(center[0], center[1], latitudes, longitudes)
+        inside = distances <= radius_km
+        return dict(zip(ids[inside].tolist(), np.round(distances[inside], 3).tolist()))
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    inside = (latitudes >= min_lat) & (latitudes <= max_lat)
+    if min_lon <= max_lon:
+        inside &= (longitudes >= min_lon) & (longitudes <= max_lon)
+    else:
+        # Crossing the antimeridian
+        inside &= (longitudes >= min_lon) | (longitudes <= max_lon)
+    return dict.fromkeys(ids[inside].tolist())
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.locations.models import LocationRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute infrastructure, equipment and service counts per country, region and city"
+
+    def handle(self, *args, **options):
+        for level, label in LocationRollup.LEVELS:
+            written = LocationRollup.refresh(level)
+            self.stdout.write(f"  {label}: {written} rollups")
+
+        self.stdout.write(self.style.SUCCESS("\nLocation rollups rebuilt"))
@@ -1,6 +1,77 @@
 from parler.models import TranslatableModel, TranslatedFields
 
-from django.db import models
+from django.apps import apps as django_apps
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from ScientaGrid.db import bulk_upsert
+
+from . import geo
+
+
+class GeoLocatedMixin(models.Model):
+    """
+    Optional coordinates indexed by geohash.
+
+    ``geohash`` is derived on save from the object's own coordinates or,
+    when it has none, from ``fallback_coordinates()`` so every row can be
+    found by a prefix search on the indexed column.
+
+    Usage:
+        city.latitude, city.longitude = 50.0614, 19.9366
+        city.save()
+        city.geohash  # "u2yhvd8zc"
+    """
+
+    latitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        help_text="Latitude in decimal degrees (WGS 84)"
+    )
+    longitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        help_text="Longitude in decimal degrees (WGS 84)"
+    )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Geohash of the own or fallback coordinates, used as a spatial grid index"
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def coordinates(self):
+        """Own (latitude, longitude), or None when not set."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
+
+    def fallback_coordinates(self):
+        """Coordinates to index by when the object has none of its own."""
+        return None
+
+    def update_geohash(self):
+        coordinates = self.coordinates or self.fallback_coordinates()
+        self.geohash = geo.encode(*coordinates) if coordinates else ""
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"geohash"}
+        super().save(*args, **kwargs)
 
 
 class Country(TranslatableModel):
@@ -36,7 +107,7 @@ class Region(TranslatableModel):
         return self.safe_translation_getter("name", any_language=True) or self.code
 
 
-class City(TranslatableModel):
+class City(GeoLocatedMixin, TranslatableModel):
     """Represents a city."""
 
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name="cities")
@@ -55,4 +126,180 @@ class City(TranslatableModel):
     @property
     def country(self):
         """Convenience property to get the country of the city."""
-        return self.region.country
\ No newline at end of file
+        return self.region.country
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Institutions and infrastructures without coordinates are indexed by their city
+        for related in (self.institutions, self.infrastructures):
+            related.filter(latitude__isnull=True).exclude(geohash=self.geohash).update(geohash=self.geohash)
+
+
+class LocationRollup(models.Model):
+    """
+    Counts of active infrastructures, available equipment and active
+    services per country, region and city.
+
+    Maintained for the affected cities (and their regions and countries)
+    whenever something moves or changes state, so facets and admin columns
+    read one indexed row instead of joining through ``city__region__country``.
+
+    Usage:
+        LocationRollup.refresh_cities([city.pk])
+        LocationRollup.facets("region", parent_id=country.pk)
+        LocationRollup.annotate_counts(City.objects.all(), "city")
+    """
+
+    LEVELS = [
+        ("country", "Country"),
+        ("region", "Region"),
+        ("city", "City"),
+    ]
+    # Path from an infrastructure to the location at each level
+    LEVEL_LOOKUPS = {
+        "city": "city_id",
+        "region": "city__region_id",
+        "country": "city__region__country_id",
+    }
+    COUNT_FIELDS = ["infrastructure_count", "equipment_count", "service_count"]
+
+    level = models.CharField(max_length=10, choices=LEVELS)
+    location_id = models.PositiveBigIntegerField()
+    parent_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Region of a city, country of a region"
+    )
+
+    infrastructure_count = models.PositiveIntegerField(default=0)
+    equipment_count = models.PositiveIntegerField(default=0)
+    service_count = models.PositiveIntegerField(default=0)
+
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [["level", "location_id"]]
+        indexes = [
+            models.Index(fields=["level", "parent_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.location_id}: {self.infrastructure_count} infrastructures"
+
+    @classmethod
+    def location_model(cls, level):
+        return {"city": City, "region": Region, "country": Country}[level]
+
+    @classmethod
+    def _counts(cls, level, location_ids, restrict=True):
+        """Grouped counts per location at one level; one query per counted model."""
+        Infrastructure = django_apps.get_model("infrastructures", "Infrastructure")
+        Equipment = django_apps.get_model("equipment", "Equipment")
+        Service = django_apps.get_model("services", "Service")
+        lookup = cls.LEVEL_LOOKUPS[level]
+
+        sources = {
+            "infrastructure_count": (
+                Infrastructure.objects.filter(is_active=True),
+                lookup,
+                Count("id")
+            ),
+            "equipment_count": (
+                Equipment.objects.filter(is_available=True, infrastructure__is_active=True),
+                f"infrastructure__{lookup}",
+                Count("id")
+            ),
+            "service_count": (
+                Service.objects.filter(
+                    is_active=True,
+                    equipment_services__equipment__infrastructure__is_active=True
+                ),
+                f"equipment_services__equipment__infrastructure__{lookup}",
+                Count("id", distinct=True)
+            ),
+        }
+
+        counts = {pk: dict.fromkeys(cls.COUNT_FIELDS, 0) for pk in location_ids}
+        for count_field, (queryset, path, aggregate) in sources.items():
+            if restrict:
+                queryset = queryset.filter(**{f"{path}__in": list(location_ids)})
+            rows = queryset.values_list(path).annotate(total=aggregate).order_by()
+            for location_id, total in rows:
+                if location_id in counts:
+                    counts[location_id][count_field] = total
+        return counts
+
+    @classmethod
+    def refresh(cls, level, location_ids=None):
+        """Recompute rollups for locations at one level (all when None); returns rows written."""
+        location_model = cls.location_model(level)
+        parent_field = {"city": "region_id", "region": "country_id", "country": None}[level]
+        queryset = location_model.objects.all()
+        if location_ids is not None:
+            location_ids = set(location_ids)
+            queryset = queryset.filter(pk__in=location_ids)
+        if parent_field:
+            parents = dict(queryset.values_list("pk", parent_field))
+        else:
+            parents = dict.fromkeys(queryset.values_list("pk", flat=True))
+
+        rollups = [
+            cls(level=level, location_id=pk, parent_id=parents[pk], **values)
+            for pk, values in cls._counts(level, parents, restrict=location_ids is not None).items()
+        ]
+
+        with transaction.atomic():
+            if rollups:
+                bulk_upsert(
+                    cls,
+                    rollups,
+                    unique_fields=["level", "location_id"],
+                    update_fields=["parent_id"] + cls.COUNT_FIELDS + ["refreshed_at"]
+                )
+            # Drop rows of locations that no longer exist
+            stale = cls.objects.filter(level=level).exclude(location_id__in=list(parents))
+            if location_ids is not None:
+                stale = stale.filter(location_id__in=location_ids)
+            stale.delete()
+        return len(rollups)
+
+    @classmethod
+    def refresh_cities(cls, city_ids, region_ids=(), country_ids=()):
+        """Refresh the given cities and every region and country containing them."""
+        city_ids = {pk for pk in city_ids if pk}
+        region_ids = {pk for pk in region_ids if pk}
+        country_ids = {pk for pk in country_ids if pk}
+        for region_id, country_id in City.objects.filter(pk__in=city_ids).values_list(
+            "region_id", "region__country_id"
+        ):
+            region_ids.add(region_id)
+            country_ids.add(country_id)
+        country_ids.update(Region.objects.filter(pk__in=region_ids).values_list("country_id", flat=True))
+
+        written = 0
+        for level, ids in (("city", city_ids), ("region", region_ids), ("country", country_ids)):
+            if ids:
+                written += cls.refresh(level, ids)
+        return written
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every rollup; returns rows written."""
+        return sum(cls.refresh(level) for level, _ in cls.LEVELS)
+
+    @classmethod
+    def facets(cls, level, parent_id=None):
+        """Locations at a level with at least one active infrastructure, most first."""
+        queryset = cls.objects.filter(level=level, infrastructure_count__gt=0)
+        if parent_id is not None:
+            queryset = queryset.filter(parent_id=parent_id)
+        return queryset.order_by("-infrastructure_count", "location_id")
+
+    @classmethod
+    def annotate_counts(cls, queryset, level):
+        """Annotate a location queryset with its rollup counts (0 when missing)."""
+        rollup = cls.objects.filter(level=level, location_id=OuterRef("pk"))
+        return queryset.annotate(**{
+            field: Coalesce(Subquery(rollup.values(field)[:1]), Value(0))
+            for field in cls.COUNT_FIELDS
+        })
@@ -0,0 +1,123 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.equipment.models import Equipment
+from apps.infrastructures.models import Infrastructure
+from apps.services.models import EquipmentService, Service
+
+from .models import City, LocationRollup
+
+
+def _infrastructure_cities(pks):
+    return set(Infrastructure.objects.filter(pk__in=pks).values_list("city_id", flat=True))
+
+
+# Models that move rollup counts: the fields whose change matters, and the
+# cities an instance counts towards (read from the database)
+ROLLUP_SOURCES = {
+    Infrastructure: (
+        ["city_id", "is_active"],
+        lambda obj: {obj.city_id},
+    ),
+    Equipment: (
+        ["infrastructure_id", "is_available"],
+        lambda obj: _infrastructure_cities([obj.infrastructure_id]),
+    ),
+    EquipmentService: (
+        ["equipment_id", "service_id"],
+        lambda obj: set(
+            Equipment.objects.filter(pk=obj.equipment_id).values_list("infrastructure__city_id", flat=True)
+        ),
+    ),
+    Service: (
+        ["is_active"],
+        lambda obj: set(
+            Infrastructure.objects.filter(equipment__equipment_services__service=obj).values_list(
+                "city_id", flat=True
+            )
+        ),
+    ),
+}
+
+_pending = threading.local()
+
+
+def schedule_refresh(city_ids=(), region_ids=(), country_ids=()):
+    """
+    Refresh rollups once the current transaction commits.
+
+    Changes within one transaction (e.g. a cascade delete) are merged into
+    a single refresh.
+    """
+    if not hasattr(_pending, "locations"):
+        _pending.locations = {"city": set(), "region": set(), "country": set()}
+    _pending.locations["city"].update(pk for pk in city_ids if pk)
+    _pending.locations["region"].update(pk for pk in region_ids if pk)
+    _pending.locations["country"].update(pk for pk in country_ids if pk)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    locations = getattr(_pending, "locations", None)
+    if not locations or not any(locations.values()):
+        return
+    _pending.locations = {"city": set(), "region": set(), "country": set()}
+    LocationRollup.refresh_cities(locations["city"], locations["region"], locations["country"])
+
+
+@receiver(pre_save)
+def remember_rollup_state(sender, instance, **kwargs):
+    """Remember the tracked fields and cities an object counted towards before saving."""
+    if sender not in ROLLUP_SOURCES or kwargs.get("raw") or instance.pk is None:
+        return
+    fields, cities = ROLLUP_SOURCES[sender]
+    previous = sender._base_manager.filter(pk=instance.pk).values(*fields).first()
+    if previous is not None:
+        old = sender(pk=instance.pk, **previous)
+        instance._rollup_previous = (previous, cities(old))
+
+
+@receiver(post_save)
+def refresh_rollups_on_save(sender, instance, created, **kwargs):
+    """Refresh rollups for the old and new cities when a tracked field changes."""
+    if sender not in ROLLUP_SOURCES or kwargs.get("raw"):
+        return
+    fields, cities = ROLLUP_SOURCES[sender]
+    previous, previous_cities = getattr(instance, "_rollup_previous", (None, set()))
+    current = {field: getattr(instance, field) for field in fields}
+    if created or previous != current:
+        schedule_refresh(previous_cities | cities(instance))
+
+
+@receiver(pre_delete)
+def remember_rollup_cities(sender, instance, **kwargs):
+    """Related rows are gone after a delete, so look up the cities beforehand."""
+    if sender in ROLLUP_SOURCES:
+        instance._rollup_cities = ROLLUP_SOURCES[sender][1](instance)
+
+
+@receiver(post_delete)
+def refresh_rollups_on_delete(sender, instance, **kwargs):
+    if sender in ROLLUP_SOURCES:
+        schedule_refresh(getattr(instance, "_rollup_cities", set()))
+    elif sender is City:
+        schedule_refresh([instance.pk], [instance.region_id])
+
+
+@receiver(pre_save, sender=City)
+def remember_city_region(sender, instance, **kwargs):
+    if instance.pk is not None and not kwargs.get("raw"):
+        instance._rollup_region_id = City.objects.filter(pk=instance.pk).values_list(
+            "region_id", flat=True
+        ).first()
+
+
+@receiver(post_save, sender=City)
+def refresh_rollups_on_city_move(sender, instance, created, **kwargs):
+    """Moving a city to another region shifts its counts between regions and countries."""
+    previous_region = getattr(instance, "_rollup_region_id", None)
+    if not created and previous_region and previous_region != instance.region_id:
+        schedule_refresh([instance.pk], [previous_region])
@@ -1,5 +1,13 @@
+from decimal import Decimal
+
 from django.test import TestCase
-from apps.locations.models import Country, Region, City
+from apps.equipment.models import Equipment
+from apps.infrastructures.models import Infrastructure
+from apps.institutions.models import Institution
+from apps.locations import geo
+from apps.locations.models import Country, Region, City, LocationRollup
+from apps.search.services import SearchService
+from apps.services.models import EquipmentService, Service
 
 
 class CountryModelTest(TestCase):
@@ -103,4 +111,134 @@ class CityModelTest(TestCase):
 
     def test_city_country_property(self):
         """Test city can access country through region."""
-        self.assertEqual(self.city.country, self.country)
\ No newline at end of file
+        self.assertEqual(self.city.country, self.country)
+
+    def test_city_geohash(self):
+        """Test coordinates are indexed by geohash on save."""
+        self.assertEqual(self.city.geohash, '')
+
+        self.city.latitude = Decimal('50.061400')
+        self.city.longitude = Decimal('19.936600')
+        self.city.save()
+
+        self.assertEqual(self.city.geohash, geo.encode(50.0614, 19.9366))
+        self.assertTrue(self.city.geohash.startswith('u2yhv'))
+
+    def test_city_coordinates_propagate_to_institutions(self):
+        """Test institutions without coordinates are indexed by their city."""
+        institution = Institution.objects.create(city=self.city)
+        self.assertEqual(institution.geohash, '')
+
+        self.city.latitude = Decimal('50.061400')
+        self.city.longitude = Decimal('19.936600')
+        self.city.save()
+
+        institution.refresh_from_db()
+        self.assertEqual(institution.geohash, self.city.geohash)
+
+
+class GeoTest(TestCase):
+    """Tests for geohash and distance helpers."""
+
+    def test_encode(self):
+        """Test encoding matches the reference geohash."""
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_covering_cells_contain_points(self):
+        """Test the cells covering a radius include points inside it."""
+        bbox = geo.radius_bbox(50.0614, 19.9366, 50)
+        cells = geo.covering_cells(*bbox)
+
+        self.assertLessEqual(len(cells), geo.MAX_CELLS)
+        for latitude, longitude in [(50.0614, 19.9366), (49.8, 19.6), (50.4, 20.3)]:
+            point = geo.encode(latitude, longitude)
+            self.assertTrue(any(point.startswith(cell) for cell in cells))
+
+    def test_radius_across_antimeridian(self):
+        """Test a radius crossing the antimeridian covers and finds points on both sides."""
+        bbox = geo.radius_bbox(-17.7, 179.9, 100)
+        self.assertGreater(bbox[1], bbox[3])
+
+        cells = geo.covering_cells(*bbox)
+        self.assertLessEqual(len(cells), geo.MAX_CELLS)
+        points = [(1, -17.7, 179.5), (2, -17.7, -179.8), (3, -17.7, 175.0)]
+        for _, latitude, longitude in points:
+            if geo.haversine_km(-17.7, 179.9, [latitude], [longitude])[0] <= 100:
+                point = geo.encode(latitude, longitude)
+                self.assertTrue(any(point.startswith(cell) for cell in cells))
+
+        self.assertEqual(set(geo.refine(points, bbox, (-17.7, 179.9), 100)), {1, 2})
+        self.assertEqual(set(geo.refine(points, bbox)), {1, 2})
+
+    def test_haversine(self):
+        """Test distances between Krakow and Warsaw."""
+        distances = geo.haversine_km(50.0614, 19.9366, [52.2297, 50.0614], [21.0122, 19.9366])
+        self.assertAlmostEqual(distances[0], 252, delta=2)
+        self.assertAlmostEqual(distances[1], 0)
+
+
+class LocationRollupTest(TestCase):
+    """Tests for precomputed location counts."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.country = Country.objects.create(code='PL')
+        self.lesser_poland = Region.objects.create(country=self.country, code='MA')
+        self.silesia = Region.objects.create(country=self.country, code='SL')
+        self.krakow = City.objects.create(region=self.lesser_poland)
+        self.katowice = City.objects.create(region=self.silesia)
+        self.institution = Institution.objects.create(city=self.krakow)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.infra = Infrastructure.objects.create(institution=self.institution, city=self.krakow)
+            self.equipment = Equipment.objects.create(infrastructure=self.infra, is_available=True)
+            self.service = Service.objects.create(code='TEM')
+            EquipmentService.objects.create(equipment=self.equipment, service=self.service)
+
+    def counts(self, level, location):
+        rollup = LocationRollup.objects.get(level=level, location_id=location.pk)
+        return rollup.infrastructure_count, rollup.equipment_count, rollup.service_count
+
+    def test_counts_after_creation(self):
+        """Test creating objects updates city, region and country rollups."""
+        self.assertEqual(self.counts('city', self.krakow), (1, 1, 1))
+        self.assertEqual(self.counts('region', self.lesser_poland), (1, 1, 1))
+        self.assertEqual(self.counts('country', self.country), (1, 1, 1))
+
+    def test_moving_infrastructure(self):
+        """Test moving an infrastructure shifts counts between cities and regions."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.infra.city = self.katowice
+            self.infra.save()
+
+        self.assertEqual(self.counts('city', self.krakow), (0, 0, 0))
+        self.assertEqual(self.counts('region', self.silesia), (1, 1, 1))
+        self.assertEqual(self.counts('country', self.country), (1, 1, 1))
+
+    def test_deactivation_and_delete(self):
+        """Test deactivating and deleting objects lowers the counts."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipment.is_available = False
+            self.equipment.save()
+        self.assertEqual(self.counts('city', self.krakow), (1, 0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.infra.delete()
+        self.assertEqual(self.counts('region', self.lesser_poland), (0, 0, 0))
+
+    def test_rebuild_matches_incremental(self):
+        """Test a full rebuild produces the incrementally maintained counts."""
+        before = set(LocationRollup.objects.values_list('level', 'location_id', 'infrastructure_count'))
+        LocationRollup.objects.all().delete()
+        LocationRollup.rebuild()
+        after = set(LocationRollup.objects.values_list('level', 'location_id', 'infrastructure_count'))
+        self.assertTrue(before <= after)
+
+    def test_facets_and_admin_annotations(self):
+        """Test facets and list columns read the rollups."""
+        facets = SearchService.location_facets('region', parent_id=self.country.pk)
+        self.assertEqual([facet['id'] for facet in facets], [self.lesser_poland.pk])
+
+        with self.assertNumQueries(1):
+            cities = list(LocationRollup.annotate_counts(City.objects.order_by('pk'), 'city'))
+        self.assertEqual([city.infrastructure_count for city in cities], [1, 0])
@@ -1,12 +1,13 @@
 from django.contrib import admin
 from parler.admin import TranslatableAdmin
-from .models import FieldOfScience, Keyword, ResearchProblem
+from .models import FieldOfScience, Keyword, KeywordUsage, ResearchProblem
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin
 
 
 @admin.register(FieldOfScience, site=admin_site)
-class FieldOfScienceAdmin(TranslatableAdmin):
+class FieldOfScienceAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'code',
         'name',
@@ -16,6 +17,8 @@ class FieldOfScienceAdmin(TranslatableAdmin):
         'problem_count',
         'created_at'
     ]
+    list_select_related = ['parent']
+    translation_related = ['parent']
     list_filter = [
         'is_active',
         'parent',
@@ -59,6 +62,7 @@ class FieldOfScienceAdmin(TranslatableAdmin):
         return obj.level
 
     level.short_description = 'Level'
+    level.admin_order_field = 'tree_depth'
 
     def problem_count(self, obj):
         """Count research problems in this field."""
@@ -74,9 +78,11 @@ class KeywordAdmin(TranslatableAdmin):
         'slug',
         'field_of_science',
         'usage_count',
+        'used_by',
         'is_active',
         'created_at'
     ]
+    list_select_related = ['usage']
     list_filter = [
         'is_active',
         'field_of_science',
@@ -117,7 +123,7 @@ class KeywordAdmin(TranslatableAdmin):
         return fieldsets
 
     # Actions
-    actions = ['reset_usage_count']
+    actions = ['reset_usage_count', 'refresh_usage']
 
     def reset_usage_count(self, request, queryset):
         updated = queryset.update(usage_count=0)
@@ -125,6 +131,22 @@ class KeywordAdmin(TranslatableAdmin):
 
     reset_usage_count.short_description = "Reset usage count to 0"
 
+    def refresh_usage(self, request, queryset):
+        refreshed = KeywordUsage.refresh(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'Recounted usage for {refreshed} keywords.')
+
+    refresh_usage.short_description = "Recount usage from relations"
+
+    def used_by(self, obj):
+        """Show how many objects actually use this entry."""
+        try:
+            return obj.usage.total_count
+        except KeywordUsage.DoesNotExist:
+            return 0
+
+    used_by.short_description = 'Used by'
+    used_by.admin_order_field = 'usage__total_count'
+
 
 @admin.register(ResearchProblem, site=admin_site)
 class ResearchProblemAdmin(TranslatableAdmin):
@@ -1,8 +1,10 @@
 from django.db import models
 from parler.models import TranslatableModel, TranslatedFields
+from ScientaGrid import counters
+from apps.taxonomy.models import HierarchyMixin, UniqueSlugMixin, UsageSummary
 
 
-class FieldOfScience(TranslatableModel):
+class FieldOfScience(HierarchyMixin, TranslatableModel):
     """Represents scientific fields and disciplines for classification."""
 
     translations = TranslatedFields(
@@ -40,22 +42,8 @@ class FieldOfScience(TranslatableModel):
             return f"{self.code}: {name}"
         return name
 
-    @property
-    def full_path(self):
-        """Get full hierarchical path."""
-        if self.parent:
-            return f"{self.parent.full_path} > {self.name}"
-        return self.name
 
-    @property
-    def level(self):
-        """Get hierarchy level (0 for top-level)."""
-        if self.parent:
-            return self.parent.level + 1
-        return 0
-
-
-class Keyword(TranslatableModel):
+class Keyword(UniqueSlugMixin, TranslatableModel):
     """Represents keywords for tagging and searching research problems."""
 
     translations = TranslatedFields(
@@ -95,25 +83,9 @@ class Keyword(TranslatableModel):
         return self.safe_translation_getter('name', any_language=True) or self.slug
 
     def increment_usage(self):
-        """Increment usage count."""
+        """Increment usage count through the buffered counter service."""
+        counters.increment(Keyword, self.pk, 'usage_count')
         self.usage_count += 1
-        self.save(update_fields=['usage_count'])
-
-    def save(self, *args, **kwargs):
-        """Auto-generate slug from name if not provided."""
-        if not self.slug and self.has_translation():
-            from django.utils.text import slugify
-            current_name = self.safe_translation_getter('name', any_language=True)
-            if current_name:
-                base_slug = slugify(current_name)
-                slug = base_slug
-                counter = 1
-                # Ensure slug is unique
-                while Keyword.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                self.slug = slug
-        super().save(*args, **kwargs)
 
 
 class ResearchProblem(TranslatableModel):
@@ -260,6 +232,31 @@ class ResearchProblem(TranslatableModel):
         return fields
 
 
+class KeywordUsage(UsageSummary):
+    """How many research problems use each keyword."""
+
+    SUBJECT_FIELD = 'keyword'
+    SOURCES = {
+        'research_problem_count': ('research_problems.ResearchProblem', 'keywords'),
+    }
+
+    keyword = models.OneToOneField(
+        Keyword,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage'
+    )
+
+    research_problem_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-total_count']
+        verbose_name_plural = "Keyword usage"
+
+    def __str__(self):
+        return f"{self.keyword}: {self.total_count}"
+
+
 # Add many-to-many relationship to Infrastructure for matched problems
 from apps.infrastructures.models import Infrastructure
 
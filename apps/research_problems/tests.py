@@ -1,6 +1,8 @@
+from django.core.cache import cache
 from django.test import TestCase
+from ScientaGrid import counters
 from decimal import Decimal
-from apps.research_problems.models import FieldOfScience, Keyword, ResearchProblem
+from apps.research_problems.models import FieldOfScience, Keyword, KeywordUsage, ResearchProblem
 
 
 class FieldOfScienceModelTest(TestCase):
@@ -8,6 +10,10 @@ class FieldOfScienceModelTest(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        # Parler caches translations outside the test transaction; a stale
+        # entry would keep the translations below from being written
+        cache.clear()
+
         # Create parent field
         self.parent_field = FieldOfScience.objects.create(
             code='1',
@@ -79,6 +85,10 @@ class KeywordModelTest(TestCase):
         self.keyword.description = 'Materials at nanoscale'
         self.keyword.save()
 
+    def tearDown(self):
+        """Drop increments left buffered by the test."""
+        counters.discard()
+
     def test_keyword_creation(self):
         """Test keyword is created correctly."""
         self.assertEqual(self.keyword.slug, 'nanomaterials')
@@ -196,4 +206,12 @@ class ResearchProblemModelTest(TestCase):
     def test_research_problem_status_choices(self):
         """Test status is one of valid choices."""
         valid_statuses = ['draft', 'active', 'matched', 'in_progress', 'completed', 'on_hold', 'cancelled']
-        self.assertIn(self.problem.status, valid_statuses)
\ No newline at end of file
+        self.assertIn(self.problem.status, valid_statuses)
+
+    def test_keyword_usage_follows_relations(self):
+        """Test keyword usage is counted from research problems."""
+        self.assertEqual(KeywordUsage.objects.get(keyword=self.keyword1).research_problem_count, 1)
+
+        self.problem.keywords.remove(self.keyword1)
+        self.assertEqual(KeywordUsage.objects.get(keyword=self.keyword1).total_count, 0)
+        self.assertEqual(KeywordUsage.objects.get(keyword=self.keyword2).total_count, 1)
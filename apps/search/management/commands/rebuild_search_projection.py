@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.search.models import SearchProjection
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-language search projection of infrastructures, equipment, services, institutions and cities'
+
+    def handle(self, *args, **options):
+        for kind, label in SearchProjection.KINDS:
+            written = SearchProjection.refresh(kind)
+            self.stdout.write(f'  {label}: {written} rows')
+
+        self.stdout.write(self.style.SUCCESS('\nSearch projection rebuilt'))
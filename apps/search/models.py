@@ -1,4 +1,12 @@
-from django.db import models
+from collections import defaultdict
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import translation
+from ScientaGrid import counters
+from ScientaGrid.db import bulk_upsert
+from ScientaGrid.translations import translation_languages
 from apps.users.models import UserProfile
 import json
 
@@ -74,9 +82,9 @@ class SavedSearch(models.Model):
     def increment_usage(self):
         """Increment usage counter and update last used timestamp."""
         from django.utils import timezone
+        counters.increment(SavedSearch, self.pk, 'usage_count', touch='last_used_at')
         self.usage_count += 1
         self.last_used_at = timezone.now()
-        self.save(update_fields=['usage_count', 'last_used_at'])
 
     def get_params_dict(self):
         """Get search parameters as dictionary."""
@@ -156,4 +164,225 @@ class SearchLog(models.Model):
 
     def __str__(self):
         user_str = self.user.username if self.user else 'Anonymous'
-        return f"{user_str} searched '{self.query_text}' at {self.timestamp}"
\ No newline at end of file
+        return f"{user_str} searched '{self.query_text}' at {self.timestamp}"
+
+
+class SearchProjection(models.Model):
+    """
+    One row per object and language with the searchable text flattened in.
+
+    Translated fields (with parler fallbacks applied) and the names of
+    related locations and institutions are copied into ``search_text``, so
+    text search is a semi-join on this table instead of a join across
+    translation tables that multiplies rows per language. Rows are
+    refreshed whenever an object, its translations or a related name
+    changes.
+
+    Usage:
+        Infrastructure.objects.filter(id__in=SearchProjection.matching('infrastructure', 'microscopy'))
+        SearchProjection.for_language('city', 'pl').values_list('object_id', 'name')
+        SearchProjection.refresh('infrastructure', [infra.pk])
+    """
+
+    KINDS = [
+        ('infrastructure', 'Infrastructure'),
+        ('equipment', 'Equipment'),
+        ('service', 'Service'),
+        ('institution', 'Institution'),
+        ('city', 'City'),
+    ]
+    # Per kind: the model, its translated and plain searchable fields, and
+    # the relation paths to objects whose translated name is included
+    SOURCES = {
+        'infrastructure': {
+            'model': 'infrastructures.Infrastructure',
+            'translated': ['name', 'description', 'internal_comments'],
+            'plain': [],
+            'related': [
+                ('institution_id', 'institutions.Institution'),
+                ('city_id', 'locations.City'),
+                ('city__region_id', 'locations.Region'),
+            ],
+        },
+        'equipment': {
+            'model': 'equipment.Equipment',
+            'translated': ['name', 'description', 'technical_details'],
+            'plain': ['manufacturer', 'model_number'],
+            'related': [
+                ('infrastructure_id', 'infrastructures.Infrastructure'),
+            ],
+        },
+        'service': {
+            'model': 'services.Service',
+            'translated': ['name', 'description', 'methodology', 'typical_applications'],
+            'plain': ['code'],
+            'related': [],
+        },
+        'institution': {
+            'model': 'institutions.Institution',
+            'translated': ['name', 'description'],
+            'plain': [],
+            'related': [
+                ('city_id', 'locations.City'),
+            ],
+        },
+        'city': {
+            'model': 'locations.City',
+            'translated': ['name'],
+            'plain': ['postal_code'],
+            'related': [
+                ('region_id', 'locations.Region'),
+                ('region__country_id', 'locations.Country'),
+            ],
+        },
+    }
+    REFRESH_BATCH_SIZE = 500
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    language_code = models.CharField(max_length=15)
+
+    name = models.CharField(max_length=255, blank=True)
+    search_text = models.TextField(blank=True)
+
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [['kind', 'object_id', 'language_code']]
+        indexes = [
+            models.Index(fields=['kind', 'language_code', 'name']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} [{self.language_code}]: {self.name}"
+
+    @staticmethod
+    def languages():
+        return [code for code, _ in settings.LANGUAGES]
+
+    @classmethod
+    def source_model(cls, kind):
+        return django_apps.get_model(cls.SOURCES[kind]['model'])
+
+    @classmethod
+    def matching(cls, kind, text):
+        """Object IDs of one kind whose text in any language contains ``text``, as a subquery."""
+        return cls.objects.filter(kind=kind, search_text__icontains=text).values('object_id')
+
+    @classmethod
+    def for_language(cls, kind, language_code=None):
+        """Rows of one kind in a single language, one per object, ordered by name."""
+        language_code = language_code or translation.get_language() or settings.LANGUAGE_CODE
+        return cls.objects.filter(kind=kind, language_code=language_code).order_by('name')
+
+    @staticmethod
+    def _translations(model, ids, fields):
+        """{pk: {language: [values]}} of the given translated fields, in one query."""
+        translated = defaultdict(dict)
+        if not ids:
+            return translated
+        rows = model._parler_meta.root_model.objects.filter(master_id__in=ids).values_list(
+            'master_id', 'language_code', *fields
+        )
+        for master_id, language_code, *values in rows:
+            translated[master_id][language_code] = values
+        return translated
+
+    @staticmethod
+    def _resolve(by_language, language_code):
+        """Values in a language, its fallbacks or, failing those, any language."""
+        for code in translation_languages(language_code):
+            if code in by_language:
+                return by_language[code]
+        return next(iter(by_language.values()), None)
+
+    @classmethod
+    def _rows(cls, kind, ids):
+        source = cls.SOURCES[kind]
+        model = cls.source_model(kind)
+        paths = [path for path, _ in source['related']]
+        objects = {
+            values[0]: values[1:]
+            for values in model.objects.filter(pk__in=ids).values_list('pk', *source['plain'], *paths)
+        }
+        translated = cls._translations(model, list(objects), source['translated'])
+
+        # Names of related objects, one query per related model
+        related_ids = defaultdict(set)
+        for position, (_, label) in enumerate(source['related']):
+            offset = len(source['plain']) + position
+            related_ids[label].update(values[offset] for values in objects.values() if values[offset])
+        related_names = {
+            label: cls._translations(django_apps.get_model(label), list(pks), ['name'])
+            for label, pks in related_ids.items()
+        }
+
+        rows = []
+        for pk, values in objects.items():
+            plain = [value for value in values[:len(source['plain'])] if value]
+            for language_code in cls.languages():
+                own = cls._resolve(translated.get(pk, {}), language_code) or [''] * len(source['translated'])
+                parts = [value for value in own if value] + plain
+                for position, (_, label) in enumerate(source['related']):
+                    related_id = values[len(source['plain']) + position]
+                    name = cls._resolve(related_names[label].get(related_id, {}), language_code)
+                    if name and name[0]:
+                        parts.append(name[0])
+                rows.append(cls(
+                    kind=kind,
+                    object_id=pk,
+                    language_code=language_code,
+                    name=(own[0] or '')[:255],
+                    search_text='\n'.join(parts)
+                ))
+        return rows, set(objects)
+
+    @classmethod
+    def refresh(cls, kind, ids=None):
+        """Rebuild rows for objects of one kind (all when None); returns rows written."""
+        model = cls.source_model(kind)
+        if ids is None:
+            all_ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        else:
+            all_ids = sorted(set(ids))
+
+        written = 0
+        with transaction.atomic():
+            existing = set()
+            for start in range(0, len(all_ids), cls.REFRESH_BATCH_SIZE):
+                rows, found = cls._rows(kind, all_ids[start:start + cls.REFRESH_BATCH_SIZE])
+                existing |= found
+                if rows:
+                    bulk_upsert(
+                        cls,
+                        rows,
+                        unique_fields=['kind', 'object_id', 'language_code'],
+                        update_fields=['name', 'search_text', 'refreshed_at']
+                    )
+                    written += len(rows)
+
+            # Drop rows of deleted objects and of languages no longer configured
+            stale = cls.objects.filter(kind=kind)
+            if ids is not None:
+                stale = stale.filter(object_id__in=all_ids)
+            stale.exclude(object_id__in=existing, language_code__in=cls.languages()).delete()
+        return written
+
+    @classmethod
+    def dependents(cls, label, pk):
+        """{kind: ids} of projection rows that include the object ``label``/``pk``."""
+        affected = {}
+        for kind, source in cls.SOURCES.items():
+            if source['model'] == label:
+                affected.setdefault(kind, set()).add(pk)
+            for path, related_label in source['related']:
+                if related_label == label:
+                    affected.setdefault(kind, set()).update(
+                        cls.source_model(kind).objects.filter(**{path: pk}).values_list('pk', flat=True)
+                    )
+        return affected
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild every kind from scratch."""
+        return sum(cls.refresh(kind) for kind in cls.SOURCES)
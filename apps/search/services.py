@@ -1,9 +1,16 @@
-from django.db.models import Q, Count, Prefetch
+from django.db.models import F, Min, Q, Count, Prefetch
+from django.db.models.functions import Coalesce
 from apps.infrastructures.models import Infrastructure
 from apps.equipment.models import Equipment
 from apps.services.models import Service, EquipmentService
-from apps.research_problems.models import ResearchProblem
+from apps.research_problems.models import ResearchProblem, FieldOfScience
 from apps.specifications.models import SpecificationValue
+from apps.taxonomy.models import TechnologyDomain, InfrastructureCategory
+from ScientaGrid.translations import with_translations
+from apps.locations import geo
+from apps.locations.models import LocationRollup
+from apps.search.models import SearchProjection
+from apps.documents.models import DocumentTerm
 import time
 
 
@@ -14,7 +21,9 @@ class SearchService:
     def _deduplicate_queryset(queryset):
         """
         Deduplicate queryset results by ID.
-        Needed because django-parler with MySQL can create duplicates.
+        Needed because filters across to-many relations (tags, access
+        conditions, pricing policies) repeat rows; text search goes through
+        SearchProjection and no longer joins translation tables.
         """
         seen_ids = set()
         unique_results = []
@@ -24,6 +33,55 @@ class SearchService:
                 unique_results.append(obj)
         return unique_results
 
+    @staticmethod
+    def _taxonomy_ids(model, ids, filters):
+        """
+        Return the IDs to filter on for a hierarchical taxonomy.
+
+        With ``include_descendants`` the IDs are expanded through the cached
+        tree index, so a parent matches everything below it in one IN clause.
+        """
+        if not isinstance(ids, (list, tuple, set)):
+            ids = [ids]
+        if filters.get('include_descendants'):
+            return model.expand_ids(ids)
+        return list(ids)
+
+    @staticmethod
+    def _infrastructure_distances(filters):
+        """
+        Find infrastructures inside a radius or bounding box.
+
+        Candidates are prefiltered on the indexed geohash cells covering the
+        area and refined with exact distances. Infrastructures without their
+        own coordinates are placed at their city.
+
+        Returns:
+            Dict of infrastructure ID to distance in km (None for a bbox search)
+        """
+        near = filters.get('near')
+        if near:
+            center = (float(near['latitude']), float(near['longitude']))
+            radius_km = float(near['radius_km'])
+            bbox = geo.radius_bbox(center[0], center[1], radius_km)
+        else:
+            center = radius_km = None
+            bbox = tuple(float(value) for value in filters['bbox'])
+
+        cell_filter = Q()
+        for cell in geo.covering_cells(*bbox):
+            cell_filter |= Q(geohash__startswith=cell)
+
+        points = Infrastructure.objects.filter(cell_filter).annotate(
+            point_latitude=Coalesce('latitude', 'city__latitude'),
+            point_longitude=Coalesce('longitude', 'city__longitude')
+        ).filter(
+            point_latitude__isnull=False,
+            point_longitude__isnull=False
+        ).values_list('id', 'point_latitude', 'point_longitude')
+
+        return geo.refine(list(points), bbox, center, radius_km)
+
     @staticmethod
     def search_infrastructures(query_text=None, filters=None, apply_ranking=True):
         """
@@ -41,10 +99,17 @@ class SearchService:
                 - technology_domains: List of domain IDs
                 - categories: List of category IDs
                 - tags: List of tag IDs
+                - research_field_id: Filter by field of science of linked research problems
+                - include_descendants: Also match subdomains, subcategories and subfields
+                - near: Dict with latitude, longitude and radius_km; results get distance_km
+                - bbox: Tuple of (min_lat, min_lon, max_lat, max_lon); min_lon > max_lon crosses the antimeridian
                 - min_reliability: Minimum reliability score
                 - access_type: Filter by access type (open, restricted, etc.)
-                - has_pricing: Filter infrastructures with pricing
-                - max_price: Maximum price filter
+                - has_pricing: Filter infrastructures with a price in effect
+                - pricing_type: Filter by pricing type (per_hour, per_sample, etc.)
+                - max_price: Maximum price in effect for user_type
+                - user_type: academic (default), commercial or internal
+                - sort_by_price: Cheapest first for user_type; results get price
             apply_ranking: Whether to apply ranking to results (default: True)
 
             Returns:
@@ -65,18 +130,18 @@ class SearchService:
             'access_conditions',
             'pricing_policies'
         )
+        queryset = with_translations(
+            queryset,
+            related=['institution', 'city', 'city__region', 'city__region__country']
+        )
 
         filters = filters or {}
 
-        # Text search
+        # Text search, including the text of attached documents
         if query_text:
             queryset = queryset.filter(
-                Q(translations__name__icontains=query_text) |
-                Q(translations__description__icontains=query_text) |
-                Q(institution__translations__name__icontains=query_text) |
-                Q(translations__internal_comments__icontains=query_text) |
-                Q(city__translations__name__icontains=query_text) |
-                Q(city__region__translations__name__icontains=query_text)
+                Q(id__in=SearchProjection.matching('infrastructure', query_text)) |
+                Q(id__in=DocumentTerm.matching_documents(query_text).values('infrastructure_id'))
             )
 
         # Location filters
@@ -87,6 +152,12 @@ class SearchService:
         if filters.get('country_id'):
             queryset = queryset.filter(city__region__country_id=filters['country_id'])
 
+        # Geographic filters
+        distances = None
+        if filters.get('near') or filters.get('bbox'):
+            distances = SearchService._infrastructure_distances(filters)
+            queryset = queryset.filter(id__in=list(distances))
+
         # Institution filter
         if filters.get('institution_id'):
             queryset = queryset.filter(institution_id=filters['institution_id'])
@@ -103,11 +174,15 @@ class SearchService:
 
         # Technology domains
         if filters.get('technology_domains'):
-            queryset = queryset.filter(technology_domains__id__in=filters['technology_domains'])
+            queryset = queryset.filter(technology_domains__id__in=SearchService._taxonomy_ids(
+                TechnologyDomain, filters['technology_domains'], filters
+            ))
 
         # Categories
         if filters.get('categories'):
-            queryset = queryset.filter(categories__id__in=filters['categories'])
+            queryset = queryset.filter(categories__id__in=SearchService._taxonomy_ids(
+                InfrastructureCategory, filters['categories'], filters
+            ))
 
         # Tags
         if filters.get('tags'):
@@ -116,7 +191,9 @@ class SearchService:
         # Research field filter
         if filters.get('research_field_id'):
             queryset = queryset.filter(
-                research_problems__field_of_science_id=filters['research_field_id']
+                research_problems__field_of_science_id__in=SearchService._taxonomy_ids(
+                    FieldOfScience, filters['research_field_id'], filters
+                )
             )
 
         # Access condition filters
@@ -132,24 +209,26 @@ class SearchService:
                 access_conditions__is_active=True
             )
 
-        # Pricing filters
+        # Pricing filters, on the prices in effect today. All conditions go
+        # into one filter() so they share a single join
+        user_type = filters.get('user_type') or 'academic'
+        price_conditions = {}
         if filters.get('has_pricing'):
-            queryset = queryset.filter(
-                pricing_policies__is_active=True
-            )
-
-        if filters.get('max_price'):
-            queryset = queryset.filter(
-                Q(pricing_policies__base_price__lte=filters['max_price']) |
-                Q(pricing_policies__academic_price__lte=filters['max_price']),
-                pricing_policies__is_active=True
-            )
-
+            price_conditions['effective_prices__isnull'] = False
         if filters.get('pricing_type'):
-            queryset = queryset.filter(
-                pricing_policies__pricing_type=filters['pricing_type'],
-                pricing_policies__is_active=True
-            )
+            price_conditions['effective_prices__pricing_type'] = filters['pricing_type']
+        if filters.get('max_price'):
+            price_conditions['effective_prices__user_type'] = user_type
+            price_conditions['effective_prices__amount__lte'] = filters['max_price']
+        if price_conditions:
+            queryset = queryset.filter(**price_conditions)
+
+        sort_by_price = filters.get('sort_by_price')
+        if sort_by_price:
+            # Reuses the join of the filters above
+            queryset = queryset.annotate(
+                price=Min('effective_prices__amount', filter=Q(effective_prices__user_type=user_type))
+            ).order_by(F('price').asc(nulls_last=True), 'id')
 
         # Get total count using values_list to avoid duplicates
         total_count = queryset.values_list('id', flat=True).distinct().count()
@@ -157,10 +236,17 @@ class SearchService:
         # Deduplicate results
         results = SearchService._deduplicate_queryset(queryset)
 
-        # Apply ranking if requested
-        if apply_ranking and query_text:
+        # Apply ranking if requested, unless sorted by price
+        if apply_ranking and query_text and not sort_by_price:
             results = SearchService.rank_results(results, query_text)
 
+        if distances is not None:
+            for obj in results:
+                obj.distance_km = distances[obj.id]
+            # Nearest first unless the results are ranked by text relevance or price
+            if filters.get('near') and not (apply_ranking and query_text) and not sort_by_price:
+                results.sort(key=lambda obj: obj.distance_km)
+
         execution_time = int((time.time() - start_time) * 1000)
 
         return results, execution_time, total_count
@@ -181,6 +267,8 @@ class SearchService:
                 - manufacturer: Filter by manufacturer
                 - technology_domains: List of domain IDs
                 - tags: List of tag IDs
+                - research_field_id: Filter by field of science of linked research problems
+                - include_descendants: Also match subdomains and subfields
                 - specifications: Dict of specification filters
             apply_ranking: Whether to apply ranking to results (default: True)
 
@@ -200,18 +288,18 @@ class SearchService:
             'specification_values',
             'specification_values__specification'
         )
+        queryset = with_translations(
+            queryset,
+            related=['infrastructure', 'infrastructure__institution', 'infrastructure__city']
+        )
 
         filters = filters or {}
 
-        # Text search
+        # Text search, including the text of attached documents
         if query_text:
             queryset = queryset.filter(
-                Q(translations__name__icontains=query_text) |
-                Q(translations__description__icontains=query_text) |
-                Q(manufacturer__icontains=query_text) |
-                Q(model_number__icontains=query_text) |
-                Q(translations__technical_details__icontains=query_text) |
-                Q(infrastructure__translations__name__icontains=query_text)
+                Q(id__in=SearchProjection.matching('equipment', query_text)) |
+                Q(id__in=DocumentTerm.matching_documents(query_text).values('equipment_id'))
             )
 
         # Infrastructure filter
@@ -238,7 +326,9 @@ class SearchService:
 
         # Technology domains
         if filters.get('technology_domains'):
-            queryset = queryset.filter(technology_domains__id__in=filters['technology_domains'])
+            queryset = queryset.filter(technology_domains__id__in=SearchService._taxonomy_ids(
+                TechnologyDomain, filters['technology_domains'], filters
+            ))
 
         # Tags
         if filters.get('tags'):
@@ -247,7 +337,9 @@ class SearchService:
         # Research field filter
         if filters.get('research_field_id'):
             queryset = queryset.filter(
-                infrastructure__research_problems__field_of_science_id=filters['research_field_id']
+                infrastructure__research_problems__field_of_science_id__in=SearchService._taxonomy_ids(
+                    FieldOfScience, filters['research_field_id'], filters
+                )
             )
 
         # Specification filters
@@ -294,6 +386,7 @@ class SearchService:
                 - is_active: Filter active services
                 - technology_domains: List of domain IDs
                 - tags: List of tag IDs
+                - include_descendants: Also match subdomains
                 - max_turnaround_days: Maximum turnaround time
             apply_ranking: Whether to apply ranking to results (default: True)
 
@@ -308,18 +401,13 @@ class SearchService:
             'equipment_services__equipment',
             'equipment_services__equipment__infrastructure'
         )
+        queryset = with_translations(queryset)
 
         filters = filters or {}
 
         # Text search
         if query_text:
-            queryset = queryset.filter(
-                Q(translations__name__icontains=query_text) |
-                Q(translations__description__icontains=query_text) |
-                Q(translations__methodology__icontains=query_text) |
-                Q(translations__typical_applications__icontains=query_text) |
-                Q(code__icontains=query_text)
-            )
+            queryset = queryset.filter(id__in=SearchProjection.matching('service', query_text))
 
         # Status filter
         if 'is_active' in filters:
@@ -327,7 +415,9 @@ class SearchService:
 
         # Technology domains
         if filters.get('technology_domains'):
-            queryset = queryset.filter(technology_domains__id__in=filters['technology_domains'])
+            queryset = queryset.filter(technology_domains__id__in=SearchService._taxonomy_ids(
+                TechnologyDomain, filters['technology_domains'], filters
+            ))
 
         # Tags
         if filters.get('tags'):
@@ -360,6 +450,7 @@ class SearchService:
             query_text: Free text search query
             filters: Dictionary of filter parameters
                 - field_of_science_id: Filter by field
+                - include_descendants: Also match subfields
                 - status: Problem status
                 - priority: Problem priority
                 - is_public: Filter public/private
@@ -377,6 +468,7 @@ class SearchService:
             'keywords',
             'matched_infrastructures'
         )
+        queryset = with_translations(queryset, related=['field_of_science'])
 
         filters = filters or {}
 
@@ -391,9 +483,12 @@ class SearchService:
 
         # Field of science filter
         if filters.get('field_of_science_id'):
+            field_ids = SearchService._taxonomy_ids(
+                FieldOfScience, filters['field_of_science_id'], filters
+            )
             queryset = queryset.filter(
-                Q(field_of_science_id=filters['field_of_science_id']) |
-                Q(additional_fields__id=filters['field_of_science_id'])
+                Q(field_of_science_id__in=field_ids) |
+                Q(additional_fields__id__in=field_ids)
             )
 
         # Status filter
@@ -424,6 +519,35 @@ class SearchService:
 
         return results, execution_time, total_count
 
+    @staticmethod
+    def location_facets(level='country', parent_id=None):
+        """
+        Location facets with counts, read from the precomputed rollups.
+
+        Args:
+            level: 'country', 'region' or 'city'
+            parent_id: Restrict to regions of a country or cities of a region
+
+        Returns:
+            List of dicts with id, name, infrastructure_count, equipment_count and service_count
+        """
+        rollups = list(LocationRollup.facets(level, parent_id))
+        locations = LocationRollup.location_model(level).objects.filter(
+            pk__in=[rollup.location_id for rollup in rollups]
+        ).prefetch_related('translations')
+        names = {location.pk: str(location) for location in locations}
+
+        return [
+            {
+                'id': rollup.location_id,
+                'name': names.get(rollup.location_id, ''),
+                'infrastructure_count': rollup.infrastructure_count,
+                'equipment_count': rollup.equipment_count,
+                'service_count': rollup.service_count,
+            }
+            for rollup in rollups
+        ]
+
     @staticmethod
     def unified_search(query_text, search_types=None):
         """
@@ -0,0 +1,44 @@
+from django.apps import apps as django_apps
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SearchProjection
+
+
+def _tracked_models():
+    """Map every model (and translation model) feeding the projection to its label."""
+    labels = set()
+    for source in SearchProjection.SOURCES.values():
+        labels.add(source['model'])
+        labels.update(label for _, label in source['related'])
+
+    tracked = {}
+    for label in labels:
+        model = django_apps.get_model(label)
+        tracked[model] = (label, None)
+        for meta in model._parler_meta:
+            tracked[meta.model] = (label, 'master_id')
+    return tracked
+
+
+TRACKED_MODELS = _tracked_models()
+
+
+def refresh_projection(sender, instance):
+    label, master_field = TRACKED_MODELS[sender]
+    pk = getattr(instance, master_field) if master_field else instance.pk
+    for kind, ids in SearchProjection.dependents(label, pk).items():
+        SearchProjection.refresh(kind, ids)
+
+
+@receiver(post_save)
+def refresh_projection_on_save(sender, instance, **kwargs):
+    """Refresh the object's rows and those of objects showing its name."""
+    if sender in TRACKED_MODELS and not kwargs.get('raw'):
+        refresh_projection(sender, instance)
+
+
+@receiver(post_delete)
+def refresh_projection_on_delete(sender, instance, **kwargs):
+    if sender in TRACKED_MODELS:
+        refresh_projection(sender, instance)
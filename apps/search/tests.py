@@ -1,11 +1,20 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import translation
+from ScientaGrid import counters
+from ScientaGrid.translations import with_translations
+from apps.access.models import PricingPolicy
 from apps.search.services import SearchService
-from apps.search.models import SavedSearch, SearchLog
+from apps.search.models import SavedSearch, SearchLog, SearchProjection
 from apps.users.models import UserProfile, StaffRole
 from apps.infrastructures.models import Infrastructure
 from apps.equipment.models import Equipment
 from apps.institutions.models import Institution
 from apps.locations.models import Country, Region, City
+from apps.taxonomy.models import TechnologyDomain
 
 
 class SearchServiceTest(TestCase):
@@ -13,6 +22,10 @@ class SearchServiceTest(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        # Parler caches translations by primary key; rows from earlier tests
+        # reuse the same keys
+        cache.clear()
+
         # Create location
         country = Country.objects.create(code='PL')
         country.set_current_language('en')
@@ -124,6 +137,202 @@ class SearchServiceTest(TestCase):
         self.assertEqual(count1, count2)
         self.assertEqual(len(results1), len(results2))
 
+    def test_search_infrastructures_near(self):
+        """Test radius search uses own or city coordinates and sorts by distance."""
+        self.city.latitude = Decimal('50.061400')
+        self.city.longitude = Decimal('19.936600')
+        self.city.save()
+        self.infra2.latitude = Decimal('50.300000')
+        self.infra2.longitude = Decimal('19.900000')
+        self.infra2.save()
+
+        filters = {'near': {'latitude': 50.05, 'longitude': 19.94, 'radius_km': 50}}
+        results, _, count = SearchService.search_infrastructures(filters=filters)
+        self.assertEqual(count, 2)
+        self.assertEqual(results, [self.infra1, self.infra2])
+        self.assertLess(results[0].distance_km, 2)
+        self.assertAlmostEqual(results[1].distance_km, 28, delta=1)
+
+        filters['near']['radius_km'] = 10
+        results, _, count = SearchService.search_infrastructures(filters=filters)
+        self.assertEqual(results, [self.infra1])
+
+        filters = {'bbox': (50.2, 19.8, 50.4, 20.0)}
+        results, _, count = SearchService.search_infrastructures(filters=filters)
+        self.assertEqual(results, [self.infra2])
+
+    def test_search_infrastructures_by_domain_with_descendants(self):
+        """Test parent domain filter matches infrastructures tagged with subdomains."""
+        physics = TechnologyDomain.objects.create(code='PHYS')
+        nano = TechnologyDomain.objects.create(code='PHYS-NANO', parent=physics)
+        dots = TechnologyDomain.objects.create(code='PHYS-NANO-QD', parent=nano)
+        self.infra2.technology_domains.add(dots)
+
+        filters = {'technology_domains': [physics.id]}
+        results, _, count = SearchService.search_infrastructures(filters=filters)
+        self.assertEqual(count, 0)
+
+        filters['include_descendants'] = True
+        results, _, count = SearchService.search_infrastructures(filters=filters)
+        self.assertEqual(count, 1)
+        self.assertEqual(results[0], self.infra2)
+
+    def test_expand_ids_uses_cached_index(self):
+        """Test descendant expansion does not query once the index is built."""
+        physics = TechnologyDomain.objects.create(code='PHYS')
+        nano = TechnologyDomain.objects.create(code='PHYS-NANO', parent=physics)
+        TechnologyDomain.expand_ids([physics.id])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(TechnologyDomain.expand_ids([physics.id]), [physics.id, nano.id])
+
+    def test_search_results_prefetch_translations(self):
+        """Test translated names of results and their locations need no extra queries."""
+        results, _, _ = SearchService.search_infrastructures(filters={'city_id': self.city.id})
+
+        with self.assertNumQueries(0):
+            names = sorted(infra.name for infra in results)
+            locations = {(infra.city.name, infra.institution.name) for infra in results}
+
+        self.assertEqual(names, ['Microscopy Lab', 'Spectroscopy Lab'])
+        self.assertEqual(locations, {('Krakow', 'Test University')})
+
+    def test_with_translations_limits_languages(self):
+        """Test only the requested languages are prefetched."""
+        self.infra1.set_current_language('pl')
+        self.infra1.name = 'Laboratorium Mikroskopii'
+        self.infra1.save()
+
+        infra = with_translations(
+            Infrastructure.objects.filter(pk=self.infra1.pk), languages=['en']
+        ).get()
+
+        self.assertEqual(
+            [t.language_code for t in infra.translations.all()], ['en']
+        )
+
+    def test_prefetched_names_in_other_languages(self):
+        """Test an object named only in another language keeps its name when prefetched."""
+        country = Country.objects.create(code='DE')
+        country.set_current_language('pl')
+        country.name = 'Niemcy'
+        country.save()
+        cache.clear()
+
+        with translation.override('en'):
+            prefetched = with_translations(Country.objects.filter(pk=country.pk)).get()
+            self.assertEqual(str(prefetched), 'Niemcy')
+
+    def test_price_filters_use_effective_prices(self):
+        """Test price filters only see policies in effect and compare one user type's price."""
+        PricingPolicy.objects.create(
+            infrastructure=self.infra1, base_price=Decimal('300.00'), academic_price=Decimal('100.00')
+        )
+        PricingPolicy.objects.create(infrastructure=self.infra2, base_price=Decimal('150.00'))
+        # Expired, so its low price must not match
+        PricingPolicy.objects.create(
+            infrastructure=self.infra2, base_price=Decimal('10.00'), valid_until=date(2000, 1, 1)
+        )
+
+        _, _, academic = SearchService.search_infrastructures(filters={'max_price': 120})
+        _, _, commercial = SearchService.search_infrastructures(
+            filters={'max_price': 200, 'user_type': 'commercial'}
+        )
+        results, _, _ = SearchService.search_infrastructures(filters={'has_pricing': True, 'sort_by_price': True})
+
+        self.assertEqual(academic, 1)
+        self.assertEqual(commercial, 1)
+        self.assertEqual([infra.id for infra in results], [self.infra1.id, self.infra2.id])
+        self.assertEqual(results[0].price, Decimal('100.00'))
+
+
+class SearchProjectionTest(TestCase):
+    """Tests for the per-language search projection."""
+
+    def setUp(self):
+        cache.clear()
+        country = Country.objects.create(code='PL')
+        country.set_current_language('en')
+        country.name = 'Poland'
+        country.save()
+
+        region = Region.objects.create(country=country, code='MA')
+        region.set_current_language('en')
+        region.name = 'Lesser Poland'
+        region.save()
+
+        self.city = City.objects.create(region=region)
+        self.city.set_current_language('en')
+        self.city.name = 'Krakow'
+        self.city.save()
+
+        self.institution = Institution.objects.create(city=self.city)
+        self.institution.set_current_language('en')
+        self.institution.name = 'Test University'
+        self.institution.save()
+
+        self.infra = Infrastructure.objects.create(
+            institution=self.institution,
+            city=self.city,
+            is_active=True
+        )
+        self.infra.set_current_language('en')
+        self.infra.name = 'Microscopy Lab'
+        self.infra.save()
+        self.infra.set_current_language('pl')
+        self.infra.name = 'Laboratorium Mikroskopii'
+        self.infra.save()
+
+    def test_one_row_per_language_with_fallbacks(self):
+        """Test every configured language gets a row, untranslated ones using fallbacks."""
+        rows = dict(
+            SearchProjection.objects.filter(kind='city', object_id=self.city.pk)
+            .values_list('language_code', 'name')
+        )
+
+        self.assertEqual(rows, {'pl': 'Krakow', 'en': 'Krakow'})
+
+    def test_search_text_includes_related_names(self):
+        """Test infrastructure rows carry institution, city and region names."""
+        row = SearchProjection.objects.get(kind='infrastructure', object_id=self.infra.pk, language_code='pl')
+
+        self.assertEqual(row.name, 'Laboratorium Mikroskopii')
+        for text in ['Test University', 'Krakow', 'Lesser Poland']:
+            self.assertIn(text, row.search_text)
+
+    def test_text_search_matches_once_across_languages(self):
+        """Test an object translated in two languages is matched once."""
+        matching = Infrastructure.objects.filter(id__in=SearchProjection.matching('infrastructure', 'lab'))
+
+        self.assertEqual(list(matching.values_list('id', flat=True)), [self.infra.pk])
+
+    def test_city_rename_refreshes_dependents(self):
+        """Test renaming a city updates infrastructures and institutions located there."""
+        self.city.set_current_language('en')
+        self.city.name = 'Cracow'
+        self.city.save()
+
+        self.assertEqual(SearchProjection.matching('infrastructure', 'Cracow').count(), 2)
+        self.assertEqual(SearchProjection.matching('institution', 'Cracow').count(), 2)
+        self.assertFalse(SearchProjection.matching('infrastructure', 'Krakow').exists())
+
+    def test_delete_removes_rows(self):
+        """Test deleting an object drops its projection rows."""
+        pk = self.infra.pk
+        self.infra.delete()
+
+        self.assertFalse(SearchProjection.objects.filter(kind='infrastructure', object_id=pk).exists())
+
+    def test_rebuild_restores_rows(self):
+        """Test a full rebuild recreates rows removed behind the projection's back."""
+        SearchProjection.objects.all().delete()
+
+        SearchProjection.rebuild()
+
+        self.assertEqual(
+            SearchProjection.objects.filter(kind='infrastructure', object_id=self.infra.pk).count(), 2
+        )
+
 
 class SavedSearchModelTest(TestCase):
     """Tests for SavedSearch model."""
@@ -151,6 +360,10 @@ class SavedSearchModelTest(TestCase):
             is_active=True
         )
 
+    def tearDown(self):
+        """Drop increments left buffered by the test."""
+        counters.discard()
+
     def test_saved_search_creation(self):
         """Test saved search is created correctly."""
         self.assertEqual(self.saved_search.user, self.user)
@@ -179,6 +392,21 @@ class SavedSearchModelTest(TestCase):
         self.assertEqual(self.saved_search.usage_count, initial_count + 1)
         self.assertIsNotNone(self.saved_search.last_used_at)
 
+    def test_saved_search_increment_usage_concurrent(self):
+        """Test increments from stale copies are not lost when flushed."""
+        counters.discard()
+        first = SavedSearch.objects.get(pk=self.saved_search.pk)
+        second = SavedSearch.objects.get(pk=self.saved_search.pk)
+        first.increment_usage()
+        second.increment_usage()
+
+        with self.assertNumQueries(1):
+            counters.flush()
+
+        self.saved_search.refresh_from_db()
+        self.assertEqual(self.saved_search.usage_count, 2)
+        self.assertIsNotNone(self.saved_search.last_used_at)
+
 
 class SearchLogModelTest(TestCase):
     """Tests for SearchLog model."""
@@ -3,6 +3,7 @@ from parler.admin import TranslatableAdmin
 from .models import Service, EquipmentService
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin
 
 
 class EquipmentServiceInline(admin.TabularInline):
@@ -21,7 +22,7 @@ class EquipmentServiceInline(admin.TabularInline):
 
 
 @admin.register(Service, site=admin_site)
-class ServiceAdmin(TranslatableAdmin):
+class ServiceAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'name',
         'code',
@@ -102,7 +103,7 @@ class ServiceAdmin(TranslatableAdmin):
 
 
 @admin.register(EquipmentService, site=admin_site)
-class EquipmentServiceAdmin(admin.ModelAdmin):
+class EquipmentServiceAdmin(TranslationPrefetchMixin, admin.ModelAdmin):
     list_display = [
         'service',
         'equipment',
@@ -113,6 +114,8 @@ class EquipmentServiceAdmin(admin.ModelAdmin):
         'capacity_per_day',
         'created_at'
     ]
+    list_select_related = ['service', 'equipment', 'equipment__infrastructure']
+    translation_related = ['service', 'equipment', 'equipment__infrastructure']
     list_filter = [
         'is_primary',
         'is_available',
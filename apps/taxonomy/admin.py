@@ -1,12 +1,13 @@
 from django.contrib import admin
 from parler.admin import TranslatableAdmin
-from .models import TechnologyDomain, InfrastructureCategory, Tag
+from .models import TechnologyDomain, InfrastructureCategory, Tag, TagUsage
 
 from ScientaGrid.admin import admin_site
+from ScientaGrid.translations import TranslationPrefetchMixin
 
 
 @admin.register(TechnologyDomain, site=admin_site)
-class TechnologyDomainAdmin(TranslatableAdmin):
+class TechnologyDomainAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'code',
         'name',
@@ -17,6 +18,8 @@ class TechnologyDomainAdmin(TranslatableAdmin):
         'equipment_count',
         'created_at'
     ]
+    list_select_related = ['parent']
+    translation_related = ['parent']
     list_filter = [
         'is_active',
         'parent',
@@ -60,6 +63,7 @@ class TechnologyDomainAdmin(TranslatableAdmin):
         return obj.level
 
     level.short_description = 'Level'
+    level.admin_order_field = 'tree_depth'
 
     def infrastructure_count(self, obj):
         """Count infrastructures using this domain."""
@@ -75,7 +79,7 @@ class TechnologyDomainAdmin(TranslatableAdmin):
 
 
 @admin.register(InfrastructureCategory, site=admin_site)
-class InfrastructureCategoryAdmin(TranslatableAdmin):
+class InfrastructureCategoryAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = [
         'code',
         'name',
@@ -86,6 +90,8 @@ class InfrastructureCategoryAdmin(TranslatableAdmin):
         'infrastructure_count',
         'created_at'
     ]
+    list_select_related = ['parent', 'technology_domain']
+    translation_related = ['parent', 'technology_domain']
     list_filter = [
         'is_active',
         'technology_domain',
@@ -130,6 +136,7 @@ class InfrastructureCategoryAdmin(TranslatableAdmin):
         return obj.level
 
     level.short_description = 'Level'
+    level.admin_order_field = 'tree_depth'
 
     def infrastructure_count(self, obj):
         """Count infrastructures in this category."""
@@ -146,9 +153,11 @@ class TagAdmin(TranslatableAdmin):
         'tag_type',
         'color_preview',
         'usage_count',
+        'used_by',
         'is_active',
         'created_at'
     ]
+    list_select_related = ['usage']
     list_filter = [
         'tag_type',
         'is_active',
@@ -200,10 +209,26 @@ class TagAdmin(TranslatableAdmin):
     color_preview.allow_tags = True
 
     # Actions
-    actions = ['reset_usage_count']
+    actions = ['reset_usage_count', 'refresh_usage']
 
     def reset_usage_count(self, request, queryset):
         updated = queryset.update(usage_count=0)
         self.message_user(request, f'Reset usage count for {updated} tags.')
 
-    reset_usage_count.short_description = "Reset usage count to 0"
\ No newline at end of file
+    reset_usage_count.short_description = "Reset usage count to 0"
+
+    def refresh_usage(self, request, queryset):
+        refreshed = TagUsage.refresh(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'Recounted usage for {refreshed} tags.')
+
+    refresh_usage.short_description = "Recount usage from relations"
+
+    def used_by(self, obj):
+        """Show how many objects actually use this entry."""
+        try:
+            return obj.usage.total_count
+        except TagUsage.DoesNotExist:
+            return 0
+
+    used_by.short_description = 'Used by'
+    used_by.admin_order_field = 'usage__total_count'
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TaxonomyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.taxonomy'
+
+    def ready(self):
+        # Import signal handlers
+        import apps.taxonomy.signals
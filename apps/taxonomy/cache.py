@@ -0,0 +1,143 @@
+"""
+Process-wide cache of taxonomy trees.
+
+Each taxonomy is loaded with all of its translations in one query into
+compact nodes and kept in memory for the life of the worker. The cached
+tree remembers the version counter it was built from; saving or deleting
+any node (or one of its translations) bumps the counter in the shared
+cache, and every worker reloads lazily on its next read.
+
+Usage:
+    from apps.taxonomy.cache import get_tree
+
+    tree = get_tree(TechnologyDomain)
+    tree.full_path(domain_id, 'en')
+    tree.expand_ids([domain_id])
+"""
+import threading
+
+from parler import appsettings
+
+from ScientaGrid.versioning import get_version, bump_version
+
+
+class TaxonomyNode:
+    """A single taxonomy entry with its names in every language."""
+
+    __slots__ = ('id', 'key', 'parent_id', 'depth', 'path', 'is_active', 'names')
+
+    def __init__(self, id, key, parent_id=None, depth=0, path='', is_active=True):
+        self.id = id
+        self.key = key
+        self.parent_id = parent_id
+        self.depth = depth
+        self.path = path
+        self.is_active = is_active
+        self.names = {}
+
+    def __repr__(self):
+        return f'<TaxonomyNode {self.id}: {self.key}>'
+
+    def name(self, language_code=None):
+        """Name in the given language, falling back like parler does."""
+        if language_code:
+            for code in [language_code] + appsettings.PARLER_LANGUAGES.get_fallback_languages(language_code):
+                if code in self.names:
+                    return self.names[code]
+        return next(iter(self.names.values()), self.key)
+
+
+class TaxonomyTree:
+    """All nodes of one taxonomy, indexed by ID and by parent."""
+
+    def __init__(self, version, nodes):
+        self.version = version
+        self.nodes = {node.id: node for node in nodes}
+        self.children = {}
+        self.subtrees = {}
+        for node in nodes:
+            self.children.setdefault(node.parent_id, []).append(node.id)
+            for ancestor_id in node.path.strip('/').split('/'):
+                if ancestor_id:
+                    self.subtrees.setdefault(int(ancestor_id), []).append(node.id)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def ancestors(self, node_id):
+        """Ancestor nodes, root first."""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return []
+        ids = [int(pk) for pk in node.path.strip('/').split('/')[:-1] if pk]
+        return [self.nodes[pk] for pk in ids if pk in self.nodes]
+
+    def full_path(self, node_id, language_code=None, separator=' > '):
+        """Names from the root down to the node."""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return ''
+        names = [ancestor.name(language_code) for ancestor in self.ancestors(node_id)]
+        names.append(node.name(language_code))
+        return separator.join(names)
+
+    def expand_ids(self, ids):
+        """Expand node IDs to include all of their descendants."""
+        expanded = set()
+        for pk in ids:
+            expanded.update(self.subtrees.get(int(pk), [int(pk)]))
+        return sorted(expanded)
+
+    @classmethod
+    def load(cls, model, version):
+        """Build the tree for a taxonomy model from a single query."""
+        field_names = {field.name for field in model._meta.get_fields()}
+        key_field = 'code' if 'code' in field_names else 'slug'
+        hierarchical = 'tree_path' in field_names
+
+        columns = ['pk', key_field, 'is_active', 'translations__language_code', 'translations__name']
+        if hierarchical:
+            columns += ['parent_id', 'tree_depth', 'tree_path']
+
+        nodes = {}
+        for row in model._base_manager.order_by().values_list(*columns):
+            pk, key, is_active, language_code, name = row[:5]
+            node = nodes.get(pk)
+            if node is None:
+                if hierarchical:
+                    node = TaxonomyNode(pk, key, row[5], row[6], row[7] or f'/{pk}/', is_active)
+                else:
+                    node = TaxonomyNode(pk, key, path=f'/{pk}/', is_active=is_active)
+                nodes[pk] = node
+            if language_code:
+                node.names[language_code] = name
+        return cls(version, list(nodes.values()))
+
+
+_trees = {}
+_lock = threading.Lock()
+
+
+def _namespace(model):
+    return f'taxonomy:{model._meta.label_lower}'
+
+
+def get_tree(model):
+    """Return the current tree for a taxonomy model, reloading it if stale."""
+    version = get_version(_namespace(model))
+    tree = _trees.get(model._meta.label_lower)
+    if tree is None or tree.version != version:
+        with _lock:
+            tree = _trees.get(model._meta.label_lower)
+            if tree is None or tree.version != version:
+                tree = TaxonomyTree.load(model, version)
+                _trees[model._meta.label_lower] = tree
+    return tree
+
+
+def invalidate_tree(model):
+    """Mark a taxonomy as changed so every worker reloads it."""
+    bump_version(_namespace(model))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.taxonomy.models import TechnologyDomain, InfrastructureCategory
+from apps.research_problems.models import FieldOfScience
+
+
+class Command(BaseCommand):
+    help = 'Recompute materialized tree paths for hierarchical taxonomies'
+
+    def handle(self, *args, **options):
+        for model in [TechnologyDomain, InfrastructureCategory, FieldOfScience]:
+            updated = model.rebuild_tree()
+            self.stdout.write(f'  {model._meta.verbose_name_plural}: {updated} paths updated')
+
+        self.stdout.write(self.style.SUCCESS('\nTaxonomy trees rebuilt'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.taxonomy.models import TagUsage
+from apps.research_problems.models import KeywordUsage
+
+
+class Command(BaseCommand):
+    help = 'Recount tag and keyword usage from their many-to-many relations'
+
+    def handle(self, *args, **options):
+        for summary in [TagUsage, KeywordUsage]:
+            refreshed = summary.refresh()
+            self.stdout.write(f'  {summary._meta.verbose_name_plural}: {refreshed} rows refreshed')
+
+        self.stdout.write(self.style.SUCCESS('\nUsage counts refreshed'))
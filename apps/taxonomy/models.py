@@ -1,9 +1,167 @@
-from django.db import models
+from django.apps import apps as django_apps
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Concat, Substr
+from django.core.exceptions import ValidationError
 from django.utils.text import slugify
+from parler import appsettings
 from parler.models import TranslatableModel, TranslatedFields
+from ScientaGrid import counters
+from ScientaGrid.db import bulk_upsert
+from apps.taxonomy.cache import get_tree, invalidate_tree
+
+
+class HierarchyMixin(models.Model):
+    """
+    Materialized-path hierarchy for self-referencing taxonomy trees.
+
+    Concrete models must define a ``parent`` foreign key to ``'self'``.
+    ``tree_path`` holds the primary keys from the root down to the node
+    itself (e.g. ``/1/5/12/``) and is kept in sync on save and on move, so
+    ``level``, ``ancestors()`` and ``descendants()`` never walk ``parent``.
+    ``full_path`` and ``expand_ids()`` read the process-wide tree cache.
+
+    Usage:
+        domain.level
+        domain.ancestors()
+        domain.descendants().filter(is_active=True)
+        TechnologyDomain.rebuild_tree()
+    """
+
+    tree_path = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Materialized path of primary keys from the root, e.g. /1/5/12/"
+    )
+
+    tree_depth = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Hierarchy level (0 for top-level)"
+    )
+
+    class Meta:
+        abstract = True
 
+    @property
+    def level(self):
+        """Get hierarchy level (0 for top-level)."""
+        return self.tree_depth
+
+    @property
+    def full_path(self):
+        """Get full hierarchical path."""
+        language_code = self.get_current_language()
+        names = [node.name(language_code) for node in get_tree(type(self)).ancestors(self.pk)]
+        names.append(self.name)
+        return ' > '.join(names)
+
+    def get_ancestor_ids(self):
+        """Primary keys of all ancestors, root first, read from the path."""
+        return [int(pk) for pk in self.tree_path.strip('/').split('/')[:-1] if pk]
+
+    def ancestors(self):
+        """All ancestors, root first, in a single query."""
+        return type(self).objects.filter(pk__in=self.get_ancestor_ids()).order_by('tree_depth')
+
+    def descendants(self, include_self=False):
+        """All nodes below this one, at any depth, in a single query."""
+        queryset = type(self).objects.filter(tree_path__startswith=self.tree_path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def is_descendant_of(self, other):
+        """Check whether this node lies below ``other``."""
+        return other.pk in self.get_ancestor_ids()
+
+    @classmethod
+    def expand_ids(cls, ids):
+        """
+        Expand node IDs to include all of their descendants.
+
+        Usage:
+            Infrastructure.objects.filter(technology_domains__in=TechnologyDomain.expand_ids([3]))
+        """
+        return get_tree(cls).expand_ids(ids)
+
+    def clean(self):
+        """Reject parents that would create a cycle."""
+        super().clean()
+        if self.pk and self.parent_id:
+            parent_path = type(self)._base_manager.filter(
+                pk=self.parent_id
+            ).values_list('tree_path', flat=True).first() or ''
+            if self.parent_id == self.pk or f'/{self.pk}/' in parent_path:
+                raise ValidationError({'parent': 'A node cannot be moved below itself or its descendants.'})
+
+    def _parent_path(self):
+        """Path of the current parent, read from the database to avoid stale instances."""
+        if not self.parent_id:
+            return '/'
+        parent_path = type(self)._base_manager.filter(
+            pk=self.parent_id
+        ).values_list('tree_path', flat=True).first()
+        if not parent_path:
+            # Parent predates path maintenance; fall back to walking it once
+            parent = type(self)._base_manager.get(pk=self.parent_id)
+            parent_path = parent._parent_path() + f'{parent.pk}/'
+        return parent_path
 
-class TechnologyDomain(TranslatableModel):
+    def save(self, *args, **kwargs):
+        """Save the node and keep its path, and those of its descendants, in sync."""
+        old_path, old_depth = self.tree_path, self.tree_depth
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            parent_path = self._parent_path()
+            if f'/{self.pk}/' in parent_path:
+                raise ValidationError({'parent': 'A node cannot be moved below itself or its descendants.'})
+            new_path = f'{parent_path}{self.pk}/'
+            if new_path == old_path:
+                return
+
+            new_depth = new_path.count('/') - 2
+            manager = type(self)._base_manager
+            manager.filter(pk=self.pk).update(tree_path=new_path, tree_depth=new_depth)
+            if old_path:
+                # Re-root the whole subtree in one UPDATE
+                manager.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+                    tree_path=Concat(Value(new_path), Substr('tree_path', len(old_path) + 1)),
+                    tree_depth=F('tree_depth') + (new_depth - old_depth)
+                )
+            self.tree_path, self.tree_depth = new_path, new_depth
+        invalidate_tree(type(self))
+
+    @classmethod
+    def rebuild_tree(cls):
+        """Recompute every path from ``parent`` links; returns the number of nodes updated."""
+        parents = dict(cls._base_manager.values_list('pk', 'parent_id'))
+        paths = {}
+
+        def path_for(pk, seen=()):
+            if pk not in paths:
+                parent_id = parents[pk]
+                if parent_id is None or parent_id in seen or parent_id not in parents:
+                    paths[pk] = f'/{pk}/'
+                else:
+                    paths[pk] = f'{path_for(parent_id, seen + (pk,))}{pk}/'
+            return paths[pk]
+
+        nodes = list(cls._base_manager.only('pk', 'tree_path', 'tree_depth'))
+        changed = []
+        for node in nodes:
+            path = path_for(node.pk)
+            if node.tree_path != path:
+                node.tree_path, node.tree_depth = path, path.count('/') - 2
+                changed.append(node)
+        cls._base_manager.bulk_update(changed, ['tree_path', 'tree_depth'], batch_size=1000)
+        invalidate_tree(cls)
+        return len(changed)
+
+
+class TechnologyDomain(HierarchyMixin, TranslatableModel):
     """Represents broad technology domains for classification."""
 
     translations = TranslatedFields(
@@ -41,22 +199,8 @@ class TechnologyDomain(TranslatableModel):
             return f"{self.code}: {name}"
         return name
 
-    @property
-    def full_path(self):
-        """Get full hierarchical path."""
-        if self.parent:
-            return f"{self.parent.full_path} > {self.name}"
-        return self.name
 
-    @property
-    def level(self):
-        """Get hierarchy level (0 for top-level)."""
-        if self.parent:
-            return self.parent.level + 1
-        return 0
-
-
-class InfrastructureCategory(TranslatableModel):
+class InfrastructureCategory(HierarchyMixin, TranslatableModel):
     """Represents categories for infrastructures."""
 
     translations = TranslatedFields(
@@ -103,22 +247,133 @@ class InfrastructureCategory(TranslatableModel):
             return f"{self.code}: {name}"
         return name
 
-    @property
-    def full_path(self):
-        """Get full hierarchical path."""
-        if self.parent:
-            return f"{self.parent.full_path} > {self.name}"
-        return self.name
 
-    @property
-    def level(self):
-        """Get hierarchy level (0 for top-level)."""
-        if self.parent:
-            return self.parent.level + 1
-        return 0
+class UniqueSlugMixin(models.Model):
+    """
+    Unique slugs derived from the translated ``name``.
+
+    Existing slugs sharing a base are fetched in one query and the next
+    free ``-N`` suffix is picked in memory. A slug taken by a concurrent
+    writer between allocation and insert is retried on the unique
+    constraint.
+
+    Usage:
+        tag.save()  # slug filled from the name when empty
+        Tag.bulk_create_named(['Raman', 'XRD'], tag_type='technique')
+    """
 
+    SLUG_RETRIES = 3
+    # Room kept at the end of long slugs for a "-N" suffix
+    SLUG_SUFFIX_RESERVE = 6
 
-class Tag(TranslatableModel):
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _slug_base(cls, value):
+        base = slugify(value) or cls._meta.model_name
+        max_length = cls._meta.get_field('slug').max_length
+        if len(base) > max_length - cls.SLUG_SUFFIX_RESERVE:
+            base = base[:max_length - cls.SLUG_SUFFIX_RESERVE].rstrip('-')
+        return base
+
+    @staticmethod
+    def _next_free_slug(base, taken):
+        if base not in taken:
+            return base
+        counter = 1
+        while f'{base}-{counter}' in taken:
+            counter += 1
+        return f'{base}-{counter}'
+
+    @classmethod
+    def allocate_slug(cls, value, exclude_pk=None):
+        """Return a free slug for ``value`` using a single query."""
+        base = cls._slug_base(value)
+        queryset = cls._base_manager.filter(Q(slug=base) | Q(slug__startswith=f'{base}-'))
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        return cls._next_free_slug(base, set(queryset.values_list('slug', flat=True)))
+
+    @classmethod
+    def allocate_slugs(cls, values, chunk_size=100):
+        """Return distinct free slugs for many values, one query per chunk of bases."""
+        bases = [cls._slug_base(value) for value in values]
+        unique_bases = list(dict.fromkeys(bases))
+        taken = set()
+        for start in range(0, len(unique_bases), chunk_size):
+            chunk = unique_bases[start:start + chunk_size]
+            condition = Q(slug__in=chunk)
+            for base in chunk:
+                condition |= Q(slug__startswith=f'{base}-')
+            taken.update(cls._base_manager.filter(condition).values_list('slug', flat=True))
+
+        slugs = []
+        for base in bases:
+            slug = cls._next_free_slug(base, taken)
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    @classmethod
+    def bulk_create_named(cls, names, language_code=None, batch_size=500, **defaults):
+        """
+        Create one object per name with unique slugs and a translation each.
+
+        Signals are not sent; the taxonomy cache is invalidated once at the end.
+        """
+        language_code = language_code or appsettings.PARLER_DEFAULT_LANGUAGE_CODE
+        translation_model = cls._parler_meta.root_model
+
+        for attempt in range(cls.SLUG_RETRIES):
+            try:
+                with transaction.atomic():
+                    slugs = cls.allocate_slugs(names)
+                    objs = cls._base_manager.bulk_create(
+                        [cls(slug=slug, **defaults) for slug in slugs],
+                        batch_size=batch_size
+                    )
+                    if not connection.features.can_return_rows_from_bulk_insert:
+                        # MySQL does not return primary keys from bulk inserts
+                        pks = dict(cls._base_manager.filter(slug__in=slugs).values_list('slug', 'pk'))
+                        for obj in objs:
+                            obj.pk = pks[obj.slug]
+                    translation_model.objects.bulk_create(
+                        [
+                            translation_model(master_id=obj.pk, language_code=language_code, name=name)
+                            for obj, name in zip(objs, names)
+                        ],
+                        batch_size=batch_size
+                    )
+                break
+            except IntegrityError:
+                if attempt == cls.SLUG_RETRIES - 1:
+                    raise
+
+        invalidate_tree(cls)
+        return objs
+
+    def save(self, *args, **kwargs):
+        """Auto-generate slug from name if not provided."""
+        if self.slug or not self.has_translation():
+            return super().save(*args, **kwargs)
+        current_name = self.safe_translation_getter('name', any_language=True)
+        if not current_name:
+            return super().save(*args, **kwargs)
+
+        for attempt in range(self.SLUG_RETRIES):
+            self.slug = self.allocate_slug(current_name, exclude_pk=self.pk)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only retry when the slug itself was taken in the meantime
+                taken = type(self)._base_manager.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not taken or attempt == self.SLUG_RETRIES - 1:
+                    raise
+
+
+class Tag(UniqueSlugMixin, TranslatableModel):
     """Represents flexible tags for categorization across the system."""
 
     translations = TranslatedFields(
@@ -170,22 +425,111 @@ class Tag(TranslatableModel):
         return self.safe_translation_getter('name', any_language=True) or self.slug
 
     def increment_usage(self):
-        """Increment usage count."""
+        """Increment usage count through the buffered counter service."""
+        counters.increment(Tag, self.pk, 'usage_count')
         self.usage_count += 1
-        self.save(update_fields=['usage_count'])
 
-    def save(self, *args, **kwargs):
-        """Auto-generate slug from name if not provided."""
-        if not self.slug and self.has_translation():
-            # Get the current language name for slug generation
-            current_name = self.safe_translation_getter('name', any_language=True)
-            if current_name:
-                base_slug = slugify(current_name)
-                slug = base_slug
-                counter = 1
-                # Ensure slug is unique
-                while Tag.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                self.slug = slug
-        super().save(*args, **kwargs)
+
+class UsageSummary(models.Model):
+    """
+    Popularity of a taxonomy entry counted from the M2M relations that use it.
+
+    Subclasses name the entry in ``SUBJECT_FIELD`` (a one-to-one primary
+    key) and map each count field to the ``(model label, m2m field)`` it is
+    counted from in ``SOURCES``. Counts come from one grouped aggregate per
+    through table and are refreshed in full or for selected entries.
+
+    Usage:
+        TagUsage.refresh()
+        TagUsage.refresh([tag.pk])
+        TagUsage.popular(limit=20)
+    """
+
+    SUBJECT_FIELD = None
+    SOURCES = {}
+
+    total_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        help_text="Number of objects using this entry across all relations"
+    )
+
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def through_models(cls):
+        """Yield ``(count field, through model, subject column)`` for each source relation."""
+        for count_field, (model_label, field_name) in cls.SOURCES.items():
+            field = django_apps.get_model(model_label)._meta.get_field(field_name)
+            yield count_field, field.remote_field.through, f'{field.m2m_reverse_field_name()}_id'
+
+    @classmethod
+    def refresh(cls, subject_ids=None):
+        """Recount usage for the given entries (all when None); returns the number of rows written."""
+        subject_model = cls._meta.get_field(cls.SUBJECT_FIELD).related_model
+        if subject_ids is None:
+            subject_ids = list(subject_model._base_manager.values_list('pk', flat=True))
+        else:
+            subject_ids = list(subject_model._base_manager.filter(pk__in=subject_ids).values_list('pk', flat=True))
+        if not subject_ids:
+            return 0
+
+        counts = {pk: dict.fromkeys(cls.SOURCES, 0) for pk in subject_ids}
+        for count_field, through, column in cls.through_models():
+            rows = through.objects.filter(**{f'{column}__in': subject_ids}).values_list(column).annotate(
+                used=Count('pk')
+            ).order_by()
+            for subject_id, used in rows:
+                counts[subject_id][count_field] = used
+
+        summaries = [
+            cls(**{f'{cls.SUBJECT_FIELD}_id': pk}, total_count=sum(values.values()), **values)
+            for pk, values in counts.items()
+        ]
+        bulk_upsert(
+            cls,
+            summaries,
+            unique_fields=[cls.SUBJECT_FIELD],
+            update_fields=list(cls.SOURCES) + ['total_count', 'refreshed_at']
+        )
+        return len(summaries)
+
+    @classmethod
+    def popular(cls, limit=20, min_count=1):
+        """Most used active entries, read from the summary table in one query."""
+        return cls.objects.select_related(cls.SUBJECT_FIELD).filter(
+            total_count__gte=min_count,
+            **{f'{cls.SUBJECT_FIELD}__is_active': True}
+        ).order_by('-total_count')[:limit]
+
+
+class TagUsage(UsageSummary):
+    """How many infrastructures, equipment and services use each tag."""
+
+    SUBJECT_FIELD = 'tag'
+    SOURCES = {
+        'infrastructure_count': ('infrastructures.Infrastructure', 'tags'),
+        'equipment_count': ('equipment.Equipment', 'tags'),
+        'service_count': ('services.Service', 'tags'),
+    }
+
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage'
+    )
+
+    infrastructure_count = models.PositiveIntegerField(default=0)
+    equipment_count = models.PositiveIntegerField(default=0)
+    service_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-total_count']
+        verbose_name_plural = "Tag usage"
+
+    def __str__(self):
+        return f"{self.tag}: {self.total_count}"
@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.apps import apps as django_apps
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from apps.taxonomy.cache import invalidate_tree
+from apps.taxonomy.models import TechnologyDomain, InfrastructureCategory, Tag, TagUsage
+from apps.research_problems.models import FieldOfScience, Keyword, KeywordUsage
+
+
+TAXONOMY_MODELS = [TechnologyDomain, InfrastructureCategory, Tag, FieldOfScience, Keyword]
+
+# Master and translation models both map to the taxonomy they belong to
+TAXONOMY_SENDERS = {}
+for _model in TAXONOMY_MODELS:
+    TAXONOMY_SENDERS[_model] = _model
+    TAXONOMY_SENDERS[_model._parler_meta.root_model] = _model
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_taxonomy_tree(sender, **kwargs):
+    """Bump the taxonomy version whenever a node or one of its translations changes."""
+    model = TAXONOMY_SENDERS.get(sender)
+    if model is None or kwargs.get('raw'):
+        return
+
+    invalidate_tree(model)
+    # Bump again once committed, so a worker that reloaded mid-transaction
+    # does not keep the pre-commit tree
+    transaction.on_commit(lambda: invalidate_tree(model))
+
+
+USAGE_SUMMARIES = [TagUsage, KeywordUsage]
+
+# Through model -> (summary, m2m field name on the source model)
+USAGE_THROUGH_MODELS = {}
+# Source model -> [(summary, m2m field name)]
+USAGE_SOURCE_MODELS = {}
+for _summary in USAGE_SUMMARIES:
+    for _model_label, _field_name in _summary.SOURCES.values():
+        _source = django_apps.get_model(_model_label)
+        _through = _source._meta.get_field(_field_name).remote_field.through
+        USAGE_THROUGH_MODELS[_through] = (_summary, _field_name)
+        USAGE_SOURCE_MODELS.setdefault(_source, []).append((_summary, _field_name))
+
+
+@receiver(m2m_changed)
+def update_usage_summary(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recount usage for the entries touched by an M2M change."""
+    if sender not in USAGE_THROUGH_MODELS:
+        return
+    summary, field_name = USAGE_THROUGH_MODELS[sender]
+
+    if reverse:
+        # Changed from the tag or keyword side, e.g. tag.infrastructures.add(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            summary.refresh([instance.pk])
+    elif action == 'pre_clear':
+        instance._usage_cleared_ids = list(getattr(instance, field_name).values_list('pk', flat=True))
+    elif action == 'post_clear':
+        summary.refresh(getattr(instance, '_usage_cleared_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        summary.refresh(pk_set)
+
+
+@receiver(pre_delete)
+def remember_usage_before_delete(sender, instance, **kwargs):
+    """Deleting a source object removes its M2M rows without m2m_changed; remember what it used."""
+    sources = USAGE_SOURCE_MODELS.get(sender)
+    if sources:
+        instance._usage_deleted_ids = {
+            summary: list(getattr(instance, field_name).values_list('pk', flat=True))
+            for summary, field_name in sources
+        }
+
+
+@receiver(post_delete)
+def update_usage_after_delete(sender, instance, **kwargs):
+    """Recount usage for everything a deleted source object used."""
+    for summary, subject_ids in getattr(instance, '_usage_deleted_ids', {}).items():
+        if subject_ids:
+            summary.refresh(subject_ids)
@@ -1,6 +1,15 @@
-from django.test import TestCase
-from apps.taxonomy.models import TechnologyDomain, InfrastructureCategory, Tag
+import threading
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from ScientaGrid import counters
+from ScientaGrid.versioning import check_shared_cache
+from apps.taxonomy.cache import get_tree, invalidate_tree
+from apps.taxonomy.models import TechnologyDomain, InfrastructureCategory, Tag, TagUsage
 from apps.infrastructures.models import Infrastructure
+from apps.equipment.models import Equipment
 from apps.institutions.models import Institution
 from apps.locations.models import Country, Region, City
 
@@ -10,6 +19,10 @@ class TechnologyDomainModelTest(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        # Parler caches translations outside the test transaction; a stale
+        # entry would keep the translations below from being written
+        cache.clear()
+
         # Create parent domain
         self.parent_domain = TechnologyDomain.objects.create(
             code='PHYS',
@@ -58,6 +71,63 @@ class TechnologyDomainModelTest(TestCase):
         self.assertIn('Physics', self.child_domain.full_path)
         self.assertIn('Nanophysics', self.child_domain.full_path)
 
+    def test_technology_domain_tree_path(self):
+        """Test materialized path is maintained on create."""
+        grandchild = TechnologyDomain.objects.create(code='PHYS-NANO-QD', parent=self.child_domain)
+        self.assertEqual(
+            grandchild.tree_path,
+            f'/{self.parent_domain.pk}/{self.child_domain.pk}/{grandchild.pk}/'
+        )
+        self.assertEqual(grandchild.level, 2)
+
+    def test_technology_domain_ancestors_and_descendants(self):
+        """Test ancestors and descendants are resolved in a single query."""
+        grandchild = TechnologyDomain.objects.create(code='PHYS-NANO-QD', parent=self.child_domain)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(grandchild.ancestors()), [self.parent_domain, self.child_domain])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                set(self.parent_domain.descendants()),
+                {self.child_domain, grandchild}
+            )
+        self.assertTrue(grandchild.is_descendant_of(self.parent_domain))
+
+    def test_technology_domain_move_updates_subtree(self):
+        """Test moving a node re-roots its descendants."""
+        grandchild = TechnologyDomain.objects.create(code='PHYS-NANO-QD', parent=self.child_domain)
+        chemistry = TechnologyDomain.objects.create(code='CHEM')
+
+        self.child_domain.parent = chemistry
+        self.child_domain.save()
+
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.tree_path, f'/{chemistry.pk}/{self.child_domain.pk}/{grandchild.pk}/')
+        self.assertEqual(grandchild.level, 2)
+        self.assertFalse(self.parent_domain.descendants().exists())
+
+        self.child_domain.parent = None
+        self.child_domain.save()
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.level, 1)
+
+    def test_technology_domain_cycle_rejected(self):
+        """Test a node cannot be moved below its own descendant."""
+        self.parent_domain.parent = self.child_domain
+        with self.assertRaises(ValidationError):
+            self.parent_domain.clean()
+        with self.assertRaises(ValidationError):
+            self.parent_domain.save()
+        self.parent_domain.refresh_from_db()
+        self.assertIsNone(self.parent_domain.parent)
+
+    def test_technology_domain_rebuild_tree(self):
+        """Test paths can be recomputed from parent links."""
+        TechnologyDomain.objects.update(tree_path='', tree_depth=0)
+        self.assertEqual(TechnologyDomain.rebuild_tree(), 2)
+        self.child_domain.refresh_from_db()
+        self.assertEqual(self.child_domain.tree_path, f'/{self.parent_domain.pk}/{self.child_domain.pk}/')
+        self.assertEqual(self.child_domain.level, 1)
+
 
 class InfrastructureCategoryModelTest(TestCase):
     """Tests for InfrastructureCategory model."""
@@ -130,6 +200,10 @@ class TagModelTest(TestCase):
         self.tag.description = 'Materials at nanoscale'
         self.tag.save()
 
+    def tearDown(self):
+        """Drop increments left buffered by the test."""
+        counters.discard()
+
     def test_tag_creation(self):
         """Test tag is created correctly."""
         self.assertEqual(self.tag.slug, 'nanomaterials')
@@ -148,6 +222,81 @@ class TagModelTest(TestCase):
         self.tag.increment_usage()
         self.assertEqual(self.tag.usage_count, initial_count + 1)
 
+    def test_tag_increment_usage_batched(self):
+        """Test buffered increments for many tags are written in one UPDATE."""
+        counters.discard()
+        other = Tag.objects.create(slug='spectroscopy')
+        for _ in range(3):
+            self.tag.increment_usage()
+        other.increment_usage()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(counters.flush(), 2)
+
+        self.assertEqual(Tag.objects.get(pk=self.tag.pk).usage_count, 3)
+        self.assertEqual(Tag.objects.get(pk=other.pk).usage_count, 1)
+
+    def test_failed_flush_restores_entries(self):
+        """Test increments that fail to write go back into the buffer, counted per entry."""
+        counters.discard()
+        for _ in range(3):
+            self.tag.increment_usage()
+
+        with mock.patch.object(counters, '_write', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                counters.flush()
+
+        self.assertEqual(counters.pending(), 1)
+        counters.flush()
+        self.assertEqual(Tag.objects.get(pk=self.tag.pk).usage_count, 3)
+
+    def test_failed_key_does_not_drop_other_keys(self):
+        """Test a failed write puts its increments back while the other fields are still written."""
+        counters.discard()
+        self.tag.increment_usage()
+        counters.increment(Tag, self.tag.pk, 'usage_count', amount=5, touch='updated_at')
+        write = counters._write
+        calls = []
+
+        def fail_first(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError
+            return write(*args)
+
+        with mock.patch.object(counters, '_write', side_effect=fail_first):
+            with self.assertRaises(RuntimeError):
+                counters.flush()
+
+        self.assertEqual(Tag.objects.get(pk=self.tag.pk).usage_count, 5)
+        self.assertEqual(counters.pending(), 1)
+        counters.flush()
+        self.assertEqual(Tag.objects.get(pk=self.tag.pk).usage_count, 6)
+
+    def test_restore_counts_only_new_entries_and_wakes_flusher(self):
+        """Test restored increments merge with buffered ones without inflating the count."""
+        counters.discard()
+        self.tag.increment_usage()
+        counters._wakeup.clear()
+
+        counters._restore(Tag, 'usage_count', None, [(self.tag.pk, [2, self.tag.updated_at])])
+
+        self.assertEqual(counters.pending(), 1)
+        self.assertTrue(counters._wakeup.is_set())
+        counters.flush()
+        self.assertEqual(Tag.objects.get(pk=self.tag.pk).usage_count, 3)
+
+    @override_settings(COUNTER_FLUSHER=True, COUNTER_FLUSH_INTERVAL=0.05)
+    def test_idle_buffer_flushed_in_background(self):
+        """Test pending increments are flushed after the interval without another increment."""
+        counters.discard()
+        flushed = threading.Event()
+        with mock.patch.object(counters, 'flush', side_effect=lambda: (counters.discard(), flushed.set())), \
+                mock.patch.object(counters, '_maybe_flush'):
+            counters.increment(Tag, self.tag.pk, 'usage_count')
+            self.assertTrue(flushed.wait(2))
+        counters.discard()
+
     def test_tag_auto_slug_generation(self):
         """Test automatic slug generation."""
         tag = Tag(tag_type='technique', is_active=True)
@@ -157,6 +306,32 @@ class TagModelTest(TestCase):
 
         self.assertEqual(tag.slug, 'electron-microscopy')
 
+    def test_tag_slug_next_free_suffix(self):
+        """Test the free suffix is found with a single query."""
+        for slug in ['raman', 'raman-1', 'raman-3', 'raman-spectroscopy']:
+            Tag.objects.create(slug=slug)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Tag.allocate_slug('Raman'), 'raman-2')
+
+        tag = Tag(tag_type='technique')
+        tag.set_current_language('en')
+        tag.name = 'Raman'
+        tag.save()
+        self.assertEqual(tag.slug, 'raman-2')
+
+    def test_tag_bulk_create_named(self):
+        """Test bulk creation allocates distinct slugs and translations."""
+        Tag.objects.create(slug='raman')
+
+        tags = Tag.bulk_create_named(['Raman', 'Raman', 'XRD'], language_code='en', tag_type='technique')
+
+        self.assertEqual([tag.slug for tag in tags], ['raman-1', 'raman-2', 'xrd'])
+        created = Tag.objects.get(slug='xrd')
+        created.set_current_language('en')
+        self.assertEqual(created.name, 'XRD')
+        self.assertEqual(created.tag_type, 'technique')
+
     def test_tag_slug_unique(self):
         """Test slug must be unique."""
         from django.db import IntegrityError
@@ -166,3 +341,152 @@ class TagModelTest(TestCase):
                 slug='nanomaterials',
                 tag_type='technique'
             )
+
+
+class TaxonomyTreeCacheTest(TestCase):
+    """Tests for the process-wide taxonomy tree cache."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+
+        self.physics = TechnologyDomain(code='PHYS')
+        self.physics.set_current_language('en')
+        self.physics.name = 'Physics'
+        self.physics.save()
+        self.physics.set_current_language('pl')
+        self.physics.name = 'Fizyka'
+        self.physics.save()
+
+        self.nano = TechnologyDomain(code='PHYS-NANO', parent=self.physics)
+        self.nano.set_current_language('en')
+        self.nano.name = 'Nanophysics'
+        self.nano.save()
+
+    def test_tree_loaded_in_one_query(self):
+        """Test the tree and all translations load in a single query."""
+        invalidate_tree(TechnologyDomain)
+        with self.assertNumQueries(1):
+            tree = get_tree(TechnologyDomain)
+        with self.assertNumQueries(0):
+            self.assertIs(get_tree(TechnologyDomain), tree)
+
+        node = tree.get(self.physics.id)
+        self.assertEqual(node.names, {'en': 'Physics', 'pl': 'Fizyka'})
+        self.assertEqual(tree.get(self.nano.id).depth, 1)
+        self.assertEqual(tree.full_path(self.nano.id, 'en'), 'Physics > Nanophysics')
+        # Missing Polish name falls back to English
+        self.assertEqual(tree.full_path(self.nano.id, 'pl'), 'Fizyka > Nanophysics')
+
+    def test_translation_change_reloads_tree(self):
+        """Test saving a translation bumps the version and reloads the tree."""
+        tree = get_tree(TechnologyDomain)
+
+        self.physics.set_current_language('en')
+        self.physics.name = 'Applied Physics'
+        self.physics.save()
+
+        reloaded = get_tree(TechnologyDomain)
+        self.assertIsNot(reloaded, tree)
+        self.assertEqual(reloaded.get(self.physics.id).name('en'), 'Applied Physics')
+
+    def test_delete_reloads_tree(self):
+        """Test deleting a node drops it from the cached tree."""
+        get_tree(TechnologyDomain)
+        self.nano.delete()
+
+        self.assertIsNone(get_tree(TechnologyDomain).get(self.nano.id))
+        self.assertEqual(TechnologyDomain.expand_ids([self.physics.id]), [self.physics.id])
+
+    def test_flat_taxonomy(self):
+        """Test taxonomies without a hierarchy are cached by slug."""
+        tag = Tag.objects.create(slug='spectroscopy')
+
+        node = get_tree(Tag).get(tag.id)
+        self.assertEqual(node.key, 'spectroscopy')
+        self.assertIsNone(node.parent_id)
+        self.assertEqual(node.name('en'), 'spectroscopy')
+
+    def test_full_path_uses_cache(self):
+        """Test full_path does not query once the tree is cached."""
+        get_tree(TechnologyDomain)
+        self.nano.set_current_language('en')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nano.full_path, 'Physics > Nanophysics')
+
+    def test_deploy_check_requires_shared_cache(self):
+        """Test a process-local cache is reported, since bumps would not reach other workers."""
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+
+        with override_settings(CACHES=local):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['scientagrid.E001'])
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class TagUsageTest(TestCase):
+    """Tests for usage counts derived from tag relations."""
+
+    def setUp(self):
+        """Set up test data."""
+        country = Country.objects.create(code='PL')
+        region = Region.objects.create(country=country, code='MA')
+        city = City.objects.create(region=region)
+        institution = Institution.objects.create(city=city)
+
+        self.infra1 = Infrastructure.objects.create(institution=institution, city=city)
+        self.infra2 = Infrastructure.objects.create(institution=institution, city=city)
+        self.equipment = Equipment.objects.create(infrastructure=self.infra1)
+
+        self.microscopy = Tag.objects.create(slug='microscopy')
+        self.spectroscopy = Tag.objects.create(slug='spectroscopy')
+
+    def test_refresh_counts_all_relations(self):
+        """Test a full refresh counts usage across every relation."""
+        self.infra1.tags.add(self.microscopy)
+        self.infra2.tags.add(self.microscopy)
+        self.equipment.tags.add(self.microscopy, self.spectroscopy)
+        TagUsage.objects.all().delete()
+
+        self.assertEqual(TagUsage.refresh(), 2)
+
+        usage = TagUsage.objects.get(tag=self.microscopy)
+        self.assertEqual(usage.infrastructure_count, 2)
+        self.assertEqual(usage.equipment_count, 1)
+        self.assertEqual(usage.total_count, 3)
+        self.assertEqual(TagUsage.objects.get(tag=self.spectroscopy).total_count, 1)
+
+    def test_m2m_changes_update_counts(self):
+        """Test adding, removing and clearing tags keeps counts current."""
+        self.infra1.tags.add(self.microscopy, self.spectroscopy)
+        self.infra2.tags.add(self.microscopy)
+        self.assertEqual(self.microscopy.usage.total_count, 2)
+
+        self.infra2.tags.remove(self.microscopy)
+        self.assertEqual(TagUsage.objects.get(tag=self.microscopy).total_count, 1)
+
+        self.infra1.tags.clear()
+        self.assertEqual(TagUsage.objects.get(tag=self.microscopy).total_count, 0)
+        self.assertEqual(TagUsage.objects.get(tag=self.spectroscopy).total_count, 0)
+
+        self.spectroscopy.equipment.add(self.equipment)
+        self.assertEqual(TagUsage.objects.get(tag=self.spectroscopy).equipment_count, 1)
+
+    def test_deleting_tagged_object_updates_counts(self):
+        """Test deleting a tagged object recounts its tags."""
+        self.infra2.tags.add(self.microscopy)
+        self.infra2.delete()
+
+        self.assertEqual(TagUsage.objects.get(tag=self.microscopy).total_count, 0)
+
+    def test_popular_tags(self):
+        """Test popular tags come from the summary table in one query."""
+        self.infra1.tags.add(self.microscopy, self.spectroscopy)
+        self.infra2.tags.add(self.microscopy)
+        self.spectroscopy.is_active = False
+        self.spectroscopy.save()
+
+        with self.assertNumQueries(1):
+            popular = [usage.tag for usage in TagUsage.popular()]
+        self.assertEqual(popular, [self.microscopy])